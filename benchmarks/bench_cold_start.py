@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# Benchmark: cold start from tasks.db (parsing every row, or trusting the stored deadlines) vs from the binary
+# snapshot, current or taken mid-run before a crash
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_parser import Task, get_timezone
+from working_chat_bot import TaskReminder
+
+TASKS = int(os.getenv("BENCH_TASKS", "1000000"))
+USERS = 10_000
+
+def make_task(i, now):
+    deadline_dt = now + timedelta(minutes=random.randint(30, 7 * 24 * 60))
+    deadline = f"{deadline_dt.hour}h{deadline_dt.minute} {deadline_dt.day}/{deadline_dt.month}/{deadline_dt.year}"
+    return Task(f"https://ghn.vn/ticket/{i}", f"VN{i:08d}", f"{now.day}/{now.month}/{now.year}",
+                deadline, int(deadline_dt.replace(second=0, microsecond=0).timestamp()))
+
+def timed(label, fn):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:10.1f} ms")
+    return result
+
+def start_bot():
+    """What main() does before the Application starts"""
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.load_users()
+    return reminder
+
+def main():
+    now = datetime.now(get_timezone())
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            seed = TaskReminder()
+            store = seed.store
+            store.conn.execute('BEGIN')
+            store.conn.executemany(store.INSERT_TASK, (store._row(i % USERS, make_task(i, now)) for i in range(TASKS)))
+            store.conn.execute('COMMIT')
+            store.add_users(range(USERS))
+            store.conn.execute("INSERT INTO meta (key, value) VALUES ('initialized', '1')")
+            store.close()
+            print(f"Seeded {TASKS} tasks of {USERS} users")
+
+            # No 'deadline_timezone' yet, as in a db from before deadlines were stored per zone
+            reminder = timed("cold start, tasks.db, parse every row", start_bot)
+            reminder.store.close()
+            del reminder
+            reminder = timed("cold start, tasks.db, stored deadlines", start_bot)
+            reminder.store.close()
+            timed("save snapshot (shutdown)", reminder.save_snapshot)
+            print(f"{'snapshot size':<36} {os.path.getsize(reminder.store.cache_file) / 2**20:10.1f} MB")
+            del reminder
+
+            reminder = timed("cold start, from snapshot", start_bot)
+            assert reminder.snapshot is not None
+            user_id = random.randrange(USERS)
+            timed(f"first use of a user (~{TASKS // USERS} tasks)", lambda: reminder.format_task_list(user_id))
+            timed("first reminder tick (2h due)", lambda: reminder.check_reminders(int((now + timedelta(hours=2)).timestamp())))
+            timed("materialize all users", reminder.ensure_all_users)
+            assert reminder.check_indexes() == []
+
+            # Crash after a periodic snapshot: 1% of the users changed their tasks since
+            timed("save snapshot (periodic)", reminder.save_snapshot)
+            for user_id in random.sample(range(USERS), USERS // 100):
+                reminder.append_task(user_id, make_task(TASKS + user_id, now))
+            reminder.store.close()
+            del reminder
+            reminder = timed("cold start, snapshot + 1% replayed", start_bot)
+            assert reminder.snapshot is not None and len(reminder.cold_users) == USERS - USERS // 100
+            reminder.store.close()
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Benchmark: reminder delivery on a private thread loop vs on the Application loop
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox
+from task_parser import Task
+from working_chat_bot import TaskReminder
+from benchmarks.workload import FakeBot
+
+REMINDERS = int(os.getenv("BENCH_REMINDERS", "500"))
+SEND_LATENCY = float(os.getenv("BENCH_SEND_LATENCY", "0.05"))  # Simulated Bot API round trip
+
+def make_tasks():
+    # One task per user: every reminder is its own message (no coalescing), deadline in 30 minutes
+    deadline_ts = int(time.time()) + 1800
+    return [Task('ghn.com', f"VN{i}", '1/1', '10h 1/1', deadline_ts, user_id=i, task_id=i) for i in range(REMINDERS)]
+
+def report(label, start, bot):
+    latencies = sorted(t - start for _, _, t in bot.sent)
+    elapsed = latencies[-1]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<28} {len(latencies) / elapsed:9.1f} msg/s   "
+          f"p50 {statistics.median(latencies) * 1000:8.1f} ms   p99 {p99 * 1000:8.1f} ms")
+
+def bench_thread_loop():
+    """Old design: daemon thread with its own loop, one run_until_complete per reminder"""
+    reminder = TaskReminder.__new__(TaskReminder)
+    reminder.bot = FakeBot(SEND_LATENCY)
+    tasks = make_tasks()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        for task in tasks:
+            loop.run_until_complete(reminder.send_reminder(task))
+        loop.close()
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    report("thread loop (sequential)", start, reminder.bot)
+
+async def bench_app_loop():
+    """New design: reminders go through the outbox, sent concurrently on the Application loop"""
+    with tempfile.TemporaryDirectory() as tmp:
+        reminder = TaskReminder()
+        reminder.set_bot(FakeBot(SEND_LATENCY))
+        # Rate limits out of the way: this measures the loop, not Telegram's 30 msg/s and 1 msg/s per chat
+        reminder.outbox = Outbox(os.path.join(tmp, 'outbox.db'), concurrency=20, rate=1e6, per_chat_interval=0)
+        tasks = make_tasks()
+
+        start = time.perf_counter()
+        await reminder.send_reminders(tasks)
+        report("app loop (outbox, 20)", start, reminder.bot)
+        reminder.outbox.close()
+
+def main():
+    print(f"{REMINDERS} due reminders, {SEND_LATENCY * 1000:.0f} ms per send")
+    bench_thread_loop()
+    asyncio.run(bench_app_loop())
+
+if __name__ == "__main__":
+    main()
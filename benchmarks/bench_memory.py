@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Benchmark: bytes per in-memory task, per-task dicts vs slotted Task records
+
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_parser import parse_many
+from test_task_parser import legacy_parse_deadline, legacy_parse_task_line
+
+TASKS = int(os.getenv("BENCH_TASKS", "200000"))
+HOSTS = ['https://ghn.vn', 'https://khachhang.ghn.vn', 'https://nhanh.vn', 'https://shopee.vn']
+
+def make_lines(n):
+    lines = []
+    for i in range(n):
+        day = random.randint(1, 28)
+        lines.append(f"{random.choice(HOSTS)}/ticket/{i} | VN{i:08d} | {day}/1/2026 | "
+                     f"{random.randint(0, 23)}h{random.choice(['00', '30'])} | {day}/1/2026")
+    return lines
+
+def legacy_tasks(lines):
+    """Tasks as the bot used to keep them: parsed dict + deadline_dt + user_id"""
+    tasks = []
+    for line in lines:
+        task = legacy_parse_task_line(line)
+        task['deadline_dt'] = legacy_parse_deadline(task['deadline'])
+        task['user_id'] = 1
+        tasks.append(task)
+    return tasks
+
+def record_tasks(lines):
+    tasks = parse_many(lines)
+    for task in tasks:
+        task.user_id = 1
+    return tasks
+
+def measure(build, lines):
+    gc.collect()
+    tracemalloc.start()
+    tasks = build(lines)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return size / len(lines)
+
+def main():
+    lines = make_lines(TASKS)
+    before = measure(legacy_tasks, lines)
+    after = measure(record_tasks, lines)
+    print(f"{TASKS} tasks")
+    print(f"dict per task      {before:8.0f} bytes")
+    print(f"Task record        {after:8.0f} bytes   ({after / before:.0%} of dict)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# Benchmark: task line + deadline parsing throughput (lines/sec)
+
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_parser import parse_many
+from test_task_parser import GOLDEN_CORPUS, legacy_parse_deadline, legacy_parse_task_line
+
+LINES = int(os.getenv("BENCH_LINES", "200000"))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+
+def make_lines(n):
+    """Mix of every /help format, weighted towards the common pipe format"""
+    formats = [
+        "https://ghn.vn/t/{i} | VN{i} | 16/1/2026 | {h}h{m} | {d}/1/2026",
+        "https://ghn.vn/t/{i} , VN{i} , 16/1/2026 , {h}h{m} , {d}/1/2026",
+        "https://ghn.vn/t/{i} ; VN{i} ; 16/1/2026 ; {h}h{m} ; {d}/1/2026",
+        "https://ghn.vn/t/{i} VN{i} 16/1/2026 {h}h{m} {d}/1/2026",
+        "https://ghn.vn/t/{i} | VN{i} | 16-thg 1 | {h}H {d}/1",
+    ]
+    weights = [6, 1, 1, 1, 1]
+    return [
+        random.choices(formats, weights)[0].format(i=i, h=random.randint(0, 23), m=random.randint(0, 59), d=random.randint(1, 28))
+        for i in range(n)
+    ]
+
+def legacy_parse_many(lines):
+    tasks = []
+    for line in lines:
+        task = legacy_parse_task_line(line)
+        if task:
+            task['deadline_dt'] = legacy_parse_deadline(task['deadline'])
+        tasks.append(task)
+    return tasks
+
+def main():
+    lines = make_lines(LINES) + GOLDEN_CORPUS
+    parsers = {"original parser": legacy_parse_many, "task_parser.parse_many": parse_many}
+    best = dict.fromkeys(parsers, float('inf'))
+    # Best of ROUNDS, the parsers taking turns so both see the same machine load
+    with contextlib.redirect_stdout(io.StringIO()):  # The corpus' bad deadlines print errors
+        for _ in range(ROUNDS):
+            for label, fn in parsers.items():
+                start = time.perf_counter()
+                fn(lines)
+                best[label] = min(best[label], time.perf_counter() - start)
+    for label, elapsed in best.items():
+        print(f"{label:<22} {len(lines) / elapsed:12,.0f} lines/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Benchmark: firing every reminder of 500k tasks with 1 vs 3 offsets per user
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_parser import Task, get_timezone
+from working_chat_bot import TaskReminder
+
+TASKS = int(os.getenv("BENCH_TASKS", "500000"))
+USERS = 5_000
+HOURS = 48  # Deadlines spread over this many hours from now
+TICK = 60  # Simulated seconds between scheduler ticks
+
+def make_task(i, now):
+    deadline_dt = now + timedelta(minutes=random.randint(3 * 60, HOURS * 60))
+    deadline = f"{deadline_dt.hour}h{deadline_dt.minute} {deadline_dt.day}/{deadline_dt.month}/{deadline_dt.year}"
+    return Task(f"https://ghn.vn/ticket/{i}", f"VN{i:08d}", f"{now.day}/{now.month}/{now.year}",
+                deadline, int(deadline_dt.replace(second=0, microsecond=0).timestamp()))
+
+def run(offsets, now):
+    seed = TaskReminder()
+    store = seed.store
+    store.conn.execute('BEGIN')
+    store.conn.executemany(store.INSERT_TASK, (store._row(i % USERS, make_task(i, now)) for i in range(TASKS)))
+    store.conn.execute('COMMIT')
+    for user_id in range(USERS):
+        store.set_offsets(user_id, offsets)
+    store.conn.execute("INSERT INTO meta (key, value) VALUES ('initialized', '1')")
+    store.close()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reminder = TaskReminder()
+        reminder.load_tasks()
+    heap = len(reminder.scheduler)
+
+    # Walk a simulated clock through every fire time
+    fired = ticks = 0
+    clock = int(now.timestamp())
+    end = clock + HOURS * 3600 + 60
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while clock < end:
+            fired += len(reminder.check_reminders(clock))
+            clock += TICK
+            ticks += 1
+    elapsed = time.perf_counter() - start
+    assert fired == TASKS * len(offsets), (fired, TASKS * len(offsets))
+    assert len(reminder.scheduler) == 0 and not any(reminder.user_tasks.values())
+    reminder.store.destroy()
+    print(f"{len(offsets):>8} {heap:>12} {fired:>10} {elapsed:9.1f} s {fired / elapsed:10.0f}/s "
+          f"{elapsed / ticks * 1000:8.2f} ms")
+
+def main():
+    now = datetime.now(get_timezone())
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            print(f"{TASKS} tasks of {USERS} users, deadlines over {HOURS}h, a tick every {TICK}s")
+            print(f"{'offsets':>8} {'heap entries':>12} {'reminders':>10} {'fire all':>11} {'throughput':>12} "
+                  f"{'per tick':>11}")
+            random.seed(1)
+            run([1800], now)
+            random.seed(1)
+            run([7200, 1800, 300], now)
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Benchmark: reminder tick cost vs number of pending tasks
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import ReminderScheduler
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+TICKS = 10_000
+
+def build_scheduler(n, now):
+    """Schedule n reminders spread over the next 7 days"""
+    scheduler = ReminderScheduler()
+    base = now.timestamp()
+    for i in range(n):
+        scheduler.schedule(i, base + 60 + random.random() * 7 * 86400, (0, None))
+    return scheduler
+
+def legacy_scan(tasks, now):
+    """The old check_reminders loop: window test against every task"""
+    hits = 0
+    for deadline_dt in tasks:
+        reminder_time = deadline_dt - timedelta(minutes=30)
+        if abs((now - reminder_time).total_seconds()) < 60:
+            hits += 1
+    return hits
+
+def bench_tick(n):
+    now = datetime.now()
+    scheduler = build_scheduler(n, now)
+    ts = now.timestamp()
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        scheduler.pop_due(ts)
+        scheduler.next_fire_at()
+    return (time.perf_counter() - start) / TICKS
+
+def bench_legacy(n):
+    now = datetime.now()
+    tasks = [now + timedelta(seconds=3600 + random.random() * 7 * 86400) for _ in range(n)]
+    rounds = max(1, 100_000 // n)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        legacy_scan(tasks, now)
+    return (time.perf_counter() - start) / rounds
+
+def bench_churn(n):
+    """Cost of one add + one delete + firing one due reminder at size n"""
+    now = datetime.now()
+    scheduler = build_scheduler(n, now)
+    ts = now.timestamp()
+    start = time.perf_counter()
+    for i in range(TICKS):
+        key = ('new', i)
+        scheduler.schedule(key, ts + 3600, (0, None))
+        scheduler.cancel(key)
+        scheduler.schedule(('due', i), ts - 1, (0, None))
+        scheduler.pop_due(ts)
+    return (time.perf_counter() - start) / TICKS
+
+def main():
+    print(f"{'pending':>10} {'heap tick':>12} {'churn op':>12} {'legacy scan':>14}")
+    for n in SIZES:
+        tick = bench_tick(n)
+        churn = bench_churn(n)
+        legacy = bench_legacy(n) if n <= 100_000 else None
+        legacy_str = f"{legacy * 1e6:11.1f} us" if legacy is not None else f"{'-':>14}"
+        print(f"{n:>10} {tick * 1e6:9.2f} us {churn * 1e6:9.2f} us {legacy_str}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Benchmark: SqliteTaskStore indexed reads and writes (add, list, reminder ticks, sweeps, delete) with a large table
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_parser import Task
+from task_store import SqliteTaskStore
+
+ROWS = int(os.getenv("BENCH_ROWS", "1000000"))
+USERS = 10_000
+OPS = 2_000
+PASTE = 100  # Lines in one pasted batch
+TICK = 50  # Reminders fired, or tasks expired, at once
+
+def make_task(i, now):
+    deadline_dt = now + timedelta(minutes=random.randint(30, 7 * 24 * 60))
+    deadline = f"{deadline_dt.hour}h{deadline_dt.minute} {deadline_dt.day}/{deadline_dt.month}/{deadline_dt.year}"
+    return Task(f"https://ghn.vn/ticket/{i}", f"VN{i:08d}", f"{now.day}/{now.month}/{now.year}",
+                deadline, int(deadline_dt.timestamp()))
+
+def timed(label, ops, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / ops * 1e6:10.1f} us/op")
+
+def main():
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteTaskStore(os.path.join(tmp, 'bench.db'))
+
+        start = time.perf_counter()
+        store.conn.execute('BEGIN')
+        store.conn.executemany(
+            store.INSERT_TASK,
+            (store._row(i % USERS, make_task(i, now)) for i in range(ROWS)))
+        store.conn.execute('COMMIT')
+        print(f"Seeded {ROWS} rows in {time.perf_counter() - start:.1f}s")
+
+        new_ids = []
+        timed("add (autocommit)", OPS, lambda: new_ids.extend(
+            store.add(random.randrange(USERS), make_task(ROWS + i, now)) for i in range(OPS)))
+        timed("list_user (~100 rows)", OPS, lambda: [
+            store.list_user(random.randrange(USERS)) for _ in range(OPS)])
+        timed("find_by_order_id", OPS, lambda: [
+            store.find_by_order_id(i % USERS, f"VN{i:08d}")
+            for i in random.sample(range(ROWS), OPS)])
+        timed("due_before (next minute)", OPS, lambda: [
+            store.due_before(int(now.timestamp()) + 60) for _ in range(OPS)])
+        paste = [make_task(ROWS + OPS + i, now) for i in range(PASTE)]
+        timed(f"add_many ({PASTE}-line paste)", OPS // PASTE, lambda: [
+            store.add_many(random.randrange(USERS), paste) for _ in range(OPS // PASTE)])
+        # A reminder tick: each fired key marked, half the tasks finished
+        ticks = [random.sample(range(ROWS), TICK) for _ in range(OPS // TICK)]
+        timed(f"mark_reminded_many ({TICK}/tick)", len(ticks), lambda: [
+            store.mark_reminded_many(ids[:TICK // 2], [f"{i}:0@30" for i in ids]) for ids in ticks])
+        timed(f"forget_reminded ({TICK}/sweep)", len(ticks), lambda: [
+            store.forget_reminded([f"{i}:0@30" for i in ids]) for ids in ticks])
+        timed(f"expire_many ({TICK}/sweep)", len(ticks), lambda: [
+            store.expire_many(ids[TICK // 2:]) for ids in ticks])
+        timed("delete", OPS, lambda: [store.delete(task_id) for task_id in new_ids])
+        timed("clear_user (~100 rows)", OPS // 10, lambda: [
+            store.clear_user(user_id) for user_id in random.sample(range(USERS), OPS // 10)])
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Benchmark: registering users, old re-read-users.txt save_user vs UserRegistry
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_store import JournalTaskStore, SqliteTaskStore
+from user_registry import UserRegistry
+
+USERS = int(os.getenv("BENCH_USERS", "100000"))
+LEGACY_OPS = 200  # The old path is O(file size) per call; sample it
+
+def legacy_save_user(users_file, user_id):
+    """save_user as it was: parse the whole file to check membership, then append"""
+    users_in_file = set()
+    try:
+        with open(users_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                uid = line.strip()
+                if uid and uid.isdigit():
+                    users_in_file.add(int(uid))
+    except FileNotFoundError:
+        pass
+    if user_id not in users_in_file:
+        with open(users_file, 'a', encoding='utf-8') as f:
+            f.write(f"{user_id}\n")
+
+def timed(label, ops, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / ops * 1e6:10.2f} us/op")
+
+def bench_legacy(tmp, user_ids):
+    users_file = os.path.join(tmp, 'legacy_users.txt')
+    with open(users_file, 'w', encoding='utf-8') as f:
+        f.write(''.join(f"{user_id}\n" for user_id in user_ids))
+    known = random.sample(user_ids, LEGACY_OPS)
+    timed(f"legacy save_user, known ({len(user_ids)} in file)", LEGACY_OPS,
+          lambda: [legacy_save_user(users_file, user_id) for user_id in known])
+
+def bench_registry(label, store, user_ids):
+    registry = UserRegistry(store)
+    timed(f"{label}: add {len(user_ids)} new", len(user_ids),
+          lambda: ([registry.add(user_id) for user_id in user_ids], registry.flush()))
+    repeat = [random.choice(user_ids) for _ in range(len(user_ids))]
+    timed(f"{label}: add known (every update)", len(repeat),
+          lambda: [registry.add(user_id) for user_id in repeat])
+    store.close()
+    reloaded = UserRegistry(store)
+    timed(f"{label}: load {len(user_ids)} at startup", 1, reloaded.load)
+    assert len(reloaded) == len(user_ids)
+    store.close()
+
+def main():
+    user_ids = random.sample(range(10**8, 10**10), USERS)
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_legacy(tmp, user_ids)
+        bench_registry("journal users.txt", JournalTaskStore(os.path.join(tmp, 'tasks'),
+                                                             os.path.join(tmp, 'users.txt')), user_ids)
+        bench_registry("sqlite", SqliteTaskStore(os.path.join(tmp, 'tasks.db')), user_ids)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# End-to-end load test: the real bot process against fake_bot_api.py
+#
+#   python benchmarks/load_harness.py --users 2000 --rounds 3 --latency 0.05 --rate-429 0.01
+#   python benchmarks/load_harness.py --users 2000 --mode webhook
+#   python benchmarks/load_harness.py --users 500 --heavy-users 5 --env UPDATE_CONCURRENCY=1
+#
+# Every simulated user pastes a batch of tasks, runs /list, then /del 1.
+# Reports updates/s and reply latency percentiles + histogram per action.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+# Add repo root to path to import modules
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO)
+
+from benchmarks.workload import generate_workload
+from fake_bot_api import FakeBotApi
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies):
+    """Percentiles and histogram (ms) for one action"""
+    values = sorted(latencies)
+    histogram = {}
+    for value in values:
+        bound = next((b for b in BUCKETS_MS if value <= b), None)
+        label = f"<={bound}" if bound else f">{BUCKETS_MS[-1]}"
+        histogram[label] = histogram.get(label, 0) + 1
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 0.50),
+        'p90_ms': percentile(values, 0.90),
+        'p99_ms': percentile(values, 0.99),
+        'max_ms': values[-1] if values else None,
+        'histogram': histogram,
+    }
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def wait_for_port(port, deadline):
+    """The webhook is registered before PTB's server starts listening"""
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"Webhook server never listened on port {port}")
+
+def mode_env(mode):
+    if mode != 'webhook':
+        return {'BOT_MODE': 'polling'}
+    port = free_port()
+    return {
+        'BOT_MODE': 'webhook',
+        'WEBHOOK_URL': f"http://127.0.0.1:{port}/telegram",
+        'WEBHOOK_LISTEN': '127.0.0.1',
+        'WEBHOOK_PORT': str(port),
+        'WEBHOOK_SECRET': 'load-harness-secret',
+    }
+
+async def start_bot(api, workdir, extra_env):
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_BOT_TOKEN': '123456:FAKE-TOKEN',
+        'TELEGRAM_CHAT_ID': '1',
+        'TELEGRAM_API_BASE_URL': api.base_url,
+        'TASK_DB': os.path.join(workdir, 'tasks.db'),
+        'PYTHONUNBUFFERED': '1',
+    })
+    env.update(extra_env)
+    log = open(os.path.join(workdir, 'bot.log'), 'w', encoding='utf-8')
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(REPO, 'working_chat_bot.py'),
+        cwd=workdir, env=env, stdout=log, stderr=asyncio.subprocess.STDOUT)
+    # Ready once the bot starts long polling (or registers its webhook)
+    deadline = time.monotonic() + 30
+    while not (api.calls.get('getUpdates') or api.calls.get('setWebhook')):
+        if process.returncode is not None or time.monotonic() > deadline:
+            raise RuntimeError(f"Bot did not start, see {log.name}")
+        await asyncio.sleep(0.05)
+    if 'WEBHOOK_PORT' in env:
+        await wait_for_port(int(env['WEBHOOK_PORT']), deadline)
+    return process, log
+
+async def stop_bot(process):
+    if process.returncode is None:
+        process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(process.wait(), 30)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+async def run_user(api, user_id, lines, rounds, tasks_per_paste, timeout, latencies, failures, prefix=''):
+    async def action(name, text):
+        name = prefix + name
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(api.inject_message(user_id, text), timeout)
+        except asyncio.TimeoutError:
+            failures[name] = failures.get(name, 0) + 1
+            return
+        latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+
+    for r in range(rounds):
+        batch = lines[r * tasks_per_paste:(r + 1) * tasks_per_paste]
+        await action('paste', '\n'.join(batch))
+        await action('/list', '/list')
+        await action('/del', '/del 1')
+
+async def run(args):
+    api = FakeBotApi(latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                     retry_after=args.retry_after, rate_5xx=args.rate_5xx, seed=args.seed)
+    await api.start()
+    workload = generate_workload(args.users, args.rounds * args.tasks, seed=args.seed)
+    # Heavy users paste --heavy-tasks lines at once; their ids don't clash with the light ones
+    heavy = generate_workload(args.heavy_users, args.rounds * args.heavy_tasks, seed=args.seed + 1)
+    heavy = {2_000_000 + i: lines for i, lines in enumerate(heavy.values())}
+    extra_env = mode_env(args.mode)
+    extra_env.update(item.split('=', 1) for item in args.env)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, log = await start_bot(api, workdir, extra_env)
+        latencies = {}
+        failures = {}
+        rng = random.Random(args.seed)
+        try:
+            async def staggered(user_id, lines, tasks, prefix):
+                # Spread arrivals over the ramp-up window
+                await asyncio.sleep(rng.random() * args.ramp)
+                await run_user(api, user_id, lines, args.rounds, tasks, args.timeout, latencies, failures, prefix)
+
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(staggered(user_id, lines, args.tasks, '') for user_id, lines in workload.items()),
+                *(staggered(user_id, lines, args.heavy_tasks, 'heavy ') for user_id, lines in heavy.items()))
+            elapsed = time.perf_counter() - start
+        finally:
+            await stop_bot(process)
+            log.close()
+            await api.stop()
+
+    updates = (args.users + args.heavy_users) * args.rounds * 3
+    report = {
+        'meta': {
+            'mode': args.mode,
+            'users': args.users,
+            'rounds': args.rounds,
+            'tasks_per_paste': args.tasks,
+            'heavy_users': args.heavy_users,
+            'heavy_tasks_per_paste': args.heavy_tasks,
+            'latency': args.latency,
+            'jitter': args.jitter,
+            'rate_429': args.rate_429,
+            'rate_5xx': args.rate_5xx,
+            'env': extra_env,
+        },
+        'elapsed_s': elapsed,
+        'updates': updates,
+        'updates_per_s': updates / elapsed,
+        'timeouts': failures,
+        'api_calls': api.calls,
+        'injected_errors': api.injected,
+        'actions': {name: summarize(values) for name, values in latencies.items()},
+    }
+    print(f"{updates} updates in {elapsed:.1f}s = {updates / elapsed:.1f} updates/s", file=sys.stderr)
+    for name, summary in report['actions'].items():
+        print(f"  {name:<12} p50 {summary['p50_ms']:8.1f} ms  p90 {summary['p90_ms']:8.1f} ms  "
+              f"p99 {summary['p99_ms']:8.1f} ms  timeouts {failures.get(name, 0)}", file=sys.stderr)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test working_chat_bot.py against a fake Bot API")
+    parser.add_argument('--mode', default='polling', choices=['polling', 'webhook'])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=1, help="paste + /list + /del cycles per user")
+    parser.add_argument('--tasks', type=int, default=5, help="task lines per paste")
+    parser.add_argument('--heavy-users', type=int, default=0, help="users pasting --heavy-tasks lines at once")
+    parser.add_argument('--heavy-tasks', type=int, default=1000)
+    parser.add_argument('--ramp', type=float, default=1.0, help="seconds over which users arrive")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds to wait for a reply")
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-5xx', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--env', action='append', default=[], help="extra KEY=VALUE for the bot process")
+    parser.add_argument('--output', help="write JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Microbenchmark suite for the TaskReminder hot paths, results as JSON
+#
+#   python benchmarks/run_benchmarks.py --sizes 10x100,100x100 --output before.json
+#   python benchmarks/run_benchmarks.py --compare before.json
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Add repo root to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import task_parser
+import working_chat_bot
+from benchmarks.workload import FakeBot, generate_workload
+from working_chat_bot import TaskReminder
+
+DEFAULT_SIZES = "10x100,100x100,100x1000"
+
+def parse_sizes(text):
+    sizes = []
+    for item in text.split(','):
+        users, tasks = item.lower().split('x')
+        sizes.append((int(users), int(tasks)))
+    return sizes
+
+@contextlib.contextmanager
+def scratch_dir():
+    """Run in an empty directory so the bot's task/user files are throwaway"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the bot's per-operation prints so they don't dominate timings"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def timed(results, name, size, ops, fn):
+    with quiet():
+        start = time.perf_counter()
+        fn()
+        seconds = time.perf_counter() - start
+    results.append({
+        'name': name,
+        'size': size,
+        'ops': ops,
+        'seconds': seconds,
+        'per_op_us': seconds / ops * 1e6,
+    })
+    print(f"  {name:<28} {ops:>9} ops  {seconds / ops * 1e6:12.2f} us/op", file=sys.stderr)
+
+def new_reminder():
+    with quiet():
+        reminder = TaskReminder()
+        reminder.load_tasks()
+    reminder.set_bot(FakeBot())
+    return reminder
+
+def bench_size(results, users, tasks_per_user, store_kind):
+    size = f"{users}x{tasks_per_user}"
+    print(f"{size} ({store_kind})", file=sys.stderr)
+    workload = generate_workload(users, tasks_per_user)
+    all_lines = [line for lines in workload.values() for line in lines]
+    total = len(all_lines)
+
+    timed(results, 'parse_task_line', size, total,
+          lambda: [task_parser.parse_task_line(line) for line in all_lines])
+    deadlines = [task.deadline for task in task_parser.parse_many(all_lines)]
+    timed(results, 'parse_deadline', size, total,
+          lambda: [task_parser.parse_deadline(deadline) for deadline in deadlines])
+    timed(results, 'parse_many', size, total, lambda: task_parser.parse_many(all_lines))
+
+    with scratch_dir():
+        working_chat_bot.TASK_STORE = store_kind
+        reminder = new_reminder()
+
+        # Single-line adds for the first user, batch pastes for everybody else
+        first_user, *other_users = workload
+        first_lines = workload[first_user]
+        timed(results, 'add_task_from_message', size, len(first_lines),
+              lambda: [reminder.add_task_from_message(line, first_user) for line in first_lines])
+        timed(results, 'add_tasks_batch', size, max(1, total - len(first_lines)),
+              lambda: [reminder.add_tasks_batch(workload[user_id], user_id) for user_id in other_users])
+
+        timed(results, 'format_task_list', size, users,
+              lambda: [reminder.format_task_list(user_id) for user_id in workload])
+
+        # Ticks with nothing due, then one tick firing everything due within 2 hours
+        now = reminder.clock.now()
+        ticks = 1000
+        timed(results, 'check_reminders (idle)', size, ticks,
+              lambda: [reminder.check_reminders(now) for _ in range(ticks)])
+        due = []
+        timed(results, 'check_reminders (2h due)', size, 1,
+              lambda: due.extend(reminder.check_reminders(now + 2 * 3600)))
+        timed(results, 'deliver reminders', size, max(1, len(due)),
+              lambda: asyncio.run(reminder.outbox.run(reminder.deliver_message, until_empty=True)))
+
+        timed(results, 'save_tasks', size, 1, reminder.save_tasks)
+        with quiet():
+            reminder.store.close()
+        loaded = []
+        timed(results, 'load_tasks', size, 1, lambda: loaded.append(new_reminder()))
+        with quiet():
+            loaded[0].store.close()
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return None
+
+def compare(old_file, report):
+    """Print per-benchmark ratio new/old (>1 means slower)"""
+    with open(old_file, 'r', encoding='utf-8') as f:
+        old = {(r['name'], r['size']): r for r in json.load(f)['results']}
+    print(f"{'benchmark':<28} {'size':<10} {'old us/op':>12} {'new us/op':>12} {'ratio':>7}", file=sys.stderr)
+    for result in report['results']:
+        before = old.get((result['name'], result['size']))
+        if before:
+            ratio = result['per_op_us'] / before['per_op_us'] if before['per_op_us'] else float('inf')
+            print(f"{result['name']:<28} {result['size']:<10} {before['per_op_us']:12.2f} "
+                  f"{result['per_op_us']:12.2f} {ratio:7.2f}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Time TaskReminder hot paths and emit JSON")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma separated USERSxTASKS, e.g. 10x100,100x1000")
+    parser.add_argument('--store', default='sqlite', choices=['sqlite', 'journal'])
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    parser.add_argument('--compare', help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for users, tasks_per_user in parse_sizes(args.sizes):
+        bench_size(results, users, tasks_per_user, args.store)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'store': args.store,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    if args.compare:
+        compare(args.compare, report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
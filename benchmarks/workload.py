@@ -0,0 +1,58 @@
+# benchmarks/workload.py
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from task_parser import get_timezone
+
+HOSTS = ['https://ghn.vn', 'https://khachhang.ghn.vn', 'https://nhanh.vn', 'https://shopee.vn']
+
+class FakeBot:
+    """Stand-in for telegram.Bot that records sends instead of calling the API"""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = []  # [(chat_id, text, perf_counter at completion)]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append((chat_id, text, time.perf_counter()))
+
+def task_line(i, deadline_dt, fmt=0):
+    """One ticket line in one of the formats listed in /help"""
+    link = f"{HOSTS[i % len(HOSTS)]}/ticket/{i}"
+    gio = f"{deadline_dt.hour}h{deadline_dt.minute:02d}"
+    ngay = f"{deadline_dt.day}/{deadline_dt.month}/{deadline_dt.year}"
+    created = f"{deadline_dt.day}/{deadline_dt.month}/{deadline_dt.year}"
+    if fmt == 1:
+        return f"{link} , VN{i:08d} , {created} , {gio} , {ngay}"
+    if fmt == 2:
+        return f"{link} VN{i:08d} {created} {gio} {ngay}"
+    if fmt == 3:
+        return f"{link} | VN{i:08d} | 16-thg 1 | {deadline_dt.hour}H {deadline_dt.day}/{deadline_dt.month}"
+    return f"{link} | VN{i:08d} | {created} | {gio} | {ngay}"
+
+def deadline_spread(rng, now):
+    """Realistic deadline: mostly within the shift, some later this week"""
+    if rng.random() < 0.7:
+        minutes = rng.randint(31, 10 * 60)
+    else:
+        minutes = rng.randint(10 * 60, 7 * 24 * 60)
+    return now + timedelta(minutes=minutes)
+
+def generate_workload(users, tasks_per_user, seed=42, now=None):
+    """Return {user_id: [task lines]} for users x tasks_per_user tickets"""
+    rng = random.Random(seed)
+    now = (now or datetime.now(get_timezone())).replace(second=0, microsecond=0)
+    workload = {}
+    i = 0
+    for u in range(users):
+        user_id = 1_000_000 + u
+        lines = []
+        for _ in range(tasks_per_user):
+            fmt = rng.choices([0, 1, 2, 3], [7, 1, 1, 1])[0]
+            lines.append(task_line(i, deadline_spread(rng, now), fmt))
+            i += 1
+        workload[user_id] = lines
+    return workload
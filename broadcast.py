@@ -0,0 +1,133 @@
+# broadcast.py
+import asyncio
+import os
+import time
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+
+
+def retry_after_seconds(error):
+    """Seconds to wait from a RetryAfter error (int or timedelta depending on PTB version)"""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        delay = delay.total_seconds()
+    return float(delay)
+
+
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second on average"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while (Telegram flood control)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class Broadcaster:
+    """Send one message to many chats within Telegram rate limits, resumable after restart
+
+    Limits: `global_rate` messages/s overall (~30 for Telegram), one
+    message per `per_chat_interval` seconds to the same chat, and at most
+    `concurrency` requests in flight. Each finished chat is appended to a
+    checkpoint file so a restarted broadcast skips chats already handled.
+    Pass the outbox's `bucket` to share one rate limit with it.
+    """
+
+    def __init__(self, global_rate=30, per_chat_interval=1.0, concurrency=20,
+                 checkpoint_dir='broadcasts', max_retries=5, bucket=None):
+        self.bucket = bucket if bucket is not None else TokenBucket(global_rate)
+        self.per_chat_interval = per_chat_interval
+        self.concurrency = concurrency
+        self.checkpoint_dir = checkpoint_dir
+        self.max_retries = max_retries
+        self.last_sent = {}  # {chat_id: monotonic time of last send}
+
+    def checkpoint_file(self, name):
+        return os.path.join(self.checkpoint_dir, f"{name}.done")
+
+    def load_checkpoint(self, name):
+        """Return {chat_id: ok} for chats already handled by broadcast `name`"""
+        done = {}
+        try:
+            with open(self.checkpoint_file(name), 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[0].lstrip('-').isdigit():
+                        done[int(parts[0])] = parts[1] == 'ok'
+        except FileNotFoundError:
+            pass
+        return done
+
+    async def run(self, name, chat_ids, send):
+        """Call `await send(chat_id)` for every chat, return the chat_ids that succeeded"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        done = self.load_checkpoint(name)
+        pending = [chat_id for chat_id in chat_ids if chat_id not in done]
+        if done:
+            print(f"Broadcast {name}: resuming, {len(done)} chats already done, {len(pending)} left")
+
+        queue = asyncio.Queue()
+        for chat_id in pending:
+            queue.put_nowait(chat_id)
+
+        with open(self.checkpoint_file(name), 'a', encoding='utf-8') as checkpoint:
+            async def worker():
+                while True:
+                    try:
+                        chat_id = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    ok = await self.send_one(chat_id, send)
+                    done[chat_id] = ok
+                    checkpoint.write(f"{chat_id} {'ok' if ok else 'failed'}\n")
+                    checkpoint.flush()
+
+            workers = min(self.concurrency, len(pending))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+        sent = [chat_id for chat_id, ok in done.items() if ok]
+        print(f"Broadcast {name}: {len(sent)} sent, {len(done) - len(sent)} failed")
+        return sent
+
+    async def send_one(self, chat_id, send):
+        """Send to one chat honouring rate limits and RetryAfter, return True on success"""
+        for _ in range(self.max_retries):
+            wait = self.last_sent.get(chat_id, 0.0) + self.per_chat_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.bucket.acquire()
+            self.last_sent[chat_id] = time.monotonic()
+            try:
+                await send(chat_id)
+                return True
+            except RetryAfter as e:
+                delay = retry_after_seconds(e)
+                print(f"Flood control: pausing sends for {delay}s")
+                self.bucket.pause(delay)
+            except Exception as e:
+                print(f"Error broadcasting to {chat_id}: {e}")
+                return False
+        return False
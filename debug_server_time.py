@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timezone
 from dotenv import load_dotenv
+from task_parser import deadline_timestamp, get_timezone
 
 load_dotenv()
 
@@ -18,7 +20,6 @@ def debug_server_time():
     
     # 2. Check system timezone
     try:
-        import time
         tz = time.tzname
         print(f"🌐 System timezone: {tz}")
     except:
@@ -32,29 +33,23 @@ def debug_server_time():
         "00h30 19/1/2026"
     ]
     
+    # The bot reads deadlines in the user's timezone (default task_parser.DEFAULT_TIMEZONE)
+    # and keeps UTC epoch seconds, so the server timezone printed above must not matter
+    tz = get_timezone()
+    now_ts = time.time()
+    print(f"🌏 Bot timezone: {tz.key}, now there: {datetime.fromtimestamp(now_ts, tz)}")
     for deadline_str in test_deadlines:
-        try:
-            # Simulate parsing logic
-            import re
-            match = re.match(r'(\d+)[hH](\d+)\s+(\d+)/(\d+)/(\d+)', deadline_str)
-            if match:
-                hour = int(match.group(1))
-                minute = int(match.group(2))
-                day = int(match.group(3))
-                month = int(match.group(4))
-                year = int(match.group(5))
-                
-                deadline_dt = datetime(year, month, day, hour, minute, 0)
-                reminder_time = deadline_dt - timedelta(minutes=30)
-                
-                print(f"📅 {deadline_str}")
-                print(f"   Deadline: {deadline_dt}")
-                print(f"   Reminder: {reminder_time}")
-                print(f"   Time diff: {(now - reminder_time).total_seconds() / 60:.1f} minutes")
-                print(f"   Should remind: {abs((now - reminder_time).total_seconds()) < 60}")
-                print()
-        except Exception as e:
-            print(f"❌ Error parsing {deadline_str}: {e}")
+        deadline_ts = deadline_timestamp(deadline_str, tz)
+        if deadline_ts is None:
+            print(f"❌ Error parsing {deadline_str}")
+            continue
+        reminder_ts = deadline_ts - 30 * 60
+        print(f"📅 {deadline_str}")
+        print(f"   Deadline (UTC epoch): {deadline_ts} = {datetime.fromtimestamp(deadline_ts, timezone.utc)}")
+        print(f"   Reminder ({tz.key}): {datetime.fromtimestamp(reminder_ts, tz)}")
+        print(f"   Reminder (server local): {datetime.fromtimestamp(reminder_ts)}")
+        print(f"   Time diff: {(now_ts - reminder_ts) / 60:.1f} minutes")
+        print()
     
     # 4. Check environment
     print("🔧 ENVIRONMENT CHECK:")
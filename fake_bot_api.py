@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# fake_bot_api.py - local stand-in for the Telegram Bot API used by load tests
+#
+# Point the bot at it with TELEGRAM_API_BASE_URL=http://127.0.0.1:<port>/bot
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from urllib.parse import parse_qsl
+
+import httpx
+
+BOT_USER = {'id': 100000001, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_reminder_bot'}
+
+# Methods that deliver something to a user; only these get latency/error injection
+SEND_METHODS = {'sendMessage', 'editMessageText', 'sendDocument'}
+
+
+class FakeBotApi:
+    """Minimal HTTP/1.1 Bot API server: getUpdates, sendMessage, editMessageText, setWebhook
+
+    Updates are injected with inject_message(); each returns a future that
+    resolves with the next message the bot sends (or edits) in that chat.
+    Latency, 429 RetryAfter and 5xx responses are injected on send methods.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 rate_429=0.0, retry_after=1, rate_5xx=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_5xx = rate_5xx
+        self.random = random.Random(seed)
+        self.updates = []  # Pending updates for getUpdates
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.new_update = asyncio.Event()
+        self.waiters = {}  # {chat_id: [futures waiting for the bot's next message]}
+        self.sent = {}  # {chat_id: [texts the bot sent]}
+        self.calls = {}  # {method: count}
+        self.injected = {'429': 0, '5xx': 0}
+        self.webhook_url = ''
+        self.webhook_secret = None
+        self.webhook_max_connections = 40
+        self._webhook_client = None
+        self._webhook_semaphore = None
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Fake Bot API listening on {self.base_url}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._webhook_client:
+            await self._webhook_client.aclose()
+
+    # --- simulated users ---
+
+    def inject_message(self, user_id, text):
+        """Queue a private message from user_id, return a future for the bot's reply"""
+        message = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"},
+            'text': text,
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return self._inject({'message': message}, user_id)
+
+    def inject_callback(self, user_id, message_id, data):
+        """Queue an inline-button press, return a future for the bot's reply/edit"""
+        callback = {
+            'id': str(next(self.update_ids)),
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': '...',
+            },
+        }
+        return self._inject({'callback_query': callback}, user_id)
+
+    def _inject(self, payload, chat_id):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(chat_id, []).append(future)
+        update = {'update_id': next(self.update_ids), **payload}
+        if self.webhook_url:
+            asyncio.get_running_loop().create_task(self._push_webhook(update))
+        else:
+            self.updates.append(update)
+            self.new_update.set()
+        return future
+
+    def _deliver(self, chat_id, message):
+        self.sent.setdefault(chat_id, []).append(message.get('text'))
+        waiters = self.waiters.get(chat_id)
+        while waiters:
+            future = waiters.pop(0)
+            if not future.done():
+                future.set_result(message)
+                break
+
+    async def _push_webhook(self, update):
+        if self._webhook_client is None:
+            self._webhook_client = httpx.AsyncClient(timeout=30)
+            self._webhook_semaphore = asyncio.Semaphore(self.webhook_max_connections)
+        headers = {}
+        if self.webhook_secret:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = self.webhook_secret
+        async with self._webhook_semaphore:
+            try:
+                await self._webhook_client.post(self.webhook_url, json=update, headers=headers)
+            except httpx.HTTPError as e:
+                print(f"Webhook delivery failed: {e}")
+
+    # --- HTTP plumbing ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self._dispatch(path, headers.get('content-type', ''), body)
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: keep-alive\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down mid long-poll
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_params(content_type, body):
+        if not body:
+            return {}
+        if 'application/json' in content_type:
+            return json.loads(body)
+        if 'multipart/form-data' in content_type:
+            # Documents are not inspected; only count the call
+            return {}
+        params = {}
+        for key, value in parse_qsl(body.decode('utf-8'), keep_blank_values=True):
+            try:
+                params[key] = json.loads(value) if value[:1] in '{[0123456789-' or value in ('true', 'false') else value
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def _dispatch(self, path, content_type, body):
+        method = path.rstrip('/').rsplit('/', 1)[-1].split('?')[0]
+        params = self._parse_params(content_type, body)
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        if method in SEND_METHODS:
+            if self.latency or self.jitter:
+                await asyncio.sleep(self.latency + self.random.random() * self.jitter)
+            roll = self.random.random()
+            if roll < self.rate_429:
+                self.injected['429'] += 1
+                return 429, {'ok': False, 'error_code': 429,
+                             'description': f"Too Many Requests: retry after {self.retry_after}",
+                             'parameters': {'retry_after': self.retry_after}}
+            if roll < self.rate_429 + self.rate_5xx:
+                self.injected['5xx'] += 1
+                return 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+
+        handler = getattr(self, f"api_{method}", None)
+        result = await handler(params) if handler else True
+        return 200, {'ok': True, 'result': result}
+
+    # --- Bot API methods ---
+
+    async def api_getMe(self, params):
+        return BOT_USER
+
+    async def api_getUpdates(self, params):
+        offset = int(params.get('offset') or 0)
+        if offset:
+            self.updates = [u for u in self.updates if u['update_id'] >= offset]
+        if not self.updates:
+            self.new_update.clear()
+            try:
+                await asyncio.wait_for(self.new_update.wait(), float(params.get('timeout') or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return self.updates[:limit]
+
+    def _message(self, chat_id, text, message_id=None):
+        return {
+            'message_id': message_id or next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': str(text),
+        }
+
+    async def api_sendMessage(self, params):
+        chat_id = int(params['chat_id'])
+        message = self._message(chat_id, params.get('text', ''))
+        self._deliver(chat_id, message)
+        return message
+
+    async def api_editMessageText(self, params):
+        chat_id = int(params['chat_id'])
+        message = self._message(chat_id, params.get('text', ''), int(params['message_id']))
+        self._deliver(chat_id, message)
+        return message
+
+    async def api_sendDocument(self, params):
+        chat_id = int(params.get('chat_id', 0))
+        message = self._message(chat_id, '[document]')
+        self._deliver(chat_id, message)
+        return message
+
+    async def api_setWebhook(self, params):
+        self.webhook_url = params.get('url', '')
+        self.webhook_secret = params.get('secret_token')
+        self.webhook_max_connections = int(params.get('max_connections') or 40)
+        # Telegram hands queued updates to the new webhook
+        pending, self.updates = self.updates, []
+        for update in pending:
+            asyncio.get_running_loop().create_task(self._push_webhook(update))
+        return True
+
+    async def api_deleteWebhook(self, params):
+        self.webhook_url = ''
+        self.webhook_secret = None
+        return True
+
+    async def api_getWebhookInfo(self, params):
+        return {'url': self.webhook_url, 'has_custom_certificate': False,
+                'pending_update_count': len(self.updates)}
+
+
+async def serve(args):
+    api = FakeBotApi(args.host, args.port, args.latency, args.jitter, args.rate_429,
+                     args.retry_after, args.rate_5xx)
+    await api.start()
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every send")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds per send")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="fraction of sends answered 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help="fraction of sends answered 502")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,256 @@
+# metrics.py
+#
+# In-process counters and histograms, rendered in the Prometheus text
+# format by a small HTTP listener (METRICS_PORT) and summarised by /stats.
+# Recording is a dict lookup plus a bisect under a lock; anything costly
+# (task counts, queue sizes) is computed by callbacks only when scraped.
+
+import asyncio
+import bisect
+import functools
+import threading
+import time
+
+# Seconds; handlers and sends are milliseconds, reminder lag can be minutes after downtime
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children = {}  # {label values: child}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self.new_child()
+
+    def labels(self, *values):
+        """Child for these label values (created on first use)"""
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(values, self.new_child())
+        return child
+
+    def label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self.children.items()):
+            lines.extend(self.render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    kind = 'counter'
+    new_child = _CounterChild
+
+    def inc(self, amount=1):
+        self.children[()].inc(amount)
+
+    def render_child(self, values, child):
+        return [f"{self.name}{self.label_text(values)} {child.value}"]
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """Context manager observing the seconds its block takes"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimate like Prometheus histogram_quantile: interpolate inside the bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # Beyond the last bound: report the bound
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.children[()].observe(value)
+
+    def time(self):
+        return self.children[()].time()
+
+    def render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), child.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self.label_text(values, [('le', bound)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self.label_text(values)} {child.sum}")
+        lines.append(f"{self.name}_count{self.label_text(values)} {child.count}")
+        return lines
+
+
+class Gauge(Metric):
+    """Value read from fn() at scrape time; with labelnames fn returns {label values: value}"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn, labelnames=()):
+        self.fn = fn
+        super().__init__(name, help, labelnames)
+
+    @staticmethod
+    def new_child():
+        return None
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = self.fn() if self.labelnames else {(): self.fn()}
+        lines.extend(f"{self.name}{self.label_text(labels)} {value}" for labels, value in values.items())
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, fn, labelnames=()):
+        return self.register(Gauge(name, help, fn, labelnames))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# Shared by the bot, the outbox and the stores
+HANDLER_SECONDS = REGISTRY.histogram('bot_handler_seconds', 'Time spent in each update handler', ['handler'])
+HANDLER_ERRORS = REGISTRY.counter('bot_handler_errors_total', 'Handlers that raised', ['handler'])
+SEND_LAG = REGISTRY.histogram('bot_send_lag_seconds',
+                              'Delivery time minus the time the message was due', ['kind'])
+SEND_SECONDS = REGISTRY.histogram('bot_send_seconds', 'Bot API sendMessage latency')
+SENT = REGISTRY.counter('bot_messages_sent_total', 'Messages delivered by the outbox', ['kind'])
+SEND_ERRORS = REGISTRY.counter('bot_send_errors_total', 'Failed outbox sends by error type', ['type'])
+STORE_WRITE_SECONDS = REGISTRY.histogram('bot_store_write_seconds', 'Task store write time', ['op'])
+
+
+def timed(name):
+    """Decorator recording an async handler's latency and errors under handler=name"""
+    histogram = HANDLER_SECONDS.labels(name)
+    errors = HANDLER_ERRORS.labels(name)
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+async def serve(host, port, registry=REGISTRY):
+    """Serve GET /metrics on host:port until cancelled"""
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split(' ')
+            if len(parts) >= 2 and parts[1].split('?')[0] in ('/metrics', '/'):
+                status, body = '200 OK', registry.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Metrics on http://{host}:{server.sockets[0].getsockname()[1]}/metrics")
+    async with server:
+        await server.serve_forever()
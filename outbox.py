@@ -0,0 +1,285 @@
+# outbox.py
+import asyncio
+import heapq
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from broadcast import TokenBucket, retry_after_seconds
+from metrics import SEND_ERRORS, SEND_LAG, SEND_SECONDS, SENT
+
+
+class Outbox:
+    """Persistent queue of outgoing messages (reminders, greetings)
+
+    An entry is written to outbox.db before delivery and deleted only after
+    Telegram accepted it, so messages survive send errors and restarts.
+    Failed sends are retried with exponential backoff and jitter, flood
+    control waits exactly RetryAfter.retry_after. At most `concurrency`
+    sends are in flight and `rate` start per second, one at a time per
+    chat so a user's messages keep their order, and at most one per
+    `per_chat_interval` seconds to the same chat (Telegram's 1 msg/s).
+    Retry times run on time.monotonic(); outbox.db keeps them as epoch
+    seconds for the next run.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_at REAL NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'message',
+            due_at REAL
+        );
+    """
+
+    def __init__(self, db_file='outbox.db', concurrency=20, rate=30, base_delay=1.0, max_delay=600.0,
+                 per_chat_interval=1.0):
+        self.db_file = db_file
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.last_sent = {}  # {chat_id: monotonic time of the last send attempt}
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0  # Permanent errors: chat gone, bot blocked, bad request
+        self._heap = []  # [(next_at, entry_id)], next_at on time.monotonic()
+        self._entries = {}  # {entry_id: [chat_id, text, attempts, next_at, kind, due_at]}, next_at monotonic
+        self._busy = {}  # {chat_id: [entry ids waiting behind the one in flight]}
+        self._lock = threading.Lock()  # Entries may be added from worker threads
+        self._conn = None
+        self._loop = None
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(self.SCHEMA)
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(outbox)')}
+            if 'due_at' not in columns:
+                # Outbox written before delivery lag was measured
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN kind TEXT NOT NULL DEFAULT 'message'")
+                self._conn.execute('ALTER TABLE outbox ADD COLUMN due_at REAL')
+        return self._conn
+
+    def load(self):
+        """Queue entries left over by the previous run, return how many"""
+        # Stored retry times are epoch seconds: only the time left is carried over
+        offset = time.monotonic() - time.time()
+        with self._lock:
+            for entry_id, chat_id, text, attempts, next_at, kind, due_at in self.conn.execute(
+                    'SELECT id, chat_id, text, attempts, next_at, kind, due_at FROM outbox ORDER BY id'):
+                next_at += offset
+                self._entries[entry_id] = [chat_id, text, attempts, next_at, kind, due_at]
+                self._heap.append((next_at, entry_id))
+            heapq.heapify(self._heap)
+            return len(self._entries)
+
+    def messages(self):
+        """Every queued (kind, [(chat_id, text, due_at)]), oldest first"""
+        by_kind = {}
+        with self._lock:
+            for kind, chat_id, text, due_at in self.conn.execute(
+                    'SELECT kind, chat_id, text, due_at FROM outbox ORDER BY id'):
+                by_kind.setdefault(kind, []).append((chat_id, text, due_at))
+        return list(by_kind.items())
+
+    def add(self, chat_id, text, kind='message'):
+        self.add_many([(chat_id, text, None)], kind)
+
+    def add_many(self, messages, kind='message'):
+        """Persist [(chat_id, text, due_at)] in one transaction and queue them for delivery
+
+        due_at is when the message was meant to go out (None = now); the
+        delivery lag against it is recorded per kind.
+        """
+        if not messages:
+            return
+        now = time.time()
+        rows = [(chat_id, text, now, kind, now if due_at is None else due_at) for chat_id, text, due_at in messages]
+        ready = time.monotonic()
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                entry_ids = [self.conn.execute(
+                    'INSERT INTO outbox (chat_id, text, next_at, kind, due_at) VALUES (?, ?, ?, ?, ?)', row).lastrowid
+                    for row in rows]
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            for entry_id, (chat_id, text, _, kind, due_at) in zip(entry_ids, rows):
+                self._entries[entry_id] = [chat_id, text, 0, ready, kind, due_at]
+                heapq.heappush(self._heap, (ready, entry_id))
+        self.wake()
+
+    def backoff(self, attempts):
+        """Delay before retry number `attempts`: exponential, capped, with equal jitter"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def run(self, send, until_empty=False):
+        """Deliver entries with `await send(chat_id, text)` as they come due
+
+        Runs forever (cancel to stop) unless until_empty is set, then it
+        returns once nothing is queued or in flight.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+
+        async def deliver_chat(entry_id):
+            """Send entry_id, then whatever queued up for the same chat meanwhile"""
+            try:
+                while entry_id is not None:
+                    chat_id = self._entries[entry_id][0]
+                    retry_at = await self.deliver(entry_id, send)
+                    with self._lock:
+                        waiting = self._busy[chat_id]
+                        if retry_at is not None:
+                            # Keep the chat's order: the rest waits behind the retried entry
+                            for waiting_id in waiting:
+                                heapq.heappush(self._heap, (retry_at, waiting_id))
+                            waiting.clear()
+                        entry_id = waiting.pop(0) if waiting else None
+                        if entry_id is None:
+                            del self._busy[chat_id]
+            finally:
+                slots.release()
+                self.wake()
+
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    due = []
+                    while self._heap and self._heap[0][0] <= now:
+                        _, entry_id = heapq.heappop(self._heap)
+                        if entry_id not in self._entries:
+                            continue
+                        chat_id = self._entries[entry_id][0]
+                        if chat_id in self._busy:
+                            self._busy[chat_id].append(entry_id)
+                        else:
+                            self._busy[chat_id] = []
+                            due.append(entry_id)
+                    next_at = self._heap[0][0] if self._heap else None
+                for entry_id in due:
+                    await slots.acquire()
+                    task = asyncio.create_task(deliver_chat(entry_id))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                if until_empty and not self._entries and not self._busy:
+                    return
+                if len(self.last_sent) > 4096:
+                    # Chats idle for longer than the interval need no spacing any more
+                    idle = time.monotonic() - self.per_chat_interval
+                    self.last_sent = {chat_id: at for chat_id, at in self.last_sent.items() if at > idle}
+                timeout = None if next_at is None else max(0.0, next_at - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            # Unfinished sends stay queued (and in outbox.db) for the next run
+            for task in in_flight:
+                task.cancel()
+            with self._lock:
+                self._busy.clear()
+                self._heap = [(entry[3], entry_id) for entry_id, entry in self._entries.items()]
+                heapq.heapify(self._heap)
+
+    async def deliver(self, entry_id, send):
+        """One send attempt; delete the entry when done, or reschedule it and return the retry time"""
+        chat_id, text, attempts, _, kind, due_at = self._entries[entry_id]
+        wait = self.last_sent.get(chat_id, 0.0) + self.per_chat_interval - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.bucket.acquire()
+        self.last_sent[chat_id] = time.monotonic()
+        start = time.perf_counter()
+        try:
+            await send(chat_id, text)
+        except RetryAfter as e:
+            SEND_ERRORS.labels('RetryAfter').inc()
+            delay = retry_after_seconds(e)
+            print(f"Flood control: pausing outbox for {delay}s")
+            self.bucket.pause(delay)
+            return self._reschedule(entry_id, attempts + 1, delay)
+        except (BadRequest, Forbidden) as e:
+            SEND_ERRORS.labels(type(e).__name__).inc()
+            print(f"Dropping message to {chat_id}: {e}")
+            self.dropped += 1
+            self._delete(entry_id)
+        except Exception as e:
+            SEND_ERRORS.labels(type(e).__name__).inc()
+            delay = self.backoff(attempts + 1)
+            print(f"Error sending to {chat_id} (attempt {attempts + 1}), retrying in {delay:.1f}s: {e}")
+            return self._reschedule(entry_id, attempts + 1, delay)
+        else:
+            SEND_SECONDS.observe(time.perf_counter() - start)
+            if due_at is not None:
+                SEND_LAG.labels(kind).observe(max(0.0, time.time() - due_at))
+            SENT.labels(kind).inc()
+            self.sent += 1
+            self._delete(entry_id)
+
+    def _reschedule(self, entry_id, attempts, delay):
+        next_at = time.monotonic() + delay
+        self.retried += 1
+        with self._lock:
+            self._entries[entry_id][2:4] = [attempts, next_at]
+            self.conn.execute('UPDATE outbox SET attempts = ?, next_at = ? WHERE id = ?',
+                              (attempts, time.time() + delay, entry_id))
+            heapq.heappush(self._heap, (next_at, entry_id))
+        return next_at
+
+    def _delete(self, entry_id):
+        with self._lock:
+            del self._entries[entry_id]
+            self.conn.execute('DELETE FROM outbox WHERE id = ?', (entry_id,))
+
+    def wake(self):
+        """Wake run() to look at the queue; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        else:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def destroy(self):
+        """Close the outbox and delete its files"""
+        self.close()
+        for path in (self.db_file, f"{self.db_file}-wal", f"{self.db_file}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
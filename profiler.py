@@ -0,0 +1,136 @@
+# profiler.py
+#
+# On-demand profiling of the live bot for the admin /profile command.
+# Nothing here runs until asked: the CPU sampler is a thread that exists
+# only for the requested seconds, and tracemalloc is started on the first
+# memory baseline and stopped again with /profile mem stop.
+
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# Frames kept per allocation traceback while tracemalloc is on
+TRACEMALLOC_FRAMES = 10
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread each `interval` seconds
+
+    Reading sys._current_frames() from a separate thread needs no tracing
+    hooks, so the profiled code runs at full speed; the cost is the
+    sampler thread itself, roughly one stack walk per thread per sample.
+    Coroutines show up under the event loop thread when they are running.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.duration = 0.0
+        self.stacks = collections.Counter()  # {(thread, label, ...): samples}, root first
+
+    def run(self, seconds):
+        """Sample for `seconds` (blocking: run it in a worker thread)"""
+        me = threading.get_ident()
+        names = {}
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        self.duration = time.perf_counter() - start
+        return self
+
+    def top(self, n=20):
+        """([(label, self samples)], [(label, cumulative samples)]), busiest first"""
+        own = collections.Counter()
+        cumulative = collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack[1:]):
+                cumulative[label] += count
+        return own.most_common(n), cumulative.most_common(n)
+
+    def summary(self, n=15):
+        total = sum(self.stacks.values()) or 1
+        own, cumulative = self.top(n)
+        lines = [f"🔬 CPU profile: {self.duration:.1f}s, {self.samples} mẫu", "", "Tự thân (self):"]
+        lines.extend(f"{count * 100 / total:5.1f}% {label}" for label, count in own)
+        lines.extend(["", "Tích lũy (cumulative):"])
+        lines.extend(f"{count * 100 / total:5.1f}% {label}" for label, count in cumulative)
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        """Folded stacks ("a;b;c count" per line) for flamegraph.pl or speedscope"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class MemoryTracker:
+    """tracemalloc baseline and diffs against it"""
+
+    def __init__(self):
+        self.baseline = None
+        self.started_at = None
+
+    @property
+    def active(self):
+        return self.baseline is not None
+
+    def start(self):
+        """Start tracing (if needed) and take the baseline"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.baseline = self.snapshot()
+        self.started_at = time.time()
+
+    def stop(self):
+        self.baseline = self.started_at = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @staticmethod
+    def snapshot():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ))
+
+    def diff(self, n=15):
+        """(summary text, full report text) of what grew since the baseline"""
+        snapshot = self.snapshot()
+        stats = snapshot.compare_to(self.baseline, 'lineno')
+        current, peak = tracemalloc.get_traced_memory()
+        growth = sum(stat.size_diff for stat in stats)
+        lines = [
+            f"🧠 Bộ nhớ sau {time.time() - self.started_at:.0f}s: {current / 2**20:.1f} MB "
+            f"(đỉnh {peak / 2**20:.1f} MB), thay đổi {growth / 2**20:+.2f} MB",
+            "",
+        ]
+        lines.extend(f"{stat.size_diff / 1024:+9.1f} KB {stat.count_diff:+7d} "
+                     f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}"
+                     for stat in stats[:n])
+        report = [str(stat) for stat in stats]
+        # Full tracebacks of the biggest growers
+        for stat in snapshot.compare_to(self.baseline, 'traceback')[:n]:
+            report.append('')
+            report.append(f"{stat.size_diff / 1024:+.1f} KB in {stat.count_diff:+d} blocks")
+            report.extend(stat.traceback.format())
+        return '\n'.join(lines), '\n'.join(report) + '\n'
@@ -0,0 +1,244 @@
+# scheduler.py
+import asyncio
+import bisect
+import heapq
+import itertools
+import threading
+import time
+
+_REMOVED = object()  # Placeholder payload for cancelled heap entries
+
+
+class ReminderScheduler:
+    """Min-heap of pending reminders keyed by fire time"""
+
+    def __init__(self):
+        self._heap = []  # [fire_at, seq, key, payload]
+        self._entries = {}  # {key: heap entry}
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._lock = threading.Lock()  # Tasks may also be added from worker threads
+        self._loop = None  # Loop of the coroutine blocked in wait()
+        self._wakeup = None
+        # Cold queue: reminders loaded from a snapshot as fire-ordered arrays,
+        # consumed by a cursor instead of being pushed onto the heap one by one
+        self._cold_fire = ()
+        self._cold_keys = ()
+        self._cold_sorted_keys = ()  # Cold keys sorted, for cancel/contains lookups
+        self._cold_key_positions = ()  # Fire-order position of each sorted key
+        self._cold_resolve = None  # position -> payload, called outside the lock
+        self._cold_pos = 0
+        self._cold_end = 0
+        self._cold_live = 0
+        self._cold_cancelled = set()
+
+    def __len__(self):
+        return len(self._entries) + self._cold_live
+
+    def __contains__(self, key):
+        return key in self._entries or self._cold_position(key) is not None
+
+    def load_sorted(self, fire_times, keys, sorted_keys, key_positions, resolve, start=0, end=None):
+        """Take over fire-ordered pending reminders without building heap entries
+
+        fire_times/keys are in fire order (ties in key order), sorted_keys and
+        key_positions map each key back to its position; only entries in
+        [start, end) are taken. Payloads are built lazily by resolve(position).
+        """
+        if end is None:
+            end = len(keys)
+        with self._lock:
+            self._cold_fire = fire_times
+            self._cold_keys = keys
+            self._cold_sorted_keys = sorted_keys
+            self._cold_key_positions = key_positions
+            self._cold_resolve = resolve
+            self._cold_pos = start
+            self._cold_end = end
+            self._cold_live = max(0, end - start)
+            self._cold_cancelled = set()
+
+    def _cold_position(self, key):
+        """Fire-order position of a still pending cold key, or None"""
+        i = bisect.bisect_left(self._cold_sorted_keys, key)
+        if i == len(self._cold_sorted_keys) or self._cold_sorted_keys[i] != key:
+            return None
+        position = self._cold_key_positions[i]
+        if not self._cold_pos <= position < self._cold_end or key in self._cold_cancelled:
+            return None
+        return position
+
+    def _cold_head(self):
+        """Position of the first pending cold entry, or None"""
+        while self._cold_pos < self._cold_end:
+            key = self._cold_keys[self._cold_pos]
+            if key not in self._cold_cancelled:
+                return self._cold_pos
+            self._cold_cancelled.discard(key)
+            self._cold_pos += 1
+        return None
+
+    def schedule(self, key, fire_at, payload):
+        """Schedule payload to fire at epoch seconds fire_at (replaces existing key)"""
+        with self._lock:
+            self._cancel_locked(key)
+            entry = [fire_at, next(self._counter), key, payload]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+            is_head = self._heap[0] is entry
+        if is_head:
+            self.wake()
+
+    def cancel(self, key):
+        """Cancel a scheduled key, returns True if it was pending"""
+        with self._lock:
+            was_head = bool(self._heap) and self._heap[0][2] == key
+            cold_head = self._cold_head()
+            was_head = was_head or (cold_head is not None and self._cold_keys[cold_head] == key)
+            found = self._cancel_locked(key)
+        if found and was_head:
+            self.wake()
+        return found
+
+    def _cancel_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            if self._cold_position(key) is None:
+                return False
+            self._cold_cancelled.add(key)
+            self._cold_live -= 1
+            return True
+        # Lazy deletion: mark the entry and let pop_due discard it
+        entry[3] = _REMOVED
+        self._cancelled += 1
+        if self._cancelled > 1024 and self._cancelled > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[3] is not _REMOVED]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def fire_time(self, key):
+        """Fire time of a pending key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            position = self._cold_position(key)
+            return None if position is None else self._cold_fire[position]
+
+    def next_fire_at(self):
+        """Return fire time of the earliest pending entry, or None"""
+        with self._lock:
+            self._drop_cancelled_head()
+            fire_at = self._heap[0][0] if self._heap else None
+            cold_head = self._cold_head()
+            if cold_head is not None:
+                cold_fire = self._cold_fire[cold_head]
+                fire_at = cold_fire if fire_at is None else min(fire_at, cold_fire)
+            return fire_at
+
+    def pop_due(self, now):
+        """Pop every entry whose fire time is <= now, each exactly once"""
+        due = []
+        cold = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, key, payload = heapq.heappop(self._heap)
+                if payload is _REMOVED:
+                    self._cancelled -= 1
+                    continue
+                del self._entries[key]
+                due.append((key, fire_at, payload))
+            position = self._cold_head()
+            while position is not None and self._cold_fire[position] <= now:
+                cold.append(position)
+                self._cold_pos += 1
+                self._cold_live -= 1
+                position = self._cold_head()
+        if cold:
+            # resolve may take other locks (e.g. a user's), so it runs unlocked
+            due += [(self._cold_keys[p], self._cold_fire[p], self._cold_resolve(p)) for p in cold]
+            due.sort(key=lambda item: item[1])
+        return due
+
+    def entries(self):
+        """Every pending (key, fire_at, payload), cold entries resolved"""
+        with self._lock:
+            pending = [(key, entry[0], entry[3]) for key, entry in self._entries.items()]
+            cold = [p for p in range(self._cold_pos, self._cold_end)
+                    if self._cold_keys[p] not in self._cold_cancelled]
+        return pending + [(self._cold_keys[p], self._cold_fire[p], self._cold_resolve(p)) for p in cold]
+
+    def fire_times(self):
+        """Every pending (key, fire_at), without building the payloads of cold entries"""
+        with self._lock:
+            pending = [(key, entry[0]) for key, entry in self._entries.items()]
+            pending += [(self._cold_keys[p], self._cold_fire[p]) for p in range(self._cold_pos, self._cold_end)
+                        if self._cold_keys[p] not in self._cold_cancelled]
+        return pending
+
+    def _drop_cancelled_head(self):
+        while self._heap and self._heap[0][3] is _REMOVED:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+    async def wait(self, timeout):
+        """Sleep up to timeout seconds, returning early when the schedule changes"""
+        if self._wakeup is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            woken = True
+        except asyncio.TimeoutError:
+            woken = False
+        self._wakeup.clear()
+        return woken
+
+    def wake(self):
+        """Wake the coroutine blocked in wait(); safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wakeup.set()
+        else:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+
+class MonotonicClock:
+    """UTC epoch seconds that advance with time.monotonic()
+
+    The wall clock is read once and the monotonic clock carries it
+    forward, so an NTP step or a manual date change cannot make the
+    scheduler's time jump between two reads. resync() re-anchors on the
+    wall clock when the two drifted apart by more than tolerance seconds
+    and returns the step, so the caller can say what happened.
+    """
+
+    def __init__(self, tolerance=2.0, wall=time.time, monotonic=time.monotonic):
+        self.tolerance = tolerance
+        self._wall = wall
+        self._monotonic = monotonic
+        self.steps = 0  # Wall-clock steps seen by resync
+        self._offset = wall() - monotonic()
+
+    def time(self):
+        return self._offset + self._monotonic()
+
+    def now(self):
+        """Whole epoch seconds, what every fire time is compared with"""
+        return int(self.time())
+
+    def resync(self):
+        """Follow a wall-clock step larger than tolerance; returns the step in seconds (0 if none)"""
+        step = self._wall() - self.time()
+        if abs(step) <= self.tolerance:
+            return 0.0
+        self._offset += step
+        self.steps += 1
+        return step
@@ -0,0 +1,232 @@
+# sharding.py
+#
+# BOT_SHARDS=N: a front process receives updates (polling or webhook) and
+# forwards each one to worker process user_id % N. Every worker owns its
+# users' tasks, scheduler and store file (tasks.<i>-of-<N>.db).
+
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+import task_parser
+import working_chat_bot as bot
+from update_processor import PerUserUpdateProcessor
+
+STATE_FILE = 'shards.json'  # Shard count the store files are currently laid out for
+
+# Commands that change state every shard keeps; non-owning shards apply them silently
+FANOUT_COMMANDS = ('/broadcast',)
+
+
+def shard_for(user_id, count):
+    """Shard owning user_id; updates without a user go to shard 0"""
+    return (user_id or 0) % count
+
+
+def recorded_shards():
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return int(json.load(f)['shards'])
+    except FileNotFoundError:
+        return 1
+
+
+def shard_stores(count):
+    if count == 1:
+        return [bot.make_store()]
+    return [bot.make_store((index, count)) for index in range(count)]
+
+
+def shard_outboxes(count):
+    if count == 1:
+        return [bot.make_outbox()]
+    return [bot.make_outbox((index, count)) for index in range(count)]
+
+
+def reshard(count):
+    """Redistribute tasks and users from the recorded layout into `count` shards
+
+    New files are written first and the old ones deleted only after
+    shards.json records the new count, so an interrupted reshard is simply
+    redone on the next start.
+    """
+    old_count = recorded_shards()
+    if old_count == count:
+        return
+    print(f"Resharding tasks from {old_count} to {count} shards...")
+    if old_count == 1:
+        legacy = bot.TaskReminder()
+        if not legacy.store.exists():
+            # First run ever: let the single store import tasks.txt / users.txt
+            legacy.load_tasks()
+        legacy.store.close()
+
+    sources = shard_stores(old_count)
+    targets = shard_stores(count)
+    for target in targets:
+        target.destroy()  # Leftovers of an interrupted reshard
+        target.load()
+    moved = 0
+    for source in sources:
+        rows, reminded = source.load()
+        timezones = source.load_timezones()
+        by_user = {}
+        for task_id, (user_id, line, _) in rows.items():
+            by_user.setdefault(user_id, []).append((task_id, line))
+        new_ids = {}  # {old task id: (target, new task id)}
+        for user_id, entries in by_user.items():
+            tz = task_parser.get_timezone(timezones.get(user_id))
+            parsed = task_parser.parse_many([line for _, line in entries], tz)
+            kept = [(task_id, task) for (task_id, _), task in zip(entries, parsed)
+                    if task and task.deadline_ts is not None]
+            target = targets[shard_for(user_id, count)]
+            ids = target.add_many(user_id, [task for _, task in kept])
+            new_ids.update((task_id, (target, new_id)) for (task_id, _), new_id in zip(kept, ids))
+            moved += len(kept)
+        # Reminder keys name the task id, which changes with the store; old ticket keys go everywhere
+        for task_key in reminded:
+            task_id, deadline_ts, offset = bot.parse_reminder_key(task_key)
+            if task_id is None:
+                for target in targets:
+                    target.mark_reminded(None, task_key)
+            elif task_id in new_ids:
+                target, new_id = new_ids[task_id]
+                target.mark_reminded(None, f"{new_id}:{deadline_ts}@{offset // 60}")
+        users = [[] for _ in targets]
+        for user_id in source.load_users():
+            users[shard_for(user_id, count)].append(user_id)
+        for target, user_ids in zip(targets, users):
+            target.add_users(user_ids)
+        for user_id, offsets in source.load_offsets().items():
+            targets[shard_for(user_id, count)].set_offsets(user_id, offsets)
+        for user_id, name in timezones.items():
+            targets[shard_for(user_id, count)].set_timezone(user_id, name)
+        for user_id, minute in source.load_greeting_times().items():
+            targets[shard_for(user_id, count)].set_greeting_time(user_id, minute)
+        greeted = {}
+        for user_id, day in source.load_greeted().items():
+            greeted.setdefault((shard_for(user_id, count), day), []).append(user_id)
+        for (index, day), user_ids in greeted.items():
+            targets[index].add_greeted(day, user_ids)
+        source.close()
+    for target in targets:
+        target.close()
+
+    # Undelivered messages follow their chat to its new shard
+    source_outboxes = shard_outboxes(old_count)
+    target_outboxes = shard_outboxes(count)
+    for target in target_outboxes:
+        target.destroy()
+    for source in source_outboxes:
+        for kind, messages in source.messages():
+            queued = [[] for _ in target_outboxes]
+            for message in messages:
+                queued[shard_for(message[0], count)].append(message)
+            for target, target_messages in zip(target_outboxes, queued):
+                target.add_many(target_messages, kind)
+        source.close()
+    for target in target_outboxes:
+        target.close()
+
+    if count == 1:
+        os.remove(STATE_FILE)
+    else:
+        with open(f"{STATE_FILE}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'shards': count}, f)
+        os.replace(f"{STATE_FILE}.tmp", STATE_FILE)
+    for source in sources + source_outboxes:
+        source.destroy()
+    print(f"Resharded {moved} tasks into {count} shards")
+
+
+# --- worker process ---
+
+def run_shard(index, count, queue):
+    """Worker process entry point: serve the users of shard index"""
+    # Ctrl+C reaches the whole process group; the front stops us through the queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    bot.reminder = bot.TaskReminder(shard=(index, count))
+    bot.reminder.load_tasks()
+    bot.reminder.load_users()
+    asyncio.run(serve_shard(index, queue))
+
+
+async def serve_shard(index, queue):
+    application = (
+        bot.application_builder()
+        .updater(None)
+        .concurrent_updates(PerUserUpdateProcessor(bot.UPDATE_CONCURRENCY))
+        .build()
+    )
+    bot.add_handlers(application)
+    loop = asyncio.get_running_loop()
+    async with application:
+        await bot.post_init(application)
+        await application.start()
+        print(f"Shard {index} ready")
+        while True:
+            item = await loop.run_in_executor(None, queue.get)
+            if item is None:
+                break
+            kind, data = item
+            update = Update.de_json(data, application.bot)
+            if kind == 'update':
+                await application.update_queue.put(update)
+            else:
+                apply_sync(update)
+        await application.stop()
+        await bot.post_shutdown(application)
+    print(f"Shard {index} stopped")
+
+
+def apply_sync(update):
+    """Apply a fan-out command owned by another shard without replying"""
+    command, _, rest = update.effective_message.text.partition(' ')
+    command = command.split('@')[0]
+    if command == '/broadcast' and update.effective_user.id == bot.CHAT_ID and rest.strip():
+        text = rest.strip()
+        bot.reminder.spawn(bot.reminder.broadcast_text(bot.broadcast_name(text), list(bot.reminder.all_users), text))
+
+
+# --- front process ---
+
+def run_front(count):
+    """Receive updates and route them to `count` worker processes"""
+    reshard(count)
+    context = multiprocessing.get_context('spawn')
+    queues = [context.Queue() for _ in range(count)]
+    workers = [
+        context.Process(target=run_shard, args=(index, count, queues[index]), name=f"shard-{index}", daemon=True)
+        for index in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+
+    async def route(update, _context):
+        data = update.to_dict()
+        owner = shard_for(PerUserUpdateProcessor.update_key(update), count)
+        queues[owner].put(('update', data))
+        message = update.effective_message
+        text = message.text if message and message.text else ''
+        if text.split(' ', 1)[0].split('@')[0] in FANOUT_COMMANDS:
+            for index, queue in enumerate(queues):
+                if index != owner:
+                    queue.put(('sync', data))
+
+    async def post_shutdown(application):
+        for queue in queues:
+            queue.put(None)
+        for worker in workers:
+            await asyncio.to_thread(worker.join, 30)
+            if worker.is_alive():
+                worker.terminate()
+
+    application = bot.application_builder().post_shutdown(post_shutdown).build()
+    application.add_handler(TypeHandler(Update, route))
+    print(f"Front process routing updates to {count} shards")
+    bot.run_application(application)
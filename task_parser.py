@@ -0,0 +1,236 @@
+# task_parser.py
+import re
+import sys
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Column separators in order of preference; the first one that yields 4+ columns wins
+SEPARATORS = ('|', ',', ';', '  ')
+
+# One pass over every supported deadline form (matched at the start of the string):
+#   20h59 17/1/2026   13h30 17/1   13H 17/1
+# Like the original three-pattern parser, a year is only read after hour+minute.
+DEADLINE_RE = re.compile(r'(\d+)[hH](?:(\d+)\s+(\d+)/(\d+)(?:/(\d+))?|\s+(\d+)/(\d+))')
+
+# Deadlines are read in the user's IANA timezone; users who did not pick one with /tz get this
+DEFAULT_TIMEZONE = 'Asia/Ho_Chi_Minh'
+
+
+def get_timezone(name=None):
+    """ZoneInfo for an IANA name (None = DEFAULT_TIMEZONE); ValueError if unknown"""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown timezone: {name}") from e
+
+
+class Task:
+    """One ticket, stored compactly (replaces the per-task dict)
+
+    The link is kept as an interned host plus the remaining path so tickets
+    on the same site share one host string; the deadline is a UTC epoch int
+    read in the owner's timezone. raw_line is rebuilt on demand when the
+    task is persisted.
+    """
+
+    __slots__ = ('id', 'user_id', 'link_host', 'link_path', 'order_id', 'input_date', 'deadline', 'deadline_ts')
+
+    def __init__(self, link, order_id, input_date, deadline, deadline_ts=None, user_id=None, task_id=None):
+        self.id = task_id
+        self.user_id = user_id
+        self.link_host, self.link_path = split_link(link)
+        self.order_id = order_id
+        self.input_date = sys.intern(input_date)
+        self.deadline = sys.intern(deadline)
+        self.deadline_ts = deadline_ts
+
+    @classmethod
+    def restore(cls, task_id, user_id, link_host, link_path, order_id, input_date, deadline, deadline_ts):
+        """Rebuild a task from already split and interned fields (binary snapshot, parse_many)"""
+        task = cls.__new__(cls)
+        task.id = task_id
+        task.user_id = user_id
+        task.link_host = link_host
+        task.link_path = link_path
+        task.order_id = order_id
+        task.input_date = input_date
+        task.deadline = deadline
+        task.deadline_ts = deadline_ts
+        return task
+
+    @property
+    def link(self):
+        return self.link_host + self.link_path if self.link_path else self.link_host
+
+    def deadline_in(self, tz):
+        """Deadline as an aware datetime in tz, converted only when displayed"""
+        return datetime.fromtimestamp(self.deadline_ts, tz)
+
+    @property
+    def identity(self):
+        """Fields that make two tasks exact duplicates"""
+        return (self.link, self.order_id, self.input_date, self.deadline)
+
+    @property
+    def raw_line(self):
+        """Task as a line that parse_task_line reads back to the same fields"""
+        fields = (self.link, self.order_id, self.input_date)
+        sep = next((sep for sep in SEPARATORS[:3] if not any(sep in field for field in fields)), '|')
+        gio_deadline, _, ngay_deadline = self.deadline.partition(' ')
+        if not ngay_deadline:
+            # Old 4-column format
+            return f" {sep} ".join(fields + (self.deadline,))
+        return f" {sep} ".join(fields + (gio_deadline, ngay_deadline.strip()))
+
+    def __repr__(self):
+        return f"Task(id={self.id}, user_id={self.user_id}, order_id={self.order_id!r}, deadline={self.deadline!r})"
+
+
+def split_link(link):
+    """Split a link into (interned scheme+host, rest of the link)"""
+    start = link.find('://')
+    slash = link.find('/', start + 3 if start >= 0 else 0)
+    if slash < 0:
+        return sys.intern(link), ''
+    return sys.intern(link[:slash]), link[slash:]
+
+
+def split_task_line(line):
+    """Split a task line into (link, order_id, input_date, deadline) strings, or None
+
+    Supported: link | order_id | ngay_tao | gio_deadline | ngay_deadline
+    (also with , ; double space or plain spaces) and the old 4-column form
+    link | order_id | input_date | deadline.
+    """
+    for sep in SEPARATORS:
+        # A membership probe is cheap; only split with separators present in the line
+        if sep not in line:
+            continue
+        parts = line.split(sep)
+        columns = len(parts)
+        if columns >= 5:
+            # New format: link | order_id | ngay_tao | gio_deadline | ngay_deadline
+            return (parts[0].strip(), parts[1].strip(), parts[2].strip(),
+                    f"{parts[3].strip()} {parts[4].strip()}")
+        if columns == 4:
+            # Old format: link | order_id | input_date | deadline
+            return parts[0].strip(), parts[1].strip(), parts[2].strip(), parts[3].strip()
+
+    # No separator found: the last columns are fields, everything before is the link
+    parts = line.split()
+    if len(parts) >= 5:
+        return ' '.join(parts[:-4]), parts[-4], parts[-3], f"{parts[-2]} {parts[-1]}"
+    if len(parts) == 4:
+        return parts[0], parts[1], parts[2], parts[3]
+    return None
+
+
+def parse_task_line(line):
+    """Parse task line format: link  order_id  ngay_tao  gio_deadline  ngay_deadline"""
+    fields = split_task_line(line)
+    return Task(*fields) if fields else None
+
+
+def parse_deadline(deadline_str, current_year=None, tz=None):
+    """Parse deadline format like '13H 17/1' or '13h30 17/1' or '20h59 17/1/2026'
+
+    With tz the result is an aware datetime in that zone (a missing year
+    is the current one there); without it a naive one, as before.
+    """
+    match = DEADLINE_RE.match(deadline_str.strip())
+    if not match:
+        return None
+    hour, minute, day, month, year, day_only, month_only = match.groups()
+    try:
+        if minute is None:
+            # Format without minutes: 13H 17/1
+            minute, day, month = 0, day_only, month_only
+        if year is None:
+            year = current_year if current_year is not None else datetime.now(tz).year
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), tzinfo=tz)
+    except Exception as e:
+        print(f"Error parsing deadline '{deadline_str}': {e}")
+        return None
+
+
+def deadline_timestamp(deadline_str, tz, current_year=None):
+    """UTC epoch seconds of a deadline written in tz, or None if unreadable"""
+    deadline_dt = parse_deadline(deadline_str, current_year, tz)
+    return int(deadline_dt.timestamp()) if deadline_dt else None
+
+
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def local_midnight(tz, year, month, day):
+    """UTC epoch of 00:00 on that local day in tz, or None if the date is invalid
+    or the UTC offset changes during the day (DST)"""
+    try:
+        midnight = datetime(year, month, day)
+    except ValueError:
+        return None
+    start = midnight.replace(tzinfo=tz).utcoffset()
+    if (midnight + timedelta(days=1)).replace(tzinfo=tz).utcoffset() != start:
+        return None
+    return (midnight.toordinal() - EPOCH_ORDINAL) * 86400 - int(start.total_seconds())
+
+
+def parse_many(lines, tz=None):
+    """Parse many task lines written in tz (None = DEFAULT_TIMEZONE); returns one entry per line
+
+    Each entry is None for an unreadable line, otherwise a Task whose
+    deadline_ts is None when the deadline could not be read. The server's
+    own timezone plays no part.
+    """
+    if tz is None:
+        tz = get_timezone()
+    current_year = datetime.now(tz).year
+    # No datetime per line: a pasted batch repeats deadlines, hosts and dates, so each
+    # distinct deadline string is read once and the UTC epoch of each local midnight
+    # computed once per date; days with a DST change (None) take the aware path.
+    # A dict stands in for sys.intern on the repeated strings.
+    deadlines = {}  # {deadline: (interned deadline, deadline_ts)}
+    day_starts = {}
+    shared = {}
+    match = DEADLINE_RE.match
+    restore = Task.restore
+    tasks = []
+    append = tasks.append
+    for line in lines:
+        fields = split_task_line(line)
+        if fields is None:
+            append(None)
+            continue
+        link, order_id, input_date, deadline = fields
+        try:
+            deadline, deadline_ts = deadlines[deadline]
+        except KeyError:
+            deadline_ts = None
+            found = match(deadline)
+            if found:
+                hour, minute, day, month, year, day_only, month_only = found.groups()
+                if minute is None:
+                    minute, day, month = 0, day_only, month_only
+                key = (day, month, year)
+                try:
+                    day_start = day_starts[key]
+                except KeyError:
+                    day_start = day_starts[key] = local_midnight(tz, int(year) if year else current_year,
+                                                                 int(month), int(day))
+                hour, minute = int(hour), int(minute)
+                if day_start is not None and hour < 24 and minute < 60:
+                    deadline_ts = day_start + hour * 3600 + minute * 60
+                else:
+                    deadline_ts = deadline_timestamp(deadline, tz, current_year)
+            deadline = sys.intern(deadline)
+            deadlines[deadline] = (deadline, deadline_ts)
+        start = link.find('://')
+        slash = link.find('/', start + 3 if start >= 0 else 0)
+        if slash < 0:
+            host, path = link, ''
+        else:
+            host, path = link[:slash], link[slash:]
+        host = shared.get(host) or shared.setdefault(host, sys.intern(host))
+        input_date = shared.get(input_date) or shared.setdefault(input_date, sys.intern(input_date))
+        append(restore(None, None, host, path, order_id, input_date, deadline, deadline_ts))
+    return tasks
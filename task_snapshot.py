@@ -0,0 +1,196 @@
+# task_snapshot.py
+#
+# Binary image of already-parsed task state, written periodically and on clean
+# shutdown and mapped with mmap at startup. Layout (little endian, sections
+# 8-byte aligned):
+#
+#   header        MAGIC + counts
+#   fingerprint   JSON: the store files' (size, mtime) and the store's change mark when written
+#   users         (user_id, first record, record count), sorted by user_id
+#   records       fixed-width tasks grouped by user, in /list order
+#   pending       reminders in fire order: fire_at[], task_id[], record[]
+#   by key        pending task ids sorted, with their fire-order position
+#   strings       offsets[] + UTF-8 blob (links, order ids, dates, reminded keys)
+#   reminded      string ids of reminded task keys
+
+import bisect
+import gc
+import json
+import mmap
+import os
+import struct
+import sys
+
+from task_parser import Task
+
+# 02: deadline_ts read in the user's timezone instead of the server's; older snapshots reload from the store
+# 03: change mark next to the fingerprint, so a stale snapshot is brought up to date instead
+MAGIC = b'TRSNAP03'
+HEADER = struct.Struct('<8sQQQQQQ')  # magic, fingerprint bytes, users, records, pending, strings, reminded
+USER = struct.Struct('<qqq')  # user_id, first record, record count
+RECORD = struct.Struct('<qqqIIIII')  # id, user_id, deadline_ts, host, path, order_id, input_date, deadline
+
+
+def _pad(n):
+    return -n % 8
+
+
+def write_snapshot(path, fingerprint, mark, user_tasks, pending, reminded):
+    """Write {user_id: [Task]} plus pending [(fire_at, task_id)] and reminded keys to path atomically"""
+    # Millions of short-lived tuples and bytes: collector passes would only rescan the live tasks
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        _write_snapshot(path, fingerprint, mark, user_tasks, pending, reminded)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _write_snapshot(path, fingerprint, mark, user_tasks, pending, reminded):
+    strings = {}
+    string_list = []
+
+    def string_id(s):
+        """Id of a shared string (host, dates), stored once"""
+        sid = strings.get(s)
+        if sid is None:
+            sid = strings[s] = len(string_list)
+            string_list.append(s)
+        return sid
+
+    users = []
+    records = []
+    record_index = {}  # task id -> record number
+    pack = RECORD.pack
+    append_string = string_list.append
+    for user_id in sorted(user_tasks):
+        tasks = user_tasks[user_id]
+        if not tasks:
+            continue
+        users.append(USER.pack(user_id, len(records), len(tasks)))
+        for task in tasks:
+            record_index[task.id] = len(records)
+            # Paths and order ids are nearly always unique: no dedupe lookup
+            sid = len(string_list)
+            append_string(task.link_path)
+            append_string(task.order_id)
+            records.append(pack(
+                task.id, user_id, task.deadline_ts, string_id(task.link_host), sid,
+                sid + 1, string_id(task.input_date), string_id(task.deadline)))
+
+    pending = sorted((fire_at, task_id, record_index[task_id])
+                     for fire_at, task_id in pending if task_id in record_index)
+    fire_times = [fire_at for fire_at, _, _ in pending]
+    keys = [task_id for _, task_id, _ in pending]
+    pending_records = [record for _, _, record in pending]
+    by_key = sorted(range(len(keys)), key=keys.__getitem__)
+    reminded_ids = [string_id(key) for key in sorted(reminded)]
+
+    encoded = [s.encode('utf-8') for s in string_list]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    fingerprint_bytes = json.dumps({'fingerprint': fingerprint, 'mark': mark}).encode('utf-8')
+
+    def q(values):
+        return struct.pack(f'<{len(values)}q', *values)
+
+    body = [
+        HEADER.pack(MAGIC, len(fingerprint_bytes), len(users), len(records), len(pending),
+                    len(string_list), len(reminded_ids)),
+        fingerprint_bytes, b'\0' * _pad(len(fingerprint_bytes)),
+        b''.join(users),
+        b''.join(records), b'\0' * _pad(len(records) * RECORD.size),
+        q(fire_times), q(keys), q(pending_records),
+        q([keys[i] for i in by_key]), q(by_key),
+        q(offsets), q(reminded_ids),
+        b''.join(encoded),
+    ]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.writelines(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class TaskSnapshot:
+    """Read-only view of a snapshot file; tasks are built per user on demand"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fingerprint_len, users, records, pending, strings, reminded = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a task snapshot")
+        view = memoryview(self.mm)
+        pos = HEADER.size
+        header = json.loads(bytes(view[pos:pos + fingerprint_len]))
+        self.fingerprint = header['fingerprint']
+        self.mark = header['mark']  # Store change mark the tasks were read at, None if unknown
+        pos += fingerprint_len + _pad(fingerprint_len)
+
+        self.users = {
+            user_id: (first, count)
+            for user_id, first, count in USER.iter_unpack(view[pos:pos + users * USER.size])
+        }
+        pos += users * USER.size
+        self.records_offset = pos
+        self.task_count = records
+        pos += records * RECORD.size + _pad(records * RECORD.size)
+
+        def q(count):
+            nonlocal pos
+            array = view[pos:pos + count * 8].cast('q')
+            pos += count * 8
+            return array
+
+        # Zero-copy int64 arrays straight out of the mapping
+        self.pending_fire = q(pending)
+        self.pending_keys = q(pending)
+        self.pending_records = q(pending)
+        self.sorted_keys = q(pending)
+        self.sorted_key_positions = q(pending)
+        self.string_offsets = q(strings + 1)
+        self.reminded_ids = q(reminded)
+        self.strings_offset = pos
+        self._strings = {}  # Decoded shared strings (hosts, dates), interned once
+
+    def string(self, sid):
+        start = self.strings_offset + self.string_offsets[sid]
+        end = self.strings_offset + self.string_offsets[sid + 1]
+        return self.mm[start:end].decode('utf-8')
+
+    def shared_string(self, sid):
+        s = self._strings.get(sid)
+        if s is None:
+            s = self._strings[sid] = sys.intern(self.string(sid))
+        return s
+
+    def record(self, index):
+        """(task_id, user_id, deadline_ts) of record index"""
+        return RECORD.unpack_from(self.mm, self.records_offset + index * RECORD.size)[:3]
+
+    def load_user(self, user_id):
+        """Build the user's Task objects, in the order they were written"""
+        first, count = self.users.get(user_id, (0, 0))
+        start = self.records_offset + first * RECORD.size
+        string, shared = self.string, self.shared_string
+        return [
+            Task.restore(task_id, owner, shared(host), string(path), string(order_id),
+                         shared(input_date), shared(deadline), deadline_ts)
+            for task_id, owner, deadline_ts, host, path, order_id, input_date, deadline
+            in RECORD.iter_unpack(self.mm[start:start + count * RECORD.size])
+        ]
+
+    def pending_task(self, position):
+        """(task_id, user_id, deadline_ts) of the reminder at fire-order position"""
+        return self.record(self.pending_records[position])
+
+    def reminded(self):
+        return {self.string(sid) for sid in self.reminded_ids}
+
+    def first_pending_after(self, fire_at):
+        """Fire-order position of the first reminder firing after fire_at"""
+        return bisect.bisect_right(self.pending_fire, fire_at)
@@ -0,0 +1,746 @@
+# task_store.py
+import glob
+import json
+import os
+import sqlite3
+import threading
+import zlib
+
+from task_parser import DEFAULT_TIMEZONE
+
+
+class JournalTaskStore:
+    """Task persistence as a snapshot plus an append-only journal of mutations
+
+    Every record is one line: '<crc32 hex>\\t<json>\\n'. A record whose
+    checksum does not match (e.g. a torn write at crash time) is skipped
+    on replay instead of invalidating the whole file.
+    """
+
+    def __init__(self, base_path='tasks', users_file='users.txt', compact_every=10000):
+        self.users_file = users_file
+        self.offsets_file = f"{base_path}.offsets.json"  # {user_id: reminder offsets}, rewritten on change
+        self.greetings_file = f"{base_path}.greetings.json"  # {user_id: greeting minute of day}
+        self.greeted_file = f"{base_path}.greeted.json"  # {user_id: day of their last greeting}
+        self.timezones_file = f"{base_path}.timezones.json"  # {user_id: IANA timezone name}
+        self.snapshot_file = f"{base_path}.snapshot"
+        self.journal_prefix = f"{base_path}.journal."
+        self.compact_every = compact_every  # Journal records before compaction
+        self.generation = 0
+        self.next_id = 1
+        self.records_since_compact = 0
+        self._journal = None
+        self._lock = threading.Lock()
+        self._compactor = None
+        self._stop = threading.Event()
+        self.cache_file = None  # Replaying the journal is the load; no binary cache
+        self._zones = {}  # {user_id: IANA name} mirror of timezones_file, stamped on journaled deadlines
+
+    def fingerprint(self):
+        return None
+
+    # --- record encoding ---
+
+    @staticmethod
+    def encode(record):
+        payload = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        return f"{zlib.crc32(payload.encode('utf-8')):08x}\t{payload}\n"
+
+    @staticmethod
+    def decode(line):
+        """Return the record for a line, or None if it is torn or corrupt"""
+        if not line.endswith('\n'):
+            return None
+        crc, sep, payload = line[:-1].partition('\t')
+        if not sep or len(crc) != 8:
+            return None
+        try:
+            if int(crc, 16) != zlib.crc32(payload.encode('utf-8')):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    # --- startup ---
+
+    def exists(self):
+        """True if a snapshot or journal from a previous run is present"""
+        return os.path.exists(self.snapshot_file) or bool(self._journal_files())
+
+    def _journal_files(self):
+        files = []
+        for path in glob.glob(f"{glob.escape(self.journal_prefix)}*"):
+            suffix = path[len(self.journal_prefix):]
+            if suffix.isdigit():
+                files.append((int(suffix), path))
+        return sorted(files)
+
+    def load(self):
+        """Replay state and open the journal for appends"""
+        tasks, reminded = self.replay()
+        self._open_journal()
+        return tasks, reminded
+
+    def replay(self):
+        """Replay snapshot + journals, return ({task_id: (user_id, line, deadline_ts)}, reminded_keys)
+
+        Records carry the deadline epoch and the zone it was read in;
+        deadline_ts is None when that zone is no longer the user's (or
+        the record predates it), and the line must be parsed again.
+        """
+        tasks = {}
+        reminded = set()
+        snapshot_gen = 0
+        if os.path.exists(self.snapshot_file):
+            for record in self._read_records(self.snapshot_file):
+                if record['op'] == 'snapshot':
+                    snapshot_gen = record['gen']
+                    self.next_id = max(self.next_id, record['next_id'])
+                else:
+                    self._apply(record, tasks, reminded)
+
+        self.generation = snapshot_gen
+        for gen, path in self._journal_files():
+            if gen < snapshot_gen:
+                # Left behind by a compaction that finished before cleanup
+                os.remove(path)
+                continue
+            for record in self._read_records(path, repair=True):
+                self._apply(record, tasks, reminded)
+                self.records_since_compact += 1
+            self.generation = gen
+
+        self._zones = self.load_timezones()
+        zones = self._zones
+        for task_id, (user_id, line, deadline_ts, zone) in tasks.items():
+            current = zones.get(user_id) or DEFAULT_TIMEZONE
+            tasks[task_id] = (user_id, line, deadline_ts if zone == current else None)
+        return tasks, reminded
+
+    def _read_records(self, path, repair=False):
+        good_end = 0
+        skipped = 0
+        with open(path, 'rb') as f:
+            offset = 0
+            for raw in f:
+                offset += len(raw)
+                try:
+                    record = self.decode(raw.decode('utf-8'))
+                except UnicodeDecodeError:
+                    record = None
+                if record is None:
+                    skipped += 1
+                    continue
+                good_end = offset
+                yield record
+        if skipped:
+            print(f"Skipped {skipped} corrupt records in {path}")
+        if repair and os.path.getsize(path) != good_end:
+            # Drop a torn tail so new appends start on a clean line
+            with open(path, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _apply(self, record, tasks, reminded):
+        op = record['op']
+        if op == 'add':
+            tasks[record['id']] = (record['user'], record['line'], record.get('ts'), record.get('tz'))
+            self.next_id = max(self.next_id, record['id'] + 1)
+        elif op == 'del':
+            tasks.pop(record['id'], None)
+        elif op == 'reminded':
+            tasks.pop(record['id'], None)
+            reminded.add(record['key'])
+        elif op == 'expire':
+            for task_id in record['ids']:
+                tasks.pop(task_id, None)
+        elif op == 'forget':
+            reminded.difference_update(record['keys'])
+        elif op == 'deadlines':
+            for deadline_ts, task_id in record['rows']:
+                if task_id in tasks:
+                    user_id, line, _, _ = tasks[task_id]
+                    tasks[task_id] = (user_id, line, deadline_ts, record['tz'])
+        elif op == 'clear':
+            for task_id in [tid for tid, (uid, _) in tasks.items() if uid == record['user']]:
+                del tasks[task_id]
+
+    # --- mutations ---
+
+    def _open_journal(self):
+        path = f"{self.journal_prefix}{self.generation}"
+        self._journal = open(path, 'a', encoding='utf-8', newline='\n')
+
+    def _append(self, record):
+        with self._lock:
+            self._journal.write(self.encode(record))
+            self._journal.flush()
+            self.records_since_compact += 1
+
+    def add(self, user_id, task):
+        """Journal a new task and return its id"""
+        return self.add_many(user_id, [task])[0]
+
+    def add_many(self, user_id, tasks):
+        """Journal new tasks with a single write and return their ids"""
+        zone = self._zones.get(user_id) or DEFAULT_TIMEZONE
+        with self._lock:
+            task_ids = list(range(self.next_id, self.next_id + len(tasks)))
+            self.next_id += len(tasks)
+            self._journal.write(''.join(
+                self.encode({'op': 'add', 'id': task_id, 'user': user_id, 'line': task.raw_line,
+                             'ts': task.deadline_ts, 'tz': zone})
+                for task_id, task in zip(task_ids, tasks)))
+            self._journal.flush()
+            self.records_since_compact += len(tasks)
+        return task_ids
+
+    def delete(self, task_id):
+        self._append({'op': 'del', 'id': task_id})
+
+    def mark_reminded(self, task_id, task_key):
+        self._append({'op': 'reminded', 'id': task_id, 'key': task_key})
+
+    def mark_reminded_many(self, task_ids, task_keys):
+        """Journal fired reminder keys and delete finished tasks with a single write"""
+        with self._lock:
+            self._journal.write(''.join(
+                [self.encode({'op': 'reminded', 'id': None, 'key': key}) for key in task_keys] +
+                [self.encode({'op': 'del', 'id': task_id}) for task_id in task_ids]))
+            self._journal.flush()
+            self.records_since_compact += len(task_keys) + len(task_ids)
+
+    def expire_many(self, task_ids):
+        """Drop tasks whose deadline passed, as one journal record"""
+        if task_ids:
+            self._append({'op': 'expire', 'ids': list(task_ids)})
+
+    def forget_reminded(self, task_keys):
+        """Drop fired reminder keys nothing needs any more, as one journal record"""
+        if task_keys:
+            self._append({'op': 'forget', 'keys': list(task_keys)})
+
+    def clear_user(self, user_id):
+        self._append({'op': 'clear', 'user': user_id})
+
+    # --- compaction ---
+
+    def compact(self, get_state):
+        """Write a fresh snapshot and drop journals it covers
+
+        get_state() must return ([(task_id, user_id, line, deadline_ts, zone)], reminded_keys)
+        and is called after the journal is rotated, so every mutation is
+        either in the new journal or already visible in the returned state.
+        Fired reminder keys go into the snapshot too: the journals holding
+        them are deleted below.
+        """
+        with self._lock:
+            self._journal.close()
+            self.generation += 1
+            self._open_journal()
+            generation = self.generation
+            next_id = self.next_id
+            self.records_since_compact = 0
+
+        rows, reminded = get_state()
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(self.encode({'op': 'snapshot', 'gen': generation, 'next_id': next_id}))
+            for task_id, user_id, line, deadline_ts, zone in rows:
+                f.write(self.encode({'op': 'add', 'id': task_id, 'user': user_id, 'line': line,
+                                     'ts': deadline_ts, 'tz': zone}))
+            for key in reminded:
+                f.write(self.encode({'op': 'reminded', 'id': None, 'key': key}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+
+        for gen, path in self._journal_files():
+            if gen < generation:
+                os.remove(path)
+        print(f"Compacted {len(rows)} tasks into {self.snapshot_file}")
+
+    def load_users(self):
+        """Load user IDs from file"""
+        users = set()
+        try:
+            with open(self.users_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    user_id = line.strip()
+                    if user_id and user_id.isdigit():
+                        users.add(int(user_id))
+        except FileNotFoundError:
+            print("No users file found, starting with empty user list")
+        return users
+
+    def add_user(self, user_id):
+        """Save a single user ID to file"""
+        self.add_users([user_id])
+
+    def add_users(self, user_ids):
+        """Append new user IDs to the file in one write (callers skip known users)"""
+        with open(self.users_file, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{user_id}\n" for user_id in user_ids))
+
+    # --- per-user settings: small JSON maps rewritten whole on change ---
+
+    @staticmethod
+    def _load_map(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return {int(user_id): value for user_id, value in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+
+    def _update_map(self, path, values):
+        """Apply {user_id: value or None (= remove)} to the map in path"""
+        with self._lock:
+            current = self._load_map(path)
+            for user_id, value in values.items():
+                if value is None:
+                    current.pop(user_id, None)
+                else:
+                    current[user_id] = value
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({str(user_id): value for user_id, value in current.items()}, f)
+            os.replace(tmp_file, path)
+
+    def load_offsets(self):
+        """{user_id: [reminder offsets in seconds]} of users who chose their own"""
+        return self._load_map(self.offsets_file)
+
+    def set_offsets(self, user_id, offsets):
+        """Store a user's reminder offsets (None = back to the default)"""
+        self._update_map(self.offsets_file, {user_id: list(offsets) if offsets else None})
+
+    def load_greeting_times(self):
+        """{user_id: minute of day} of users who chose their greeting time"""
+        return self._load_map(self.greetings_file)
+
+    def set_greeting_time(self, user_id, minute):
+        self._update_map(self.greetings_file, {user_id: minute})
+
+    def load_greeted(self):
+        """{user_id: 'YYYY-MM-DD' of the last greeting queued for them}"""
+        return self._load_map(self.greeted_file)
+
+    def add_greeted(self, day, user_ids):
+        self._update_map(self.greeted_file, dict.fromkeys(user_ids, day))
+
+    def load_timezones(self):
+        """{user_id: IANA timezone name} of users who chose their own"""
+        return self._load_map(self.timezones_file)
+
+    def set_timezone(self, user_id, name, deadlines=()):
+        """Store a user's timezone (None = back to the default) and their [(deadline_ts, task_id)] read in it
+
+        The deadlines record names the zone, so a crash before the map is
+        rewritten leaves them mismatched and they are parsed again on replay.
+        """
+        if deadlines:
+            self._append({'op': 'deadlines', 'tz': name or DEFAULT_TIMEZONE,
+                          'rows': [list(row) for row in deadlines]})
+        self._update_map(self.timezones_file, {user_id: name})
+        if name:
+            self._zones[user_id] = name
+        else:
+            self._zones.pop(user_id, None)
+
+    def set_deadlines(self, rows):
+        """Nothing to do: stale deadlines are parsed again on every replay until the next compaction stamps them"""
+
+    def change_mark(self):
+        """No binary task snapshot to bring up to date (cache_file is None)"""
+        return None
+
+    def start_compactor(self, get_state, interval=60):
+        """Compact in a background thread once enough journal records pile up"""
+        def run():
+            while not self._stop.wait(interval):
+                if self.records_since_compact >= self.compact_every:
+                    try:
+                        self.compact(get_state)
+                    except Exception as e:
+                        print(f"Error compacting tasks: {e}")
+
+        self._compactor = threading.Thread(target=run, daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._journal:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+
+    def destroy(self):
+        """Close the store and delete its files"""
+        self.close()
+        paths = glob.glob(f"{glob.escape(self.snapshot_file)}*") + [path for _, path in self._journal_files()]
+        for path in paths + [self.users_file, self.offsets_file, self.greetings_file, self.greeted_file,
+                             self.timezones_file]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class SqliteTaskStore:
+    """Task persistence in an indexed SQLite database (WAL mode)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            link TEXT NOT NULL,
+            order_id TEXT NOT NULL,
+            input_date TEXT NOT NULL,
+            deadline TEXT NOT NULL,
+            deadline_ts INTEGER NOT NULL,
+            raw_line TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_order ON tasks (user_id, order_id);
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_deadline ON tasks (user_id, deadline_ts);
+        CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks (deadline_ts);
+        CREATE TABLE IF NOT EXISTS reminded (key TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS expired_tasks (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            raw_line TEXT NOT NULL,
+            deadline_ts INTEGER NOT NULL,
+            expired_at INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS reminder_offsets (user_id INTEGER PRIMARY KEY, offsets TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS greeting_times (user_id INTEGER PRIMARY KEY, minute INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS greeted (user_id INTEGER PRIMARY KEY, day TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS user_timezones (user_id INTEGER PRIMARY KEY, timezone TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        -- Last change to each user's tasks, so a start from an older task snapshot reloads only those users
+        CREATE TABLE IF NOT EXISTS task_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL UNIQUE);
+        CREATE TRIGGER IF NOT EXISTS task_inserted AFTER INSERT ON tasks
+            BEGIN INSERT OR REPLACE INTO task_changes (user_id) VALUES (NEW.user_id); END;
+        CREATE TRIGGER IF NOT EXISTS task_updated AFTER UPDATE ON tasks
+            BEGIN INSERT OR REPLACE INTO task_changes (user_id) VALUES (NEW.user_id); END;
+        CREATE TRIGGER IF NOT EXISTS task_deleted AFTER DELETE ON tasks
+            BEGIN INSERT OR REPLACE INTO task_changes (user_id) VALUES (OLD.user_id); END;
+    """
+
+    def __init__(self, db_file='tasks.db'):
+        self.db_file = db_file
+        self.cache_file = f"{db_file}.snap"  # Binary task snapshot for fast startup (task_snapshot.py)
+        self._lock = threading.Lock()
+        self._existed = None
+        self._conn = None
+        self._closed_mark = None  # change_mark() when the connection was closed
+
+    @property
+    def conn(self):
+        """Connection opened on first use, so creating the store does no I/O"""
+        if self._conn is None:
+            self._existed = os.path.exists(self.db_file)
+            # Shared between the event loop and worker threads, guarded by _lock
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+
+    def exists(self):
+        """True if the database was created by a previous run"""
+        conn = self.conn
+        if not self._existed:
+            return False
+        row = conn.execute("SELECT value FROM meta WHERE key = 'initialized'").fetchone()
+        return row is not None
+
+    def load(self):
+        """Return ({task_id: (user_id, line, deadline_ts)}, reminded_keys) and mark the db initialized
+
+        deadline_ts is None for users on the default timezone when the
+        deadlines were written under another default (or before deadlines
+        were read per timezone): those lines must be parsed again, and
+        set_deadlines records the result.
+        """
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('initialized', '1')")
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'deadline_timezone'").fetchone()
+            if row is not None and row[0] == DEFAULT_TIMEZONE:
+                tasks = {
+                    task_id: (user_id, line, deadline_ts)
+                    for task_id, user_id, line, deadline_ts in self.conn.execute(
+                        'SELECT id, user_id, raw_line, deadline_ts FROM tasks ORDER BY id')
+                }
+            else:
+                # Users with their own zone got it after deadlines became per-zone: theirs are current
+                tasks = {
+                    task_id: (user_id, line, deadline_ts if zone is not None else None)
+                    for task_id, user_id, line, deadline_ts, zone in self.conn.execute(
+                        'SELECT id, tasks.user_id, raw_line, deadline_ts, timezone FROM tasks '
+                        'LEFT JOIN user_timezones USING (user_id) ORDER BY id')
+                }
+            reminded = {key for (key,) in self.conn.execute('SELECT key FROM reminded')}
+        return tasks, reminded
+
+    def change_mark(self):
+        """Sequence number of the latest task change; still answers after close()"""
+        if self._conn is None and self._closed_mark is not None:
+            return self._closed_mark
+        with self._lock:
+            row = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, mark):
+        """(user_ids, {task_id: (user_id, line, deadline_ts)}, reminded_keys) bringing a task
+        snapshot read at change_mark() == mark up to date: every task of the users whose
+        tasks changed after it. None if the stored deadlines must be parsed again (see load)."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'deadline_timezone'").fetchone()
+            if row is None or row[0] != DEFAULT_TIMEZONE:
+                return None
+            users = {user_id for (user_id,) in self.conn.execute(
+                'SELECT user_id FROM task_changes WHERE seq > ?', (mark,))}
+            tasks = {
+                task_id: (user_id, line, deadline_ts)
+                for task_id, user_id, line, deadline_ts in self.conn.execute(
+                    'SELECT id, user_id, raw_line, deadline_ts FROM tasks '
+                    'WHERE user_id IN (SELECT user_id FROM task_changes WHERE seq > ?) ORDER BY id', (mark,))
+            }
+            reminded = {key for (key,) in self.conn.execute('SELECT key FROM reminded')}
+        return users, tasks, reminded
+
+    def fingerprint(self):
+        """[size, mtime] of the database and its WAL; a cache written with the same
+        fingerprint is current. Call before the connection is opened."""
+        result = []
+        for path in (self.db_file, f"{self.db_file}-wal"):
+            try:
+                st = os.stat(path)
+                result.append([st.st_size, st.st_mtime_ns])
+            except FileNotFoundError:
+                result.append(None)
+        return result
+
+    # --- mutations ---
+
+    INSERT_TASK = ('INSERT INTO tasks (user_id, link, order_id, input_date, deadline, deadline_ts, raw_line) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+    def add(self, user_id, task):
+        """Insert a task and return its id"""
+        with self._lock:
+            return self.conn.execute(self.INSERT_TASK, self._row(user_id, task)).lastrowid
+
+    def add_many(self, user_id, tasks):
+        """Insert tasks in one transaction and return their ids"""
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                task_ids = [self.conn.execute(self.INSERT_TASK, self._row(user_id, task)).lastrowid
+                            for task in tasks]
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+        return task_ids
+
+    @staticmethod
+    def _row(user_id, task):
+        return (user_id, task.link, task.order_id, task.input_date,
+                task.deadline, task.deadline_ts, task.raw_line)
+
+    def delete(self, task_id):
+        with self._lock:
+            self.conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+
+    def mark_reminded(self, task_id, task_key):
+        with self._lock:
+            self.conn.execute('BEGIN')
+            self.conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            self.conn.execute('INSERT OR IGNORE INTO reminded (key) VALUES (?)', (task_key,))
+            self.conn.execute('COMMIT')
+
+    def mark_reminded_many(self, task_ids, task_keys):
+        """Record fired reminder keys and delete finished tasks in one transaction"""
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany('INSERT OR IGNORE INTO reminded (key) VALUES (?)',
+                                      ((key,) for key in task_keys))
+                self.conn.executemany('DELETE FROM tasks WHERE id = ?', ((task_id,) for task_id in task_ids))
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def expire_many(self, task_ids):
+        """Move tasks whose deadline passed to expired_tasks in one transaction"""
+        if not task_ids:
+            return
+        rows = [(task_id,) for task_id in task_ids]
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO expired_tasks (id, user_id, raw_line, deadline_ts, expired_at) '
+                    "SELECT id, user_id, raw_line, deadline_ts, CAST(strftime('%s', 'now') AS INTEGER) "
+                    'FROM tasks WHERE id = ?', rows)
+                self.conn.executemany('DELETE FROM tasks WHERE id = ?', rows)
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def forget_reminded(self, task_keys):
+        """Delete fired reminder keys nothing needs any more in one transaction"""
+        if not task_keys:
+            return
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany('DELETE FROM reminded WHERE key = ?', ((key,) for key in task_keys))
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def clear_user(self, user_id):
+        with self._lock:
+            self.conn.execute('DELETE FROM tasks WHERE user_id = ?', (user_id,))
+
+    # --- indexed queries ---
+
+    def find_by_order_id(self, user_id, order_id):
+        """Return task ids of a user's tasks with this order_id"""
+        with self._lock:
+            return [task_id for (task_id,) in self.conn.execute(
+                'SELECT id FROM tasks WHERE user_id = ? AND order_id = ?', (user_id, order_id))]
+
+    def list_user(self, user_id):
+        """Return (id, order_id, deadline, link) of a user's tasks ordered by deadline"""
+        with self._lock:
+            return self.conn.execute(
+                'SELECT id, order_id, deadline, link FROM tasks WHERE user_id = ? ORDER BY deadline_ts',
+                (user_id,)).fetchall()
+
+    def due_before(self, timestamp):
+        """Return (id, user_id) of all tasks with deadline_ts <= timestamp"""
+        with self._lock:
+            return self.conn.execute(
+                'SELECT id, user_id FROM tasks WHERE deadline_ts <= ? ORDER BY deadline_ts',
+                (timestamp,)).fetchall()
+
+    # --- users ---
+
+    def load_users(self):
+        with self._lock:
+            return {user_id for (user_id,) in self.conn.execute('SELECT user_id FROM users')}
+
+    def add_user(self, user_id):
+        self.add_users([user_id])
+
+    def add_users(self, user_ids):
+        with self._lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR IGNORE INTO users (user_id) VALUES (?)',
+                                  ((user_id,) for user_id in user_ids))
+            self.conn.execute('COMMIT')
+
+    def load_offsets(self):
+        """{user_id: [reminder offsets in seconds]} of users who chose their own"""
+        with self._lock:
+            return {user_id: [int(offset) for offset in offsets.split(',')]
+                    for user_id, offsets in self.conn.execute('SELECT user_id, offsets FROM reminder_offsets')}
+
+    def set_offsets(self, user_id, offsets):
+        """Store a user's reminder offsets (None = back to the default)"""
+        with self._lock:
+            if offsets:
+                self.conn.execute('INSERT OR REPLACE INTO reminder_offsets (user_id, offsets) VALUES (?, ?)',
+                                  (user_id, ','.join(map(str, offsets))))
+            else:
+                self.conn.execute('DELETE FROM reminder_offsets WHERE user_id = ?', (user_id,))
+
+    def load_greeting_times(self):
+        """{user_id: minute of day} of users who chose their greeting time"""
+        with self._lock:
+            return dict(self.conn.execute('SELECT user_id, minute FROM greeting_times'))
+
+    def set_greeting_time(self, user_id, minute):
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO greeting_times (user_id, minute) VALUES (?, ?)',
+                              (user_id, minute))
+
+    def load_greeted(self):
+        """{user_id: 'YYYY-MM-DD' of the last greeting queued for them}"""
+        with self._lock:
+            return dict(self.conn.execute('SELECT user_id, day FROM greeted'))
+
+    def add_greeted(self, day, user_ids):
+        """One row per user, overwritten each day, so the table never grows past the user count"""
+        with self._lock:
+            self.conn.execute('BEGIN')
+            self.conn.executemany('INSERT OR REPLACE INTO greeted (user_id, day) VALUES (?, ?)',
+                                  ((user_id, day) for user_id in user_ids))
+            self.conn.execute('COMMIT')
+
+    def load_timezones(self):
+        """{user_id: IANA timezone name} of users who chose their own"""
+        with self._lock:
+            return dict(self.conn.execute('SELECT user_id, timezone FROM user_timezones'))
+
+    def set_timezone(self, user_id, name, deadlines=()):
+        """Store a user's timezone (None = back to the default) and their [(deadline_ts, task_id)]
+        read in it, in one transaction so load can trust deadline_ts"""
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                if name:
+                    self.conn.execute('INSERT OR REPLACE INTO user_timezones (user_id, timezone) VALUES (?, ?)',
+                                      (user_id, name))
+                else:
+                    self.conn.execute('DELETE FROM user_timezones WHERE user_id = ?', (user_id,))
+                self.conn.executemany('UPDATE tasks SET deadline_ts = ? WHERE id = ?', deadlines)
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    def set_deadlines(self, rows):
+        """Rewrite deadline_ts of [(deadline_ts, task_id)] parsed again at load, and note
+        the default timezone they are current for"""
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany('UPDATE tasks SET deadline_ts = ? WHERE id = ?', rows)
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('deadline_timezone', ?)",
+                                  (DEFAULT_TIMEZONE,))
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+
+    # --- maintenance ---
+
+    def compact(self, get_state=None):
+        """Checkpoint the WAL into the main database file"""
+        with self._lock:
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def start_compactor(self, get_state, interval=60):
+        """SQLite checkpoints the WAL itself; nothing to run in the background"""
+
+    def close(self):
+        if self._conn is not None:
+            self._closed_mark = self.change_mark()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def destroy(self):
+        """Close the store and delete its files"""
+        self.close()
+        for path in (self.db_file, f"{self.db_file}-wal", f"{self.db_file}-shm", self.cache_file):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Test per-user greeting times: each minute greets only its bucket, once a day, also across UTC midnight, kept across restarts
+
+import os
+import sys
+from datetime import datetime
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from task_parser import get_timezone
+from test_support import run_in_tempdir
+from working_chat_bot import TaskReminder
+
+def at(*fields):
+    """Epoch seconds of a wall time in the default timezone (UTC+7)"""
+    return int(datetime(*fields, tzinfo=get_timezone()).timestamp())
+
+def greetings(reminder):
+    return dict(reminder.outbox.messages()).get('greeting', [])
+
+def greeted(reminder, now):
+    """Users whose greeting check_greetings(now) queued"""
+    before = len(greetings(reminder))
+    reminder.check_greetings(now)
+    return sorted(chat_id for chat_id, _, _ in greetings(reminder)[before:])
+
+def check_greetings():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    for user_id in (1, 2, 3):
+        reminder.all_users.add(user_id)
+    reminder.set_greeting_time(2, '07:15')
+    reminder.set_greeting_time(3, '07:15')
+    reminder.set_greeting_time(3, '10:30')
+    assert reminder.greeting_time(1) == '09:00' and reminder.greeting_time(3) == '10:30'
+    # Buckets are UTC minutes: 07:15, 09:00 and 10:30 in UTC+7
+    assert reminder.greeting_schedule == [15, 2 * 60, 3 * 60 + 30]
+
+    # Started after 07:15: that greeting is not made up, later minutes are caught up
+    assert greeted(reminder, at(2026, 3, 2, 8, 0)) == []
+    assert greeted(reminder, at(2026, 3, 2, 10, 45)) == [1, 3]
+    assert greeted(reminder, at(2026, 3, 2, 10, 46)) == []
+    assert reminder.seconds_until_next_greeting(at(2026, 3, 2, 10, 46)) == (20 * 60 + 29) * 60
+
+    # A new day starts with nobody greeted
+    assert greeted(reminder, at(2026, 3, 3, 7, 15)) == [2]
+    assert reminder.greeted == {2}
+    reminder.store.close()
+
+    # Times and today's greeted users survive a restart
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    restarted.greeted_day = '2026-03-03'
+    restarted.greeted = {user_id for user_id, day in restarted.store.load_greeted().items() if day == '2026-03-03'}
+    assert restarted.greeting_time(2) == '07:15' and restarted.greeting_time(3) == '10:30'
+    assert greeted(restarted, at(2026, 3, 3, 7, 15)) == []
+    restarted.store.close()
+
+def check_utc_midnight():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.all_users.add(4)
+    reminder.set_greeting_time(4, '06:50')  # 23:50 UTC, the day before in UTC
+    assert reminder.greeting_schedule == [2 * 60, 23 * 60 + 50]
+
+    # The 23:50 bucket was still ahead at the last check when the UTC day changed
+    assert greeted(reminder, at(2026, 3, 2, 6, 40)) == []
+    assert greeted(reminder, at(2026, 3, 2, 7, 5)) == [4]
+    assert greetings(reminder)[-1][2] == at(2026, 3, 2, 6, 50)
+    assert reminder.greeted_day == '2026-03-02' and reminder.greeted == set()
+    reminder.store.close()
+
+def test_greetings():
+    run_in_tempdir(check_greetings, check_utc_midnight)
+
+if __name__ == "__main__":
+    test_greetings()
+    print("✅ Greetings OK")
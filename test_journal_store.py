@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Test the journal store survives a torn last write, keeps every record across compaction, replays forgotten keys
+# and drops deadlines read in a zone the user has left
+
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from task_parser import parse_task_line
+from task_store import JournalTaskStore
+from test_support import run_in_tempdir
+
+def task(order_id):
+    return parse_task_line(f"ghn.com | {order_id} | 1/1/2026 | 13h | 2/1/2026")
+
+def reopen(store):
+    store.close()
+    store = JournalTaskStore('tasks', 'users.txt')
+    tasks, reminded = store.load()
+    return store, tasks, reminded
+
+def check_torn_tail():
+    store = JournalTaskStore('tasks', 'users.txt')
+    store.load()
+    first, second = store.add_many(1, [task('A'), task('B')])
+    store.mark_reminded_many([first], ['1:100@30'])
+    journal = store._journal_files()[-1][1]
+    store.close()
+    with open(journal, 'a', encoding='utf-8') as f:
+        f.write(JournalTaskStore.encode({'op': 'del', 'id': second})[:-7])  # Crash mid-write
+
+    store, tasks, reminded = reopen(store)
+    assert list(tasks) == [second] and reminded == {'1:100@30'}
+    with open(journal, 'rb') as f:
+        assert f.read().endswith(b'\n')  # Torn tail cut off, appends start on a clean line
+    third = store.add(2, task('C'))
+    store, tasks, _ = reopen(store)
+    assert sorted(tasks) == [second, third] and third > second
+    store.close()
+
+def check_compaction():
+    store = JournalTaskStore('tasks', 'users.txt')
+    store.load()
+    first, second = store.add_many(1, [task('A'), task('B')])
+    store.mark_reminded_many([first], ['1:100@30', 'VN0_13h 2/1/2026@30'])
+    store.compact(lambda: ([(second, 1, task('B').raw_line, 1767333600, 'Asia/Ho_Chi_Minh')],
+                           {'1:100@30', 'VN0_13h 2/1/2026@30'}))
+    store.mark_reminded_many([], ['2:200@5'])  # Lands in the journal opened by the compaction
+    assert [gen for gen, _ in store._journal_files()] == [1]
+
+    store, tasks, reminded = reopen(store)
+    assert tasks == {second: (1, task('B').raw_line, 1767333600)}
+    assert reminded == {'1:100@30', 'VN0_13h 2/1/2026@30', '2:200@5'}
+    assert store.add(1, task('C')) == second + 1
+    store.close()
+
+def check_forget():
+    store = JournalTaskStore('tasks', 'users.txt')
+    store.load()
+    store.mark_reminded_many([], ['1:100@30', '1:100@5', '2:200@30'])
+    store.forget_reminded(['1:100@30', '1:100@5'])
+    store, _, reminded = reopen(store)
+    assert reminded == {'2:200@30'}
+    store.close()
+
+def check_deadline_zones():
+    store = JournalTaskStore('tasks', 'users.txt')
+    store.load()
+    first, second = store.add_many(1, [task('A'), task('B')])
+    third = store.add(2, task('C'))
+    store.set_timezone(1, 'Europe/Berlin', [(1767351600, first)])
+    store.set_timezone(2, 'Europe/Berlin')  # Map rewritten, deadlines never journaled
+    store, tasks, _ = reopen(store)
+    assert tasks[first][2] == 1767351600 and tasks[third][2] is None
+    assert tasks[second][2] is None  # Still stamped with the old zone
+    store.close()
+
+def test_journal_store():
+    run_in_tempdir(check_torn_tail, check_compaction, check_forget, check_deadline_zones)
+
+if __name__ == "__main__":
+    test_journal_store()
+    print("✅ Journal store OK")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# Test metrics render in the Prometheus text format and quantiles come out of the buckets
+
+import asyncio
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import Registry, timed, HANDLER_ERRORS, HANDLER_SECONDS
+
+def check_render():
+    registry = Registry()
+    sent = registry.counter('sent_total', 'Sent', ['kind'])
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    registry.gauge('queued', 'Queued', lambda: 7)
+    registry.gauge('users', 'Users', lambda: {('1',): 2, ('+Inf',): 3}, ['le'])
+    sent.labels('reminder').inc(2)
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE sent_total counter' in lines
+    assert 'sent_total{kind="reminder"} 2' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_count 4' in lines
+    assert 'queued 7' in lines and 'users{le="+Inf"} 3' in lines
+
+    child = latency.children[()]
+    assert child.quantile(0.25) == 0.1
+    assert abs(child.quantile(0.5) - 0.55) < 1e-9
+    assert child.quantile(0.99) == 1
+
+def check_timed():
+    @timed('test_handler')
+    async def handler(fail):
+        if fail:
+            raise ValueError(fail)
+
+    asyncio.run(handler(None))
+    try:
+        asyncio.run(handler('boom'))
+    except ValueError:
+        pass
+    assert HANDLER_SECONDS.labels('test_handler').count == 2
+    assert HANDLER_ERRORS.labels('test_handler').value == 1
+
+def test_metrics():
+    check_render()
+    check_timed()
+
+if __name__ == "__main__":
+    test_metrics()
+    print("✅ Metrics OK")
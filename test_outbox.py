@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Test the outbox keeps messages until sent, retries failures, keeps each chat's order and spaces a chat's messages
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from telegram.error import Forbidden, NetworkError, RetryAfter
+
+from outbox import Outbox
+
+class FlakyBot:
+    """Fails the first sends: network errors, one flood control, a blocked chat"""
+    def __init__(self):
+        self.sent = []
+        self.calls = 0
+
+    async def send(self, chat_id, text):
+        self.calls += 1
+        if chat_id == 666:
+            raise Forbidden("bot was blocked by the user")
+        if self.calls in (1, 2):
+            raise NetworkError("connection reset")
+        if self.calls == 6:
+            raise RetryAfter(1)
+        await asyncio.sleep(0.001)
+        self.sent.append((chat_id, text))
+
+def check_outbox(db_file):
+    outbox = Outbox(db_file, concurrency=4, rate=1000, base_delay=0.01, per_chat_interval=0)
+    outbox.add_many([(chat_id, f"{chat_id}:{n}", None) for n in range(3) for chat_id in (1, 2, 3)] + [(666, "x", None)])
+    outbox.close()
+
+    # Nothing sent yet: a new process finds the whole queue
+    outbox = Outbox(db_file, concurrency=4, rate=1000, base_delay=0.01, per_chat_interval=0)
+    assert outbox.load() == 10
+    bot = FlakyBot()
+    asyncio.run(asyncio.wait_for(outbox.run(bot.send, until_empty=True), 10))
+
+    assert len(outbox) == 0 and outbox.messages() == []
+    assert sorted(bot.sent) == sorted((chat_id, f"{chat_id}:{n}") for n in range(3) for chat_id in (1, 2, 3))
+    for chat_id in (1, 2, 3):
+        assert [text for cid, text in bot.sent if cid == chat_id] == [f"{chat_id}:{n}" for n in range(3)]
+    assert outbox.sent == 9 and outbox.dropped == 1 and outbox.retried == 3
+    outbox.close()
+
+def check_per_chat_interval(db_file):
+    outbox = Outbox(db_file, concurrency=4, rate=1000, per_chat_interval=0.2)
+    outbox.add_many([(chat_id, str(n), None) for n in range(3) for chat_id in (1, 2)])
+    sent = {}
+
+    async def send(chat_id, text):
+        sent.setdefault(chat_id, []).append(time.monotonic())
+
+    started = time.monotonic()
+    asyncio.run(asyncio.wait_for(outbox.run(send, until_empty=True), 10))
+    for times in sent.values():
+        assert len(times) == 3
+        assert all(later - earlier >= 0.19 for earlier, later in zip(times, times[1:]))
+    # Other chats are not held up by one chat's spacing
+    assert time.monotonic() - started < 0.6
+    outbox.close()
+
+def test_outbox():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_outbox(os.path.join(tmp, 'outbox.db'))
+    with tempfile.TemporaryDirectory() as tmp:
+        check_per_chat_interval(os.path.join(tmp, 'outbox.db'))
+
+if __name__ == "__main__":
+    test_outbox()
+    print("✅ Outbox OK")
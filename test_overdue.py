@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Test tasks past their reminder window are flagged at ingest (also in paste summaries), are not reminded by a tick
+# that comes after the deadline, and are archived by the sweep, which also forgets old reminder keys
+
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import working_chat_bot
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import TASK_ADDED, TaskReminder
+
+def order_ids(reminder, user_id):
+    reminder.ensure_user(user_id)
+    return [task.order_id for task in reminder.user_tasks.get(user_id, [])]
+
+def check_overdue():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    results = reminder.add_tasks_batch([task_line('PAST', -2), task_line('SOON', 0.25), task_line('LATER', 5)], 1)
+    assert [status for _, status, _ in results] == [TASK_ADDED] * 3
+    assert 'quá hạn' in results[0][2] and 'phút' in results[1][2]
+    assert 'quá hạn' not in results[2][2] and 'phút' not in results[2][2]
+
+    # The overdue task never enters the reminder scheduler; the imminent one fires on the next tick
+    assert len(reminder.overdue) == 1 and len(reminder.scheduler) == 2
+    assert [task.order_id for task in reminder.check_reminders()] == ['SOON']
+
+    assert reminder.expire_overdue() == 1
+    assert order_ids(reminder, 1) == ['LATER'] and len(reminder.overdue) == 0
+    assert reminder.check_indexes() == []
+    archived = reminder.store.conn.execute('SELECT raw_line FROM expired_tasks').fetchall()
+    assert len(archived) == 1 and 'PAST' in archived[0][0]
+
+    # Overdue tasks not swept before shutdown are indexed again from the snapshot
+    reminder.add_tasks_batch([task_line('GONE', -1)], 2)
+    reminder.store.close()
+    reminder.save_snapshot()
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    assert restarted.snapshot is not None
+    assert len(restarted.overdue) == 1 and len(restarted.scheduler) == 1
+    assert restarted.expire_overdue() == 1
+    assert order_ids(restarted, 2) == [] and order_ids(restarted, 1) == ['LATER']
+    assert restarted.check_indexes() == []
+
+    # A paste answers with one summary that still counts the overdue and imminent tickets
+    summary = restarted.add_pasted_tasks([task_line('P1', -1), task_line('P2', 0.1), task_line('P3', 0.2),
+                                          task_line('P4', 5), task_line('P4', 5), 'rác'], 3)
+    assert '✅ Thêm thành công: 4' in summary and '🔄 Trùng lặp: 1' in summary and '❌ Lỗi: 1' in summary
+    assert '⚠️ Sắp đến deadline: 2' in summary and '⌛ Đã quá hạn: 1' in summary
+    restarted.store.close()
+
+def check_tick_after_deadline():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.add_tasks_batch([task_line('SOON', 0.25), task_line('LATER', 5)], 1)
+    soon = reminder.find_task_by_order_id('SOON', 1)
+    # The loop was stalled past the deadline: no reminder, the task waits for the sweep
+    assert reminder.check_reminders(soon.deadline_ts + 60) == []
+    assert reminder.reminded_tasks == set() and soon.id not in reminder.scheduler
+    assert len(reminder.outbox) == 0 and len(reminder.overdue) == 1
+    assert reminder.expire_overdue(soon.deadline_ts + 60) == 1
+    assert order_ids(reminder, 1) == ['LATER'] and reminder.check_indexes() == []
+    reminder.store.close()
+
+def check_forget_reminded():
+    store = TaskReminder().store
+    store.mark_reminded(None, 'VN9_20h59 17/1/2020@30')  # Key written before keys named the task id
+    store.close()
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.add_tasks_batch([task_line('SOON', 0.25), task_line('LATER', 5)], 1)
+    soon = reminder.find_task_by_order_id('SOON', 1)
+    reminder.check_reminders()
+    assert len(reminder.reminded_tasks) == 2 and soon.id in reminder.fired_offsets
+
+    # Kept while /tz could still move the deadline, dropped by the sweep after that
+    assert reminder.forget_reminded(soon.deadline_ts + working_chat_bot.REMINDED_KEY_GRACE) == 1
+    assert reminder.legacy_fired == {} and soon.id in reminder.fired_offsets
+    reminder.expire_overdue(soon.deadline_ts + working_chat_bot.REMINDED_KEY_GRACE + 1)
+    assert reminder.reminded_tasks == set() and reminder.fired_offsets == {}
+    assert reminder.store.load()[1] == set()
+    reminder.store.close()
+
+def test_overdue():
+    run_in_tempdir(check_overdue, check_tick_after_deadline, check_forget_reminded)
+
+if __name__ == "__main__":
+    test_overdue()
+    print("✅ Overdue sweep OK")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# Test the sampling profiler sees a busy thread and the memory tracker sees what grew
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from profiler import MemoryTracker, SamplingProfiler
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def check_sampling():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name='spinner')
+    worker.start()
+    try:
+        profiler = SamplingProfiler(interval=0.002).run(0.3)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.samples > 10
+    own, cumulative = profiler.top()
+    assert any(label.startswith('spin (test_profiler.py') for label, _ in cumulative)
+    assert 'spin (test_profiler.py' in profiler.summary()
+    folded = profiler.collapsed().splitlines()
+    assert any(line.startswith('spinner;') and 'spin (test_profiler.py' in line for line in folded)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in folded)
+
+def check_memory():
+    tracker = MemoryTracker()
+    tracker.start()
+    try:
+        grown = [bytearray(1024) for _ in range(2000)]
+        summary, report = tracker.diff()
+        assert 'test_profiler.py' in summary and 'test_profiler.py' in report
+        del grown
+    finally:
+        tracker.stop()
+    assert not tracker.active and not tracemalloc.is_tracing()
+
+def test_profiler():
+    check_sampling()
+    check_memory()
+
+if __name__ == "__main__":
+    test_profiler()
+    print("✅ Profiler OK")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Test a user's nearby reminders go out as one message, chunked under Telegram's limit,
+# and are only marked reminded once they are in the outbox
+
+import asyncio
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import working_chat_bot
+from benchmarks.workload import FakeBot
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import MAX_MESSAGE_LENGTH, TaskReminder, reminder_messages
+
+def check_coalescing():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.set_bot(FakeBot())
+
+    # User 1: three tickets 2 minutes apart, one an hour later; user 2: one ticket 2 minutes later
+    reminder.add_tasks_batch([task_line('A', 2), task_line('B', 2 + 2 / 60), task_line('C', 2 + 4 / 60),
+                              task_line('D', 3)], 1)
+    reminder.add_tasks_batch([task_line('E', 2 + 2 / 60)], 2)
+    first = reminder.find_task_by_order_id('A', 1)
+    due = reminder.check_reminders(first.deadline_ts - working_chat_bot.REMINDER_LEAD_SECONDS)
+    assert sorted(task.order_id for task in due) == ['A', 'B', 'C']
+    assert [task.order_id for task in reminder.user_tasks[1]] == ['D']
+    assert len(reminder.scheduler) == 2
+    assert reminder.check_indexes() == []
+
+    asyncio.run(reminder.outbox.run(reminder.deliver_message, until_empty=True))
+    assert len(reminder.bot.sent) == 1
+    chat_id, text, _ = reminder.bot.sent[0]
+    assert chat_id == 1 and all(order_id in text for order_id in 'ABC')
+    assert reminder.reminders_sent - reminder.reminder_messages_sent == 2
+    reminder.store.close()
+
+def check_outbox_failure():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.add_tasks_batch([task_line('A', 2)], 1)
+    task = reminder.find_task_by_order_id('A', 1)
+    fire_at = task.deadline_ts - working_chat_bot.REMINDER_LEAD_SECONDS
+
+    def add_many(messages, kind):
+        raise OSError("disk full")
+    reminder.outbox.add_many = add_many
+    try:
+        reminder.check_reminders(fire_at)
+        assert False, "outbox failure swallowed"
+    except OSError:
+        pass
+    # Not marked anywhere: the task is still listed and fires again on the next tick
+    assert reminder.store.load()[1] == set() and reminder.reminded_tasks == set()
+    assert [t.order_id for t in reminder.user_tasks[1]] == ['A']
+    assert reminder.scheduler.fire_time(task.id) == fire_at
+    del reminder.outbox.add_many
+    assert [t.order_id for t in reminder.check_reminders(fire_at)] == ['A']
+    assert len(reminder.outbox) == 1 and len(reminder.store.load()[1]) == 1
+    reminder.store.close()
+
+def check_chunking():
+    long_link = 'https://ghn.vn/' + 'x' * 900
+    tasks = [working_chat_bot.task_parser.Task(long_link, f"VN{i:04d}", '1/1/2026', '13h 2/1/2026', 0)
+             for i in range(20)]
+    messages = reminder_messages(tasks)
+    assert len(messages) > 1
+    assert all(len(message) <= MAX_MESSAGE_LENGTH for message in messages)
+    text = ''.join(messages)
+    assert all(text.count(f"VN{i:04d}") == 1 for i in range(20))
+
+def test_reminder_coalescing():
+    check_chunking()
+    run_in_tempdir(check_coalescing, check_outbox_failure)
+
+if __name__ == "__main__":
+    test_reminder_coalescing()
+    print("✅ Reminder coalescing OK")
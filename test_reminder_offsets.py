@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Test per-user reminder offsets: one scheduler entry per task, each offset fired once, kept across restarts
+
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import TaskReminder, parse_offset, reminder_messages
+
+OFFSETS = (2 * 3600, 30 * 60, 5 * 60)
+
+def fire(reminder, at):
+    return [task.order_id for task in reminder.check_reminders(at)]
+
+def check_offsets():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.set_offsets(1, [300, 7200, 1800])
+    assert reminder.offsets_for(1) == OFFSETS and reminder.offsets_for(2) == (1800,)
+    reminder.add_tasks_batch([task_line('A', 3), task_line('B', 6)], 1)
+    a = reminder.find_task_by_order_id('A', 1)
+    b = reminder.find_task_by_order_id('B', 1)
+    assert len(reminder.scheduler) == 2
+    assert reminder.scheduler.fire_time(a.id) == a.deadline_ts - 7200
+
+    # Each offset fires once; the task stays listed until its last reminder
+    assert fire(reminder, a.deadline_ts - 7200) == ['A']
+    assert reminder.scheduler.fire_time(a.id) == a.deadline_ts - 1800
+    assert fire(reminder, a.deadline_ts - 1800) == ['A']
+    assert fire(reminder, a.deadline_ts - 1800) == []
+    assert [task.order_id for task in reminder.user_tasks[1]] == ['A', 'B']
+    assert fire(reminder, a.deadline_ts - 300) == ['A']
+    assert [task.order_id for task in reminder.user_tasks[1]] == ['B']
+    assert f"{a.id}:{a.deadline_ts}@5" in reminder.reminded_tasks
+
+    # A late tick sends only the latest missed offset
+    assert fire(reminder, b.deadline_ts - 600) == ['B']
+    assert reminder.scheduler.fire_time(b.id) == b.deadline_ts - 300
+    assert reminder.check_indexes() == []
+    assert 'Còn 10 phút' in reminder_messages([b], b.deadline_ts - 600)[0]
+
+    # Offsets and fired reminders survive a restart from the store
+    reminder.store.close()
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    assert restarted.offsets_for(1) == OFFSETS
+    b = restarted.find_task_by_order_id('B', 1)
+    assert restarted.scheduler.fire_time(b.id) == b.deadline_ts - 300
+
+    # Changing offsets moves pending reminders; reset goes back to the default
+    restarted.set_offsets(1, [60])
+    assert restarted.scheduler.fire_time(b.id) == b.deadline_ts - 60
+    restarted.set_offsets(1, None)
+    assert restarted.offsets_for(1) == (1800,) and b.id not in restarted.scheduler
+    assert b.id in restarted.overdue  # 30 minutes already fired: nothing left to send
+    restarted.store.close()
+
+def check_shared_ticket():
+    """Two users holding the same ticket line each get their own reminders"""
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    line = task_line('SAME', 3)
+    reminder.add_tasks_batch([line], 1)
+    reminder.add_tasks_batch([line], 2)
+    mine = reminder.find_task_by_order_id('SAME', 1)
+    theirs = reminder.find_task_by_order_id('SAME', 2)
+    fired = reminder.check_reminders(mine.deadline_ts - 1800)
+    assert sorted(task.user_id for task in fired) == [1, 2]
+    assert reminder.user_tasks[1] == [] and reminder.user_tasks[2] == []
+    assert {f"{mine.id}:{mine.deadline_ts}@30", f"{theirs.id}:{theirs.deadline_ts}@30"} <= reminder.reminded_tasks
+    reminder.store.close()
+
+def test_reminder_offsets():
+    assert [parse_offset(text) for text in ('2h', '1h30', '30m', '5p', '45')] == [7200, 5400, 1800, 300, 2700]
+    run_in_tempdir(check_offsets, check_shared_ticket)
+
+if __name__ == "__main__":
+    test_reminder_offsets()
+    print("✅ Reminder offsets OK")
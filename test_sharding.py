@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# Test resharding moves every task and user to the shard that owns it
+
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sharding
+import working_chat_bot
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import TaskReminder
+
+def snapshot(count):
+    """{user_id: sorted order_ids} read back from every shard, checking ownership"""
+    tasks = {}
+    for index, store in enumerate(sharding.shard_stores(count)):
+        rows, _ = store.load()
+        for user_id, line, _ in rows.values():
+            assert sharding.shard_for(user_id, count) == index
+            tasks.setdefault(user_id, []).append(line.split('|')[1].strip())
+        for user_id in store.load_users():
+            assert sharding.shard_for(user_id, count) == index
+        store.close()
+    return {user_id: sorted(order_ids) for user_id, order_ids in tasks.items()}
+
+def check_reshard(store_kind):
+    working_chat_bot.TASK_STORE = store_kind
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    for user_id in range(1, 8):
+        reminder.add_tasks_batch([task_line(f"U{user_id}T{n}") for n in range(user_id)], user_id)
+        reminder.save_user(user_id)
+    reminder.store.close()
+    expected = snapshot(1)
+
+    for count in (3, 2, 1):
+        sharding.reshard(count)
+        assert sharding.recorded_shards() == count
+        assert snapshot(count) == expected, count
+    assert not os.path.exists(sharding.STATE_FILE)
+
+def test_reshard():
+    store_kind = working_chat_bot.TASK_STORE
+    try:
+        run_in_tempdir(lambda: check_reshard('sqlite'), lambda: check_reshard('journal'))
+    finally:
+        working_chat_bot.TASK_STORE = store_kind
+
+if __name__ == "__main__":
+    test_reshard()
+    print("✅ Resharding OK")
@@ -0,0 +1,20 @@
+# test_support.py
+# Shared by the test_*.py files: run checks inside throwaway working directories
+
+import os
+import tempfile
+
+def run_in_tempdir(*checks):
+    """Run each check with a fresh empty directory as the working directory
+
+    TaskReminder and its stores write tasks.db, outbox.db and the like to
+    the current directory, so every check starts from nothing.
+    """
+    cwd = os.getcwd()
+    for check in checks:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                check()
+            finally:
+                os.chdir(cwd)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Test TaskReminder order_id / duplicate indexes stay consistent with user_tasks
+
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import working_chat_bot
+from task_parser import get_timezone
+from test_support import run_in_tempdir
+from working_chat_bot import TaskReminder, TASK_ADDED, TASK_DUPLICATE
+
+def task_line(order_id, hours_ahead=5, link='ghn.com', tz=None):
+    """Task line due hours_ahead from now, written in tz (default timezone when None)"""
+    deadline = datetime.now(get_timezone(tz)) + timedelta(hours=hours_ahead)
+    return f"{link} | {order_id} | 1/1/2026 | {deadline.hour}h{deadline.minute} | {deadline.day}/{deadline.month}/{deadline.year}"
+
+def test_task_indexes():
+    """Run the index checks inside a scratch directory"""
+    run_in_tempdir(check_task_indexes)
+
+def check_task_indexes():
+    """Indexes follow every add / delete / del all / reminder removal"""
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    user_id = 111
+
+    results = reminder.add_tasks_batch(
+        [task_line('A1'), task_line('A2'), task_line('A1'), task_line('A1', link='other.com')], user_id)
+    assert [status for _, status, _ in results] == [TASK_ADDED, TASK_ADDED, TASK_DUPLICATE, TASK_ADDED]
+    assert reminder.check_indexes() == []
+    assert reminder.find_task_by_order_id('A2', user_id).order_id == 'A2'
+
+    reminder.delete_task_at(user_id, 0)
+    assert reminder.check_indexes() == []
+    assert reminder.find_task_by_order_id('A1', user_id).link == 'other.com'
+
+    # Reminder for a task with < 30 minutes left fires on the next check
+    reminder.add_task_from_message(task_line('SOON', hours_ahead=0.2), user_id)
+    reminders = reminder.check_reminders()
+    assert [task.order_id for task in reminders] == ['SOON']
+    assert reminder.find_task_by_order_id('SOON', user_id) is None
+    assert reminder.check_indexes() == []
+
+    reminder.delete_all_tasks(user_id)
+    assert reminder.check_indexes() == []
+    assert not reminder.is_exact_duplicate(reminder.parse_task_line(task_line('A2')), user_id)
+
+    # Pastes are parsed before the user's lock is taken: another thread can still get it
+    parse_many = working_chat_bot.task_parser.parse_many
+    lock_free = []
+
+    def try_lock():
+        lock = reminder.user_lock(user_id)
+        lock_free.append(lock.acquire(blocking=False))
+        if lock_free[-1]:
+            lock.release()
+
+    def parse_outside_lock(lines, tz=None):
+        worker = threading.Thread(target=try_lock)
+        worker.start()
+        worker.join()
+        return parse_many(lines, tz)
+    working_chat_bot.task_parser.parse_many = parse_outside_lock
+    try:
+        results = reminder.add_tasks_batch([task_line('B1'), task_line('B2')], user_id)
+    finally:
+        working_chat_bot.task_parser.parse_many = parse_many
+    assert lock_free == [True] and [status for _, status, _ in results] == [TASK_ADDED, TASK_ADDED]
+    reminder.store.close()
+
+if __name__ == "__main__":
+    test_task_indexes()
+    print("✅ Index test passed!")
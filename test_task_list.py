@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# Test /list pages are sorted by deadline, split by length without cutting entries, the page cache never serves stale text and /del checks its index
+
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import working_chat_bot
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import DELETE_BAD_INDEX, DELETE_DONE, DELETE_NO_TASKS, LIST_PAGE_SIZE, TaskReminder
+
+def fresh_pages(reminder, user_id):
+    """Every page rendered with an empty cache"""
+    reminder.list_pages.pop(user_id, None)
+    _, _, page_count = reminder.format_task_list(user_id)
+    pages = [reminder.format_task_list(user_id, page)[0] for page in range(page_count)]
+    reminder.list_pages.pop(user_id, None)
+    return pages
+
+def cached_pages(reminder, user_id):
+    _, _, page_count = reminder.format_task_list(user_id)
+    return [reminder.format_task_list(user_id, page)[0] for page in range(page_count)]
+
+def check_task_list():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    user_id = 222
+
+    # Added out of deadline order, more than two pages
+    hours = [(n * 7) % 25 + 1 for n in range(25)]
+    reminder.add_tasks_batch([task_line(f"L{n}", hours_ahead=h) for n, h in enumerate(hours)], user_id)
+    deadlines = [task.deadline_ts for task in reminder.user_tasks[user_id]]
+    assert deadlines == sorted(deadlines)
+
+    text, page, page_count = reminder.format_task_list(user_id, 99)
+    assert (page, page_count) == (2, 3)
+    assert text.count('🔗') == 25 - 2 * LIST_PAGE_SIZE
+    assert all(len(text) <= working_chat_bot.MAX_MESSAGE_LENGTH for text in cached_pages(reminder, user_id))
+
+    # Every mutation leaves the cache equal to a fresh render
+    reminder.add_task_from_message(task_line('EARLY', hours_ahead=0.7), user_id)
+    assert cached_pages(reminder, user_id) == fresh_pages(reminder, user_id)
+    cached_pages(reminder, user_id)
+    reminder.add_task_from_message(task_line('LATE', hours_ahead=40), user_id)
+    assert cached_pages(reminder, user_id) == fresh_pages(reminder, user_id)
+    cached_pages(reminder, user_id)
+    first = reminder.user_tasks[user_id][0]
+    count = len(reminder.user_tasks[user_id])
+    assert reminder.delete_task_at(user_id, 0) == (DELETE_DONE, first, count - 1)
+    assert reminder.delete_task_at(user_id, count - 1) == (DELETE_BAD_INDEX, None, count - 1)
+    assert reminder.delete_task_at(user_id, -1)[0] == DELETE_BAD_INDEX
+    assert cached_pages(reminder, user_id) == fresh_pages(reminder, user_id)
+    cached_pages(reminder, user_id)
+    reminder.check_reminders(reminder.user_tasks[user_id][0].deadline_ts - 1)
+    assert cached_pages(reminder, user_id) == fresh_pages(reminder, user_id)
+    assert reminder.check_indexes() == []
+
+    reminder.delete_all_tasks(user_id)
+    assert reminder.format_task_list(user_id)[2] == 0
+    assert reminder.delete_task_at(user_id, 0) == (DELETE_NO_TASKS, None, 0)
+    reminder.store.close()
+
+def check_long_links():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    user_id = 333
+
+    # Long links fill a message before LIST_PAGE_SIZE entries do
+    links = [f"ghn.com/{n}/" + 'x' * 700 for n in range(12)]
+    reminder.add_tasks_batch([task_line(f"W{n}", hours_ahead=n + 1, link=link) for n, link in enumerate(links)], user_id)
+    pages = cached_pages(reminder, user_id)
+    assert len(pages) > 2
+    assert all(len(text) <= working_chat_bot.MAX_MESSAGE_LENGTH for text in pages)
+    rendered = ''.join(pages)
+    assert all(rendered.count(link + '\n') == 1 for link in links)
+    assert [text.count('🔗') for text in pages[:-1]] == [max(text.count('🔗') for text in pages)] * (len(pages) - 1)
+
+    # Entries added later join the pages they belong on
+    reminder.add_task_from_message(task_line('SHORT', hours_ahead=30), user_id)
+    reminder.add_task_from_message(task_line('FIRST', hours_ahead=0.5), user_id)
+    assert cached_pages(reminder, user_id) == fresh_pages(reminder, user_id)
+
+    # A link too long for a message on its own is shortened, not the page
+    huge = 'ghn.com/' + 'y' * 5000
+    reminder.add_task_from_message(task_line('HUGE', hours_ahead=50, link=huge), user_id)
+    text, page, page_count = reminder.format_task_list(user_id, 99)
+    assert page == page_count - 1
+    assert 'HUGE' in text and text.endswith('…\n\n')
+    assert len(text) <= working_chat_bot.MAX_MESSAGE_LENGTH
+    assert cached_pages(reminder, user_id) == fresh_pages(reminder, user_id)
+    reminder.store.close()
+
+def test_task_list():
+    run_in_tempdir(check_task_list, check_long_links)
+
+if __name__ == "__main__":
+    test_task_list()
+    print("✅ /list pages OK")
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# Golden tests: task_parser must parse every supported format exactly like the original parser
+
+import os
+import re
+import sys
+from datetime import datetime
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from task_parser import deadline_timestamp, get_timezone, parse_deadline, parse_many, parse_task_line
+
+def legacy_parse_task_line(line):
+    """Original task line parser, kept as the reference for golden tests"""
+    # Try different separators
+    separators = ['|', ',', ';', '  ']  # pipe, comma, semicolon, double space
+
+    for sep in separators:
+        parts = line.split(sep)
+        if len(parts) >= 5:
+            # New format: link | order_id | ngay_tao | gio_deadline | ngay_deadline
+            gio_deadline = parts[3].strip()
+            ngay_deadline = parts[4].strip()
+            deadline_full = f"{gio_deadline} {ngay_deadline}"
+
+            return {
+                'link': parts[0].strip(),
+                'order_id': parts[1].strip(),
+                'input_date': parts[2].strip(),
+                'gio_deadline': gio_deadline,
+                'ngay_deadline': ngay_deadline,
+                'deadline': deadline_full,
+                'raw_line': line.strip()
+            }
+        elif len(parts) >= 4:
+            # Old format: link | order_id | input_date | deadline
+            return {
+                'link': parts[0].strip(),
+                'order_id': parts[1].strip(),
+                'input_date': parts[2].strip(),
+                'deadline': parts[3].strip(),
+                'raw_line': line.strip()
+            }
+
+    # If no separator found, try to parse by counting parts
+    parts = line.split()
+    if len(parts) >= 5:
+        # New format: link order_id ngay_tao gio_deadline ngay_deadline
+        ngay_deadline = parts[-1]
+        gio_deadline = parts[-2]
+        input_date = parts[-3]
+        order_id = parts[-4]
+        link = ' '.join(parts[:-4])
+
+        deadline_full = f"{gio_deadline} {ngay_deadline}"
+
+        return {
+            'link': link,
+            'order_id': order_id,
+            'input_date': input_date,
+            'gio_deadline': gio_deadline,
+            'ngay_deadline': ngay_deadline,
+            'deadline': deadline_full,
+            'raw_line': line.strip()
+        }
+    elif len(parts) >= 4:
+        # Old format: link order_id input_date deadline
+        deadline = parts[-1]
+        input_date = parts[-2]
+        order_id = parts[-3]
+        link = ' '.join(parts[:-3])
+
+        return {
+            'link': link,
+            'order_id': order_id,
+            'input_date': input_date,
+            'deadline': deadline,
+            'raw_line': line.strip()
+        }
+
+    return None
+
+def legacy_parse_deadline(deadline_str):
+    """Original deadline parser, kept as the reference for golden tests"""
+    try:
+        # Try format with minutes and full year: 20h59 17/1/2026
+        match = re.match(r'(\d+)[hH](\d+)\s+(\d+)/(\d+)/(\d+)', deadline_str.strip())
+        if match:
+            hour = int(match.group(1))
+            minute = int(match.group(2))
+            day = int(match.group(3))
+            month = int(match.group(4))
+            year = int(match.group(5))
+        else:
+            # Try format with minutes: 13h30 17/1
+            match = re.match(r'(\d+)[hH](\d+)\s+(\d+)/(\d+)', deadline_str.strip())
+            if match:
+                hour = int(match.group(1))
+                minute = int(match.group(2))
+                day = int(match.group(3))
+                month = int(match.group(4))
+                year = datetime.now().year
+            else:
+                # Try format without minutes: 13H 17/1
+                match = re.match(r'(\d+)[hH]\s+(\d+)/(\d+)', deadline_str.strip())
+                if match:
+                    hour = int(match.group(1))
+                    minute = 0
+                    day = int(match.group(2))
+                    month = int(match.group(3))
+                    year = datetime.now().year
+                else:
+                    return None
+
+        deadline_dt = datetime(year, month, day, hour, minute, 0)
+
+        return deadline_dt
+    except Exception as e:
+        print(f"Error parsing deadline '{deadline_str}': {e}")
+    return None
+
+# Formats listed in /help plus edge cases around separators and deadlines
+GOLDEN_CORPUS = [
+    "https://link.com | VNGH123 | 16/1/2026 | 20h59 | 17/1/2026",
+    "https://link.com , VNGH123 , 16/1/2026 , 20h59 , 17/1/2026",
+    "https://link.com ; VNGH123 ; 16/1/2026 ; 20h59 ; 17/1/2026",
+    "https://link.com VNGH123 16/1/2026 20h59 17/1/2026",
+    "https://link.com | VNGH123 | 16-thg 1 | 13H 17/1",
+    "ghn.com VN12345 1/1/2026 13h 2/1/2026",
+    "ghn.com  VN12345  1/1/2026  13h30  2/1",
+    "ghn.com\tVN12345\t1/1/2026\t13h30\t2/1",
+    "  https://link.com | VNGH123 | 16/1/2026 | 20h59 | 17/1/2026 | extra | more  ",
+    "https://a.com/x,y | VN1 | 1/1 | 9h | 3/3",
+    "a, b | c | d | 10h 1/1",
+    "a | b | c",
+    "a,b,c,d",
+    "a;b;c;8H 5/5",
+    "my link with spaces VN9 1/1/2026 7h05 8/8/2026",
+    "link VN9 1/1 7h 8/8",
+    "link VN9 1/1 7h",
+    "ghn.com | VN1 | 1/1 | 25h | 1/1/2026",
+    "ghn.com | VN1 | 1/1 | 10h | 31/2",
+    "ghn.com | VN1 | 1/1 | 10h61 | 3/2/2026",
+    "ghn.com | VN1 | 1/1 | 10H30 | 3/2/",
+    "ghn.com | VN1 | 1/1 | 10h | 3/2/2027",
+    "ghn.com | VN1 | 1/1 | h30 | 3/2",
+    "ghn.com | VN1 | 1/1 | 10:30 | 3/2",
+    "ghn.com | VN1 | 1/1 | 10h30x | 3/2",
+    "ghn.com | VN1 | 1/1 | 10h30 | 3/2/2026 trailing",
+    "",
+    "   ",
+    "one two three",
+]
+
+def fields(task):
+    """Comparable fields of a Task or of an original parser dict"""
+    if task is None:
+        return None
+    if isinstance(task, dict):
+        return (task['link'], task['order_id'], task['input_date'], task['deadline'])
+    return task.identity
+
+def test_task_lines_match_original_parser():
+    for line in GOLDEN_CORPUS:
+        assert fields(parse_task_line(line)) == fields(legacy_parse_task_line(line)), line
+
+def test_deadlines_match_original_parser():
+    for line in GOLDEN_CORPUS:
+        task = legacy_parse_task_line(line)
+        if task:
+            assert parse_deadline(task['deadline']) == legacy_parse_deadline(task['deadline']), line
+
+def test_help_formats():
+    expected = datetime(2026, 1, 17, 20, 59)
+    for line in GOLDEN_CORPUS[:4]:
+        task = parse_task_line(line)
+        assert (task.link, task.order_id, task.input_date) == ('https://link.com', 'VNGH123', '16/1/2026'), line
+        assert parse_deadline(task.deadline) == expected, line
+    old = parse_task_line(GOLDEN_CORPUS[4])
+    assert old.deadline == '13H 17/1'
+    assert parse_deadline(old.deadline) == datetime(datetime.now().year, 1, 17, 13, 0)
+
+def test_parse_many_matches_single_line_parsing():
+    tasks = parse_many(GOLDEN_CORPUS)
+    assert len(tasks) == len(GOLDEN_CORPUS)
+    for line, task in zip(GOLDEN_CORPUS, tasks):
+        expected = legacy_parse_task_line(line)
+        assert fields(task) == fields(expected), line
+        if expected is None:
+            continue
+        deadline_dt = legacy_parse_deadline(expected['deadline'])
+        # Same wall time, read in the default timezone instead of the server's
+        assert task.deadline_ts == (int(deadline_dt.replace(tzinfo=get_timezone()).timestamp())
+                                    if deadline_dt else None), line
+
+def test_deadlines_are_utc_epochs_in_the_users_timezone():
+    line = GOLDEN_CORPUS[0]
+    utc = datetime(2026, 1, 17, 20, 59, tzinfo=get_timezone('UTC')).timestamp()
+    assert parse_many([line], get_timezone('UTC'))[0].deadline_ts == utc
+    assert parse_many([line])[0].deadline_ts == utc - 7 * 3600  # Asia/Ho_Chi_Minh is UTC+7
+    assert parse_many([line], get_timezone('Europe/Berlin'))[0].deadline_ts == utc - 3600
+    try:
+        get_timezone('Mars/Olympus')
+        assert False, "unknown timezone accepted"
+    except ValueError:
+        pass
+
+def test_cached_day_offsets_match_aware_timestamps():
+    # Every hour of the days around Berlin's 2026 DST changes (29/3 and 25/10), plus a Vietnamese day
+    lines = [f"ghn.com | VN{day}{hour} | 1/1 | {hour}h30 {day}/{month}/2026"
+             for month, days in ((3, (28, 29, 30)), (10, (24, 25, 26))) for day in days for hour in range(24)]
+    for tz in (get_timezone('Europe/Berlin'), get_timezone()):
+        for line, task in zip(lines, parse_many(lines, tz)):
+            assert task.deadline_ts == deadline_timestamp(task.deadline, tz), (tz, line)
+
+def test_raw_line_round_trips():
+    for task in parse_many(GOLDEN_CORPUS + ["a|b , VN1 , 1/1 , 10h , 2/2", "https://x.com/a;b | VN2 | 1/1 | 9h 2/2"]):
+        if task is not None:
+            assert fields(parse_task_line(task.raw_line)) == fields(task), task.raw_line
+
+if __name__ == "__main__":
+    test_task_lines_match_original_parser()
+    test_deadlines_match_original_parser()
+    test_help_formats()
+    test_parse_many_matches_single_line_parsing()
+    test_deadlines_are_utc_epochs_in_the_users_timezone()
+    test_cached_day_offsets_match_aware_timestamps()
+    test_raw_line_round_trips()
+    print("✅ Parser golden tests passed!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# Test a restart from the binary task snapshot sees exactly the state that was saved, plus the changes made since
+
+import os
+import sys
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import TaskReminder
+
+def state(reminder):
+    """({user_id: [(id, line)]}, pending reminder ids) with every user materialized"""
+    reminder.ensure_all_users()
+    tasks = {
+        user_id: [(task.id, task.raw_line, task.deadline_ts) for task in tasks]
+        for user_id, tasks in reminder.user_tasks.items() if tasks
+    }
+    return tasks, sorted(key for key, _, _ in reminder.scheduler.entries())
+
+def restart(reminder):
+    reminder.store.close()
+    reminder.save_snapshot()
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    return restarted
+
+def check_task_snapshot():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    for user_id in (5, 6, 7):
+        reminder.add_tasks_batch([task_line(f"U{user_id}T{n}", hours_ahead=n + 1) for n in range(12)], user_id)
+    reminder.add_tasks_batch([task_line("PAST", hours_ahead=-3)], 5)
+    reminder.delete_task_at(6, 3)
+    reminder.check_reminders(reminder.user_tasks[7][0].deadline_ts - 1)
+    expected = state(reminder)
+
+    restarted = restart(reminder)
+    assert restarted.snapshot is not None and restarted.cold_users == {5, 6, 7}
+    assert len(restarted.scheduler) == len(expected[1])
+    assert restarted.reminded_tasks == reminder.reminded_tasks
+
+    # Cold users are built on first use; cold reminders can be cancelled before that
+    restarted.delete_task_at(6, 0)
+    assert 6 not in restarted.cold_users
+    expected_6 = expected[0][6][1:]
+    assert [(t.id, t.raw_line, t.deadline_ts) for t in restarted.user_tasks[6]] == expected_6
+    assert restarted.check_indexes() == []
+
+    # Due cold reminders resolve to the Task objects, which are then removed;
+    # the T1 deadlines passed before this tick, so those go to the overdue sweep unreminded
+    due_at = restarted.find_task_by_order_id("U5T2", 5).deadline_ts - 1
+    reminders = restarted.check_reminders(due_at)
+    assert sorted(task.order_id for task in reminders) == ["U5T2", "U6T2", "U7T2"]
+    assert sorted(task.order_id for _, _, task in restarted.overdue.entries()) == ["PAST", "U5T1", "U7T1"]
+    assert restarted.expire_overdue(due_at) == 3
+    assert all(task not in restarted.user_tasks[task.user_id] for task in reminders)
+    assert restarted.check_indexes() == []
+
+    expected = state(restarted)
+    again = restart(restarted)
+    assert again.snapshot is not None and state(again) == expected
+    # Writes after the snapshot reload only the users they touched
+    again = restart(again)
+    again.add_tasks_batch([task_line("NEW")], 8)
+    again.delete_task_at(5, 0)
+    expected = state(again)
+    again.store.close()
+    replayed = TaskReminder()
+    replayed.load_tasks()
+    assert replayed.snapshot is not None and replayed.cold_users == {6, 7}
+    assert state(replayed) == expected
+    assert replayed.check_indexes() == []
+    replayed.store.close()
+
+def check_crash_after_periodic_snapshot():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    for user_id in (1, 2, 3):
+        reminder.add_tasks_batch([task_line(f"U{user_id}T{n}", hours_ahead=n + 1) for n in range(5)], user_id)
+    assert reminder.save_snapshot()  # Mid-run, the store still open
+    reminder.add_tasks_batch([task_line("LATE")], 4)
+    reminder.delete_task_at(1, 0)
+    reminder.set_timezone(2, 'Europe/Berlin')
+    expected = state(reminder)
+    reminder.store.close()  # Crash: no snapshot at shutdown
+
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    assert restarted.snapshot is not None and restarted.cold_users == {3}
+    assert state(restarted) == expected
+    assert restarted.check_indexes() == []
+    restarted.store.close()
+
+def test_task_snapshot():
+    run_in_tempdir(check_task_snapshot, check_crash_after_periodic_snapshot)
+
+if __name__ == "__main__":
+    test_task_snapshot()
+    print("✅ Task snapshot OK")
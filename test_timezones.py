@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# Test per-user timezones: deadlines become UTC epochs read in the user's zone, are loaded back without
+# parsing again, and the scheduler clock follows wall-clock steps
+
+import os
+import sys
+from datetime import datetime
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scheduler import MonotonicClock
+from task_parser import get_timezone
+from test_support import run_in_tempdir
+from test_task_indexes import task_line
+from working_chat_bot import DEFAULT_GREETING_MINUTE, TaskReminder
+
+BERLIN = get_timezone('Europe/Berlin')
+
+def written(task, tz):
+    """The deadline as the user wrote it, converted back from the epoch"""
+    local = task.deadline_in(tz)
+    return f"{local.hour}h{local.minute} {local.day}/{local.month}/{local.year}"
+
+def check_timezones():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.add_tasks_batch([task_line('A', 30)], 1)
+    a = reminder.find_task_by_order_id('A', 1)
+    assert written(a, get_timezone()) == a.deadline
+
+    # Switching zone re-reads the pending deadlines there and moves their reminders
+    assert reminder.set_timezone(1, 'Europe/Berlin') == 1
+    assert written(a, BERLIN) == a.deadline
+    assert reminder.scheduler.fire_time(a.id) == a.deadline_ts - 1800
+    reminder.add_tasks_batch([task_line('B', 5, tz='Europe/Berlin')], 1)
+    b = reminder.find_task_by_order_id('B', 1)
+    assert abs(b.deadline_ts - reminder.clock.now() - 5 * 3600) < 120
+    assert [task.order_id for task in reminder.user_tasks[1]] == ['B', 'A']
+
+    # The greeting follows the zone: 09:00 in Berlin is 07:00 or 08:00 UTC
+    offset = int(datetime.now(BERLIN).utcoffset().total_seconds()) // 60
+    assert reminder.greeting_slots[1] == DEFAULT_GREETING_MINUTE - offset
+    try:
+        reminder.set_timezone(1, 'Mars/Olympus')
+        assert False, "unknown timezone accepted"
+    except ValueError:
+        pass
+    reminder.store.close()
+
+    # Kept across a restart from the store, deadlines read again in Berlin
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    assert restarted.timezone_for(1).key == 'Europe/Berlin'
+    a = restarted.find_task_by_order_id('A', 1)
+    assert written(a, BERLIN) == a.deadline
+    assert restarted.scheduler.fire_time(a.id) == a.deadline_ts - 1800
+
+    restarted.set_timezone(1, None)
+    assert restarted.user_timezones == {} and 1 not in restarted.greeting_slots
+    assert written(a, get_timezone()) == a.deadline
+    restarted.store.close()
+
+def check_stored_deadlines():
+    reminder = TaskReminder()
+    reminder.load_tasks()
+    reminder.add_tasks_batch([task_line('A', 30)], 1)
+    deadline_ts = reminder.find_task_by_order_id('A', 1).deadline_ts
+    # Nudge the stored epoch: a restart that keeps it did not parse the line again
+    reminder.store.conn.execute('UPDATE tasks SET deadline_ts = deadline_ts + 60')
+    reminder.store.close()
+
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    assert restarted.find_task_by_order_id('A', 1).deadline_ts == deadline_ts + 60
+    # Deadlines stored under another default zone are read again, and stored for the next start
+    restarted.store.conn.execute("UPDATE meta SET value = 'Europe/Berlin' WHERE key = 'deadline_timezone'")
+    restarted.store.close()
+
+    restarted = TaskReminder()
+    restarted.load_tasks()
+    assert restarted.find_task_by_order_id('A', 1).deadline_ts == deadline_ts
+    rows, _ = restarted.store.load()
+    assert [ts for _, _, ts in rows.values()] == [deadline_ts]
+    restarted.store.close()
+
+def check_clock():
+    wall, monotonic = [1_000_000.0], [50.0]
+    clock = MonotonicClock(tolerance=2, wall=lambda: wall[0], monotonic=lambda: monotonic[0])
+    monotonic[0] += 30
+    wall[0] += 31  # Drift within tolerance is ignored
+    assert clock.now() == 1_000_030 and clock.resync() == 0
+    wall[0] -= 3600  # NTP steps the wall clock back an hour
+    assert clock.now() == 1_000_030  # Between resyncs the clock only follows monotonic time
+    assert clock.resync() == -3599 and clock.now() == 1_000_031 - 3600 and clock.steps == 1
+
+def test_timezones():
+    check_clock()
+    run_in_tempdir(check_timezones, check_stored_deadlines)
+
+if __name__ == "__main__":
+    test_timezones()
+    print("✅ Timezones OK")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# Test PerUserUpdateProcessor keeps each user's order while running users concurrently
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from update_processor import PerUserUpdateProcessor
+
+def fake_update(user_id):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), effective_chat=None)
+
+async def check_processor():
+    processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+    await processor.initialize()
+    log = []
+    running = {'now': 0, 'max': 0}
+
+    async def handler(user_id, n):
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        # Later updates finish faster: without per-user locking they would reorder
+        await asyncio.sleep(0.01 * (5 - n))
+        log.append((user_id, n))
+        running['now'] -= 1
+
+    jobs = [
+        processor.process_update(fake_update(user_id), handler(user_id, n))
+        for n in range(5) for user_id in (1, 2, 3, 4, 5, 6)
+    ]
+    await asyncio.gather(*jobs)
+
+    for user_id in range(1, 7):
+        assert [n for u, n in log if u == user_id] == list(range(5))
+    assert 1 < running['max'] <= 4, running
+    # Idle users don't leave locks behind
+    assert processor._user_locks == {} and processor._waiting == {}
+
+def test_update_processor():
+    asyncio.run(check_processor())
+
+if __name__ == "__main__":
+    test_update_processor()
+    print("✅ Per-user ordering OK")
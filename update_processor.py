@@ -0,0 +1,54 @@
+# update_processor.py
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates of one user in order, different users concurrently
+
+    At most `max_concurrent_updates` handlers run at once. Updates waiting
+    for their user's previous update do not take one of those slots, so a
+    user with a long backlog cannot starve everybody else. `max_pending`
+    bounds how many updates may be accepted (running or waiting) at all.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending=None):
+        super().__init__(max_pending or max_concurrent_updates * 64)
+        self.max_running = max_concurrent_updates
+        self._running = None
+        self._user_locks = {}  # {user_id: asyncio.Lock}
+        self._waiting = {}  # {user_id: updates holding or waiting for the lock}
+
+    @staticmethod
+    def update_key(update):
+        """User the update belongs to; updates without one share a single queue"""
+        user = getattr(update, 'effective_user', None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, 'effective_chat', None)
+        return chat.id if chat is not None else None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.update_key(update)
+        lock = self._user_locks.get(key)
+        if lock is None:
+            lock = self._user_locks[key] = asyncio.Lock()
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            # asyncio.Lock wakes waiters FIFO, so a user's updates keep their order
+            async with lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                # Nobody else queued for this user: drop the lock to keep the dict small
+                del self._waiting[key]
+                del self._user_locks[key]
+
+    async def initialize(self):
+        self._running = asyncio.Semaphore(self.max_running)
+
+    async def shutdown(self):
+        pass
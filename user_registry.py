@@ -0,0 +1,64 @@
+# user_registry.py
+import threading
+import time
+
+
+class UserRegistry:
+    """Every user who ever interacted with the bot, kept in memory
+
+    Membership is a set lookup; new users are queued and written to the
+    store in batches (append-only), when flush_every are pending or the
+    oldest has waited flush_interval seconds, and on flush()/shutdown.
+    """
+
+    def __init__(self, store, flush_every=256, flush_interval=1.0):
+        self.store = store
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.users = set()
+        self.pending = []  # New users not yet persisted
+        self.pending_since = 0.0
+        self._lock = threading.Lock()  # Batch pastes register users from worker threads
+
+    def __contains__(self, user_id):
+        return user_id in self.users
+
+    def __len__(self):
+        return len(self.users)
+
+    def __iter__(self):
+        # Iterate a copy: users may be added while a greeting broadcast runs
+        return iter(list(self.users))
+
+    def load(self):
+        """Merge users persisted by earlier runs, return how many are known"""
+        self.users |= self.store.load_users()
+        return len(self.users)
+
+    def add(self, user_id):
+        """Register user_id, return True if it was new"""
+        if user_id in self.users:
+            return False
+        with self._lock:
+            if user_id in self.users:
+                return False
+            self.users.add(user_id)
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            self.pending.append(user_id)
+            due = len(self.pending) >= self.flush_every or time.monotonic() - self.pending_since >= self.flush_interval
+        if due:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Persist queued new users in one store write"""
+        with self._lock:
+            pending, self.pending = self.pending, []
+        if pending:
+            try:
+                self.store.add_users(pending)
+            except Exception as e:
+                print(f"Error saving {len(pending)} users: {e}")
+                with self._lock:
+                    self.pending = pending + self.pending
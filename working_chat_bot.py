@@ -1,13 +1,29 @@
 # working_chat_bot.py
 import asyncio
+import bisect
+import heapq
+import io
 import os
 from dotenv import load_dotenv
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
 from datetime import datetime, timedelta
-import re
+import secrets
 import threading
 import time
+import zlib
+from broadcast import Broadcaster
+from metrics import STORE_WRITE_SECONDS
+from outbox import Outbox
+from profiler import MemoryTracker, SamplingProfiler
+from scheduler import MonotonicClock, ReminderScheduler
+from task_snapshot import TaskSnapshot, write_snapshot
+from task_store import JournalTaskStore, SqliteTaskStore
+from update_processor import PerUserUpdateProcessor
+from user_registry import UserRegistry
+import metrics
+import task_parser
 
 # Load environment variables
 load_dotenv()
@@ -15,335 +31,957 @@ load_dotenv()
 # Get credentials from .env file
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = int(os.getenv("TELEGRAM_CHAT_ID"))
+TASK_STORE = os.getenv("TASK_STORE", "sqlite")  # sqlite | journal
+TASK_DB = os.getenv("TASK_DB", "tasks.db")
+# Reminders and greetings waiting for delivery; kept apart from tasks.db so sends never block task writes
+OUTBOX_DB = os.getenv("OUTBOX_DB", "outbox.db")
+# Bot API endpoint, e.g. http://127.0.0.1:8081/bot for fake_bot_api.py (empty = api.telegram.org)
+API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
+
+# Update delivery: polling (default) or webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Public https URL Telegram posts to
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+# Telegram echoes this in X-Telegram-Bot-Api-Secret-Token; a random one is used if unset
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Prometheus text format on http://METRICS_LISTEN:METRICS_PORT/metrics (0 = off);
+# shard i of a sharded bot listens on METRICS_PORT + 1 + i
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# /stats buckets of the tasks-per-user distribution
+TASKS_PER_USER_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# How often tasks whose deadline passed are archived out of the lists
+OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL", "60"))
+# How often the task snapshot is rewritten while running, so a crash restarts from it
+# plus the users changed since rather than parsing the whole store
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "600"))
+
+# Send reminders this long before the deadline, unless the user chose offsets with /remind
+REMINDER_LEAD = timedelta(minutes=30)
+REMINDER_LEAD_SECONDS = int(REMINDER_LEAD.total_seconds())
+DEFAULT_REMINDER_OFFSETS = (REMINDER_LEAD_SECONDS,)
+# /remind accepts at most this many offsets, each at most REMINDER_MAX_OFFSET before the deadline
+REMINDER_MAX_OFFSETS = 5
+REMINDER_MAX_OFFSET = 24 * 3600
+# Fired reminder keys are dropped this long after their deadline: more than the 26 hours
+# between the furthest timezones, so a deadline moved later by /tz still finds its keys
+REMINDED_KEY_GRACE = 2 * 24 * 3600
+# Morning greeting time of users who did not choose one with /st (minute of their day)
+DEFAULT_GREETING_MINUTE = 9 * 60
+# Longest the scheduler sleeps before checking the wall clock for NTP steps or date changes
+CLOCK_RESYNC_INTERVAL = 60
+# Outbox sends allowed in flight at once
+REMINDER_CONCURRENCY = 20
+# When a user's reminder fires, that user's reminders due within this many seconds
+# are sent along with it as one message (0 = one message per task)
+REMINDER_COALESCE_WINDOW = int(os.getenv("REMINDER_COALESCE_WINDOW", "300"))
+# Worker processes owning a slice of users each (1 = everything in this process)
+BOT_SHARDS = int(os.getenv("BOT_SHARDS", "1"))
+# Handlers of different users running at once (1 = strictly sequential like before)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+# Pastes with more lines than this are parsed and stored in a worker thread
+BATCH_THREAD_LINES = 50
+
+# Most tasks per /list page; a page ends sooner when the next entry would take it
+# past Telegram's 4096-character limit
+LIST_PAGE_SIZE = 10
+MAX_MESSAGE_LENGTH = 4096
+LIST_HEADER = "❤️ Danh sách công việc của người đẹp:\n\n"
+
+# Per-line results of TaskReminder.add_tasks_batch
+TASK_ADDED = 'added'
+TASK_DUPLICATE = 'duplicate'
+TASK_INVALID = 'invalid'
+
+# delete_task_at results
+DELETE_DONE = 'deleted'
+DELETE_NO_TASKS = 'no_tasks'
+DELETE_BAD_INDEX = 'bad_index'
+
+# deadline_warning results for a task being added
+DEADLINE_OVERDUE = 'overdue'
+DEADLINE_IMMINENT = 'imminent'
+
+MORNING_GREETING = "Chào người đẹp của anh , chúc người đẹp ngày mới nhiều năng lượng và vui vẻ , nhớ nhắn cho anh nhé. Yêu người đẹp nhiều  ❤️"
+
+def shard_suffix(shard):
+    """File name suffix for shard (index, count); '' for the unsharded bot"""
+    return f".{shard[0]}-of-{shard[1]}" if shard else ''
+
+def make_store(shard=None):
+    """Task store of the whole bot, or of one (index, count) shard"""
+    suffix = shard_suffix(shard)
+    if TASK_STORE == 'journal':
+        return JournalTaskStore(f'tasks{suffix}', f'users{suffix}.txt')  # Snapshot + append-only journal
+    root, ext = os.path.splitext(TASK_DB)
+    return SqliteTaskStore(f"{root}{suffix}{ext}")
+
+def make_outbox(shard=None):
+    """Outbox of the whole bot, or of one (index, count) shard"""
+    root, ext = os.path.splitext(OUTBOX_DB)
+    # Shards share Telegram's global rate limit
+    return Outbox(f"{root}{shard_suffix(shard)}{ext}", concurrency=REMINDER_CONCURRENCY,
+                  rate=30 / shard[1] if shard else 30)
 
 class TaskReminder:
-    def __init__(self):
-        self.user_tasks = {}  # {user_id: [tasks]}
-        self.reminded_tasks = set()
-        self.tasks_file = 'tasks.txt'
+    def __init__(self, shard=None):
+        self.user_tasks = {}  # {user_id: [tasks sorted by deadline]}, the order /list shows and /del uses
+        self.list_pages = {}  # {user_id: [(start, end, rendered entries)]} leading /list pages, laid out
+        self.order_index = {}  # {user_id: {order_id: [tasks]}}
+        self.identity_index = {}  # {user_id: {(link, order_id, input_date, deadline): task}}
+        self.reminded_tasks = set()  # Fired reminder keys, see reminder_key
+        self.fired_offsets = {}  # {task_id: smallest offset already fired}, derived from reminded_tasks
+        self.legacy_fired = {}  # {'order_deadline': offset} from keys written before they named the task id
+        self.reminded_expiry = []  # Heap of (deadline_ts, key) over reminded_tasks, pruned by the overdue sweep
+        self.reminded_expiry_lock = threading.Lock()  # The sweep prunes from a worker thread
+        self.reminder_offsets = {}  # {user_id: offsets in seconds, largest first} set with /remind
+        self.user_timezones = {}  # {user_id: IANA timezone name} set with /tz
+        self.tasks_file = 'tasks.txt'  # Legacy plain-text task list, imported once
         self.users_file = 'users.txt'  # File to store user IDs
+        self.shard = shard  # (index, count) when this process owns only some users
+        self.store = make_store(shard)
         self.bot = None
-        self.daily_greeting_sent = set()  # Track daily greetings sent {date: set(user_ids)}
-        self.all_users = set()  # Track all users who have ever interacted with bot
-        self.morning_greeting_time = '09:00'  # Default morning greeting time
+        self.clock = MonotonicClock()  # Epoch seconds every reminder and greeting is compared with
+        self.greeting_minutes = {}  # {user_id: minute of their local day} chosen with /st
+        self.greeting_slots = {}  # {user_id: UTC minute of day} of users with their own time or timezone
+        self.greeting_buckets = {}  # {UTC minute of day: {user_ids}}, who each minute greets besides the default
+        self.default_greeting_slot = None  # UTC minute of DEFAULT_GREETING_MINUTE in the default timezone
+        self.greeting_schedule = []  # Sorted UTC minutes with someone to greet
+        self.greeted_day = None  # UTC 'YYYY-MM-DD' that greeted refers to, rotated at UTC midnight
+        self.greeted = set()  # Users whose greeting is already queued on greeted_day
+        self.last_greeting_minute = None  # Last UTC minute of greeted_day dispatched
+        self.all_users = UserRegistry(self.store)  # Track all users who have ever interacted with bot
+        self.user_flush_task = None  # Periodic flush of newly seen users
+        self.scheduler = ReminderScheduler()  # Pending reminders ordered by fire time
+        self.overdue = ReminderScheduler()  # Tasks with no reminder left to send, keyed by deadline
+        self.tasks_expired = 0  # Overdue tasks archived by the sweep
+        self.overdue_sweep_task = None  # Periodic expire_overdue
+        self.snapshot_task = None  # Periodic save_snapshot
+        self.snapshot_mark = None  # Store change mark of the last snapshot written or loaded
+        self.snapshot_lock = threading.Lock()  # A periodic write may still run when shutdown writes
+        self.outbox = make_outbox(shard)  # Reminders and greetings until Telegram accepted them
+        # Rate-limited, resumable mass sends; they draw on the outbox's tokens, both are one bot to Telegram
+        if shard:
+            # Shards must not share checkpoints
+            self.broadcaster = Broadcaster(bucket=self.outbox.bucket,
+                                           checkpoint_dir=f"broadcasts/shard{shard_suffix(shard)}")
+        else:
+            self.broadcaster = Broadcaster(bucket=self.outbox.bucket)
+        self.outbox_task = None  # Outbox delivery loop
+        self.metrics_task = None  # /metrics HTTP listener
+        self.started_at = time.time()
+        self.scheduler_task = None  # Reminder loop running on the Application loop
+        self.background_tasks = set()  # In-flight sends spawned by the reminder loop
+        self.reminders_sent = 0  # Reminded tasks handed to queue_reminders
+        self.reminder_messages_sent = 0  # Messages they went out as; the difference is API calls saved
+        self.user_locks = {}  # {user_id: RLock} guarding that user's list and indexes
+        self.snapshot = None  # TaskSnapshot the tasks were loaded from, if any
+        self.cold_users = set()  # Users whose tasks are still only in the snapshot
         
+    def user_lock(self, user_id):
+        """Lock for one user's tasks; large pastes run in worker threads
+        while the reminder loop may be removing the same user's tasks"""
+        lock = self.user_locks.get(user_id)
+        if lock is None:
+            lock = self.user_locks.setdefault(user_id, threading.RLock())
+        return lock
+    
     def set_bot(self, bot):
         """Set bot instance for sending messages"""
         self.bot = bot
         
     def load_tasks(self):
-        """Load tasks from file"""
+        """Load tasks from the store, importing legacy files on first run"""
+        try:
+            fingerprint = self.store.fingerprint()  # Before the loads below open the database
+            self.load_offsets()
+            self.load_timezones()
+            self.load_greetings()
+            if self.load_snapshot(fingerprint):
+                self.store.start_compactor(self.store_state)
+                return
+            first_run = not self.store.exists()
+            rows, self.reminded_tasks = self.store.load()
+            self.index_reminded(self.reminded_tasks)
+            parsed = self.parse_rows(rows.values())
+            repaired = []  # (deadline_ts, task_id) read again because the stored one was stale
+            for (task_id, (user_id, line, stored_ts)), task in zip(rows.items(), parsed):
+                if not task or task.deadline_ts is None:
+                    print(f"Skipping unreadable stored task {task_id}: {line}")
+                    continue
+                if stored_ts is None:
+                    repaired.append((task.deadline_ts, task_id))
+                task.id = task_id
+                task.user_id = user_id
+                self.user_tasks.setdefault(user_id, []).append(task)
+                self.index_task(user_id, task)
+                self.schedule_task(user_id, task)
+            for tasks in self.user_tasks.values():
+                tasks.sort(key=task_sort_key)
+            self.store.set_deadlines(repaired)
+            print(f"Loaded {len(rows)} tasks from store ({len(repaired)} deadlines parsed again)")
+            if first_run and not self.shard:
+                self.import_legacy_files()
+        except Exception as e:
+            print(f"Error loading tasks: {e}")
+        self.user_tasks.setdefault(CHAT_ID, [])
+        self.store.start_compactor(self.store_state)
+    
+    def load_snapshot(self, fingerprint):
+        """Start from the binary task snapshot, written periodically and at shutdown
+        
+        Only the user table and the reminder arrays are read; a user's Task
+        objects are built by ensure_user the first time they are needed.
+        If the store changed since (fingerprint differs), the users whose
+        tasks changed after the snapshot's mark are reloaded from the store.
+        Returns False (load everything from the store instead) if the
+        snapshot is missing or cannot be brought up to date.
+        """
+        cache_file = self.store.cache_file
+        if not cache_file or not os.path.exists(cache_file):
+            return False
+        try:
+            snapshot = TaskSnapshot(cache_file)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring task snapshot {cache_file}: {e}")
+            return False
+        changes = None
+        if snapshot.fingerprint != fingerprint:
+            if snapshot.mark is not None:
+                changes = self.store.changes_since(snapshot.mark)
+            if changes is None:
+                print(f"Task snapshot {cache_file} is stale, loading from store")
+                return False
+        self.snapshot = snapshot
+        self.snapshot_mark = snapshot.mark
+        self.cold_users = set(snapshot.users)
+        self.reminded_tasks = snapshot.reminded() if changes is None else changes[2]
+        self.index_reminded(self.reminded_tasks)
+        # No offset exceeds REMINDER_MAX_OFFSET, so reminders this old belong to tasks whose
+        # deadline already passed: they go to the overdue index and the first sweep archives them
+        start = snapshot.first_pending_after(self.clock.now() - REMINDER_MAX_OFFSET)
+        self.scheduler.load_sorted(snapshot.pending_fire, snapshot.pending_keys, snapshot.sorted_keys,
+                                   snapshot.sorted_key_positions, self.resolve_snapshot_task, start)
+        self.overdue.load_sorted(snapshot.pending_fire, snapshot.pending_keys, snapshot.sorted_keys,
+                                 snapshot.sorted_key_positions, self.resolve_snapshot_task, 0, start)
+        if changes is not None:
+            self.replay_changes(changes[0], changes[1])
+        if CHAT_ID not in self.cold_users:
+            self.user_tasks.setdefault(CHAT_ID, [])
+        print(f"Loaded {snapshot.task_count} tasks of {len(snapshot.users)} users from snapshot"
+              f"{f', {len(changes[0])} users changed since' if changes is not None else ''}")
+        return True
+    
+    def replay_changes(self, user_ids, rows):
+        """Replace the snapshot tasks of user_ids with their stored (user_id, line, deadline_ts) rows"""
+        by_user = {}
+        for (task_id, (user_id, _, _)), task in zip(rows.items(), self.parse_rows(rows.values())):
+            if task and task.deadline_ts is not None:
+                task.id = task_id
+                task.user_id = user_id
+                by_user.setdefault(user_id, []).append(task)
+        for user_id in user_ids:
+            tasks = sorted(by_user.get(user_id, []), key=task_sort_key)
+            with self.user_lock(user_id):
+                gone = {task.id for task in self.snapshot.load_user(user_id)} if user_id in self.cold_users else set()
+                self.cold_users.discard(user_id)
+                self.user_tasks[user_id] = tasks
+                self.list_pages.pop(user_id, None)
+                for task in tasks:
+                    self.index_task(user_id, task)
+                    gone.discard(task.id)
+            for task_id in gone:
+                self.scheduler.cancel(task_id) or self.overdue.cancel(task_id)
+            for task in tasks:
+                self.scheduler.cancel(task.id) or self.overdue.cancel(task.id)
+                self.schedule_task(user_id, task)
+    
+    def ensure_user(self, user_id):
+        """Build a user's tasks and indexes from the snapshot on first use"""
+        if user_id not in self.cold_users:
+            return
+        with self.user_lock(user_id):
+            if user_id not in self.cold_users:
+                return
+            tasks = self.snapshot.load_user(user_id)
+            self.user_tasks[user_id] = tasks
+            for task in tasks:
+                self.index_task(user_id, task)
+            self.cold_users.discard(user_id)
+    
+    def ensure_all_users(self):
+        for user_id in list(self.cold_users):
+            self.ensure_user(user_id)
+    
+    def resolve_snapshot_task(self, position):
+        """Task of a snapshot reminder, or None if it was deleted meanwhile"""
+        task_id, user_id, deadline_ts = self.snapshot.pending_task(position)
+        self.ensure_user(user_id)
+        with self.user_lock(user_id):
+            tasks = self.user_tasks.get(user_id, [])
+            i = bisect.bisect_left(tasks, (deadline_ts, task_id), key=task_sort_key)
+            if i < len(tasks) and tasks[i].id == task_id:
+                return tasks[i]
+        return None
+    
+    def save_snapshot(self):
+        """Write the binary snapshot next to the store for the next start, return True if written
+        
+        Runs every SNAPSHOT_INTERVAL in a worker thread and once more after
+        the store is closed at shutdown. The store's change mark is taken
+        before the tasks are gathered, so a change made while writing is
+        replayed by the next start rather than lost.
+        """
+        cache_file = self.store.cache_file
+        if not cache_file:
+            return False
+        with self.snapshot_lock:
+            return self._save_snapshot(cache_file)
+    
+    def _save_snapshot(self, cache_file):
+        started = time.perf_counter()
+        try:
+            fingerprint = self.store.fingerprint()
+            mark = self.store.change_mark()
+            # Users still cold are unchanged since the loaded snapshot: copy them without keeping the Tasks
+            cold_users = set(self.cold_users)
+            user_tasks = {user_id: self.snapshot.load_user(user_id) for user_id in cold_users}
+            for user_id, tasks in list(self.user_tasks.items()):
+                if user_id not in cold_users:
+                    with self.user_lock(user_id):
+                        user_tasks[user_id] = list(tasks)
+            pending = [(fire_at, task_id) for task_id, fire_at in self.scheduler.fire_times()]
+            # Overdue tasks are stored as their earliest possible reminder so the next start indexes them again
+            pending += [(task.deadline_ts - REMINDER_MAX_OFFSET, task.id)
+                        for _, _, task in self.overdue.entries() if task is not None]
+            write_snapshot(cache_file, fingerprint, mark, user_tasks, pending, self.reminded_tasks.copy())
+            self.snapshot_mark = mark
+            # Process managers must allow this long before killing the bot (deploy_guide.md: kill_timeout)
+            print(f"Saved task snapshot {cache_file} in {time.perf_counter() - started:.1f}s")
+            return True
+        except Exception as e:
+            print(f"Error saving task snapshot: {e}")
+            return False
+    
+    def import_legacy_files(self):
+        """One-shot import of tasks/users written by older versions of the bot"""
+        if isinstance(self.store, SqliteTaskStore):
+            journal = JournalTaskStore('tasks', self.users_file)
+            for user_id in journal.load_users():
+                self.store.add_user(user_id)
+            if journal.exists():
+                # Journal records keep the owning user id
+                rows, reminded = journal.replay()
+                parsed = task_parser.parse_many(line for _, line, _ in rows.values())
+                for (user_id, _, _), task in zip(rows.values(), parsed):
+                    if task and task.deadline_ts is not None:
+                        self.append_task(user_id, task)
+                for task_key in reminded:
+                    self.store.mark_reminded(None, task_key)
+                self.reminded_tasks |= reminded
+                self.index_reminded(reminded)
+                print(f"Imported {len(rows)} tasks from journal")
+                return
         try:
             with open(self.tasks_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                # Load tasks for default user (backward compatibility)
-                self.user_tasks[CHAT_ID] = []
-                self.add_tasks_from_text(''.join(lines), CHAT_ID)
+                # tasks.txt has no user column: everything belongs to the default user
+                self.add_tasks_from_text(f.read(), CHAT_ID)
+            print(f"Imported {len(self.user_tasks.get(CHAT_ID, []))} tasks from {self.tasks_file}")
         except FileNotFoundError:
             print("No tasks file found, starting with empty list")
-            self.user_tasks[CHAT_ID] = []
-        except Exception as e:
-            print(f"Error loading tasks: {e}")
-            self.user_tasks[CHAT_ID] = []
+    
+    def store_state(self):
+        """Current tasks as (task_id, user_id, raw_line, deadline_ts, zone) rows and the fired
+        reminder keys, for a snapshot; zone is the timezone name deadline_ts was read in"""
+        self.ensure_all_users()
+        rows = []
+        for user_id, tasks in list(self.user_tasks.items()):
+            with self.user_lock(user_id):
+                # /tz rewrites the deadlines and the zone together under this lock
+                zone = self.user_timezones.get(user_id) or task_parser.DEFAULT_TIMEZONE
+                rows.extend((task.id, user_id, task.raw_line, task.deadline_ts, zone) for task in tasks)
+        return rows, self.reminded_tasks.copy()
     
     def save_tasks(self):
-        """Save tasks to file"""
+        """Compact the journal into a fresh snapshot"""
         try:
-            with open(self.tasks_file, 'w', encoding='utf-8') as f:
-                for user_id, tasks in self.user_tasks.items():
-                    for task in tasks:
-                        f.write(task['raw_line'] + '\n')
-            print(f"Saved {sum(len(tasks) for tasks in self.user_tasks.values())} tasks to file")
+            self.store.compact(self.store_state)
         except Exception as e:
             print(f"Error saving tasks: {e}")
     
     def load_users(self):
-        """Load user IDs from file"""
+        """Load user IDs from the store"""
         try:
-            with open(self.users_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    user_id = line.strip()
-                    if user_id and user_id.isdigit():
-                        self.all_users.add(int(user_id))
-            print(f"Loaded {len(self.all_users)} users from file")
-        except FileNotFoundError:
-            print("No users file found, starting with empty user list")
+            print(f"Loaded {self.all_users.load()} users from store")
         except Exception as e:
             print(f"Error loading users: {e}")
     
     def save_user(self, user_id):
-        """Save a single user ID to file"""
-        try:
-            # Check if user already exists in file
-            users_in_file = set()
-            try:
-                with open(self.users_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        uid = line.strip()
-                        if uid and uid.isdigit():
-                            users_in_file.add(int(uid))
-            except FileNotFoundError:
-                pass
-            
-            # Add new user if not already exists
-            if user_id not in users_in_file:
-                with open(self.users_file, 'a', encoding='utf-8') as f:
-                    f.write(f"{user_id}\n")
-                print(f"Saved user {user_id} to file")
-        except Exception as e:
-            print(f"Error saving user {user_id}: {e}")
+        """Register a user; new ones reach the store with the next batched flush"""
+        self.all_users.add(user_id)
     
     def parse_task_line(self, line):
         """Parse task line format: link  order_id  ngay_tao  gio_deadline  ngay_deadline"""
-        # Try different separators
-        separators = ['|', ',', ';', '  ']  # pipe, comma, semicolon, double space
-        
-        for sep in separators:
-            parts = line.split(sep)
-            if len(parts) >= 5:
-                # New format: link | order_id | ngay_tao | gio_deadline | ngay_deadline
-                gio_deadline = parts[3].strip()
-                ngay_deadline = parts[4].strip()
-                deadline_full = f"{gio_deadline} {ngay_deadline}"
-                
-                return {
-                    'link': parts[0].strip(),
-                    'order_id': parts[1].strip(),
-                    'input_date': parts[2].strip(),
-                    'gio_deadline': gio_deadline,
-                    'ngay_deadline': ngay_deadline,
-                    'deadline': deadline_full,
-                    'raw_line': line.strip()
-                }
-            elif len(parts) >= 4:
-                # Old format: link | order_id | input_date | deadline
-                return {
-                    'link': parts[0].strip(),
-                    'order_id': parts[1].strip(),
-                    'input_date': parts[2].strip(),
-                    'deadline': parts[3].strip(),
-                    'raw_line': line.strip()
-                }
-        
-        # If no separator found, try to parse by counting parts
-        parts = line.split()
-        if len(parts) >= 5:
-            # New format: link order_id ngay_tao gio_deadline ngay_deadline
-            ngay_deadline = parts[-1]
-            gio_deadline = parts[-2]
-            input_date = parts[-3]
-            order_id = parts[-4]
-            link = ' '.join(parts[:-4])
-            
-            deadline_full = f"{gio_deadline} {ngay_deadline}"
-            
-            return {
-                'link': link,
-                'order_id': order_id,
-                'input_date': input_date,
-                'gio_deadline': gio_deadline,
-                'ngay_deadline': ngay_deadline,
-                'deadline': deadline_full,
-                'raw_line': line.strip()
-            }
-        elif len(parts) >= 4:
-            # Old format: link order_id input_date deadline
-            deadline = parts[-1]
-            input_date = parts[-2]
-            order_id = parts[-3]
-            link = ' '.join(parts[:-3])
-            
-            return {
-                'link': link,
-                'order_id': order_id,
-                'input_date': input_date,
-                'deadline': deadline,
-                'raw_line': line.strip()
-            }
-        
-        return None
+        return task_parser.parse_task_line(line)
     
     def parse_deadline(self, deadline_str):
         """Parse deadline format like '13H 17/1' or '13h30 17/1' or '20h59 17/1/2026'"""
-        try:
-            # Try format with minutes and full year: 20h59 17/1/2026
-            match = re.match(r'(\d+)[hH](\d+)\s+(\d+)/(\d+)/(\d+)', deadline_str.strip())
-            if match:
-                hour = int(match.group(1))
-                minute = int(match.group(2))
-                day = int(match.group(3))
-                month = int(match.group(4))
-                year = int(match.group(5))
-            else:
-                # Try format with minutes: 13h30 17/1
-                match = re.match(r'(\d+)[hH](\d+)\s+(\d+)/(\d+)', deadline_str.strip())
-                if match:
-                    hour = int(match.group(1))
-                    minute = int(match.group(2))
-                    day = int(match.group(3))
-                    month = int(match.group(4))
-                    year = datetime.now().year
-                else:
-                    # Try format without minutes: 13H 17/1
-                    match = re.match(r'(\d+)[hH]\s+(\d+)/(\d+)', deadline_str.strip())
-                    if match:
-                        hour = int(match.group(1))
-                        minute = 0
-                        day = int(match.group(2))
-                        month = int(match.group(3))
-                        year = datetime.now().year
-                    else:
-                        return None
-            
-            deadline_dt = datetime(year, month, day, hour, minute, 0)
-            
-            return deadline_dt
-        except Exception as e:
-            print(f"Error parsing deadline '{deadline_str}': {e}")
-        return None
+        return task_parser.parse_deadline(deadline_str)
+    
+    def parse_rows(self, rows):
+        """Tasks for stored (user_id, line, deadline_ts) rows, one entry per row
+        
+        A stored deadline_ts is kept as is; only rows where it is None
+        (stale, see store.load) have their deadline read again, with
+        parse_many in the owner's timezone.
+        """
+        rows = list(rows)
+        tasks = [None] * len(rows)
+        stale = {}  # {timezone name: [row index]}
+        for i, (user_id, line, deadline_ts) in enumerate(rows):
+            if deadline_ts is None:
+                stale.setdefault(self.user_timezones.get(user_id), []).append(i)
+                continue
+            fields = task_parser.split_task_line(line)
+            if fields:
+                tasks[i] = task_parser.Task(*fields, deadline_ts)
+        for name, indexes in stale.items():
+            parsed = task_parser.parse_many((rows[i][1] for i in indexes), task_parser.get_timezone(name))
+            for i, task in zip(indexes, parsed):
+                tasks[i] = task
+        return tasks
     
     def add_task_from_message(self, message_text, user_id):
         """Add task from message text"""
         try:
-            # Add user to all_users set
-            self.all_users.add(user_id)
-            
-            task = self.parse_task_line(message_text)
-            if task:
-                deadline_dt = self.parse_deadline(task['deadline'])
-                if deadline_dt:
-                    task['deadline_dt'] = deadline_dt
-                    
-                    # Check for EXACT duplicate (all fields) in current tasks
-                    if self.is_exact_duplicate(task, user_id):
-                        return False, f"🚫 Ticket này đã tồn tại trong danh sách!"
-                    
-                    if user_id not in self.user_tasks:
-                        self.user_tasks[user_id] = []
-                        
-                    self.user_tasks[user_id].append(task)
-                    self.save_tasks()
-                    return True, f"✅ Đã thêm deadline: {task['order_id']} - Deadline: {task['deadline']}"
-                else:
-                    return False, "❌ Không thể đọc deadline. Format: [ghn.com VN12345 1/1/2026 13h 2/1/2026]"
-            else:
-                return False, "Sai format rồi người đẹp❤️. Example: [ghn.com VN12345 1/1/2026 13h 2/1/2026]"
+            _, status, response = self.add_tasks_batch([message_text], user_id)[0]
+            return status == TASK_ADDED, response
         except Exception as e:
             return False, f"❌ Lỗi: {e}"
     
+    def add_tasks_batch(self, lines, user_id):
+        """Parse, dedupe and add many task lines with a single store commit
+        
+        Returns [(line, status, response)] in input order, status being
+        TASK_ADDED, TASK_DUPLICATE or TASK_INVALID.
+        """
+        return self._add_tasks_batch(lines, user_id)[0]
+    
+    def add_pasted_tasks(self, lines, user_id):
+        """add_tasks_batch for a multi-line paste; returns one summary reply
+        
+        The per-line replies are not sent, so tasks added already overdue
+        or inside their first reminder are counted in the summary instead.
+        """
+        results, new_tasks = self._add_tasks_batch(lines, user_id)
+        
+        lead = self.offsets_for(user_id)[0]
+        now = time.time()
+        warnings = [deadline_warning(task, lead, now) for task in new_tasks]
+        added_count = len(new_tasks)
+        duplicate_count = sum(1 for _, status, _ in results if status == TASK_DUPLICATE)
+        error_count = len(results) - added_count - duplicate_count
+        
+        response_msg = f"Kết quả:\n"
+        response_msg += f"✅ Thêm thành công: {added_count} tickets❤️\n"
+        if warnings.count(DEADLINE_IMMINENT):
+            response_msg += f"⚠️ Sắp đến deadline: {warnings.count(DEADLINE_IMMINENT)} tickets, mình nhắc ngay nhé!\n"
+        if warnings.count(DEADLINE_OVERDUE):
+            response_msg += f"⌛ Đã quá hạn: {warnings.count(DEADLINE_OVERDUE)} tickets, mình sẽ không nhắc và sẽ tự xóa khỏi danh sách.\n"
+        if duplicate_count > 0:
+            response_msg += f"🔄 Trùng lặp: {duplicate_count} tickets❤️\n"
+        if error_count > 0:
+            response_msg += f"❌ Lỗi: {error_count} tickets"
+        return response_msg
+    
+    def _add_tasks_batch(self, lines, user_id):
+        """(results, added tasks) of add_tasks_batch
+        
+        Lines are parsed before taking the user's lock, which only covers
+        the dedupe and the insert, so a big paste does not hold up the
+        loop's handlers for that user.
+        """
+        # Add user to all_users set
+        self.all_users.add(user_id)
+        self.ensure_user(user_id)
+        tz = self.timezone_for(user_id)
+        parsed = task_parser.parse_many(lines, tz)
+        
+        with self.user_lock(user_id):
+            if self.timezone_for(user_id) is not tz:
+                # /tz switched zones meanwhile: read the deadlines in the new one
+                parsed = task_parser.parse_many(lines, self.timezone_for(user_id))
+            return self._add_parsed_locked(lines, parsed, user_id)
+    
+    def _add_parsed_locked(self, lines, parsed, user_id):
+        existing = self.identity_index.get(user_id, {})
+        seen = set()  # Exact-duplicate keys of earlier lines in this batch
+        results = []
+        new_tasks = []
+        for line, task in zip(lines, parsed):
+            if not task:
+                results.append((line, TASK_INVALID, "Sai format rồi người đẹp❤️. Example: [ghn.com VN12345 1/1/2026 13h 2/1/2026]"))
+                continue
+            if task.deadline_ts is None:
+                results.append((line, TASK_INVALID, "❌ Không thể đọc deadline. Format: [ghn.com VN12345 1/1/2026 13h 2/1/2026]"))
+                continue
+            
+            # Check for EXACT duplicate (all fields) in current tasks and earlier lines
+            identity = task.identity
+            if identity in existing or identity in seen:
+                results.append((line, TASK_DUPLICATE, "🚫 Ticket này đã tồn tại trong danh sách!"))
+                continue
+            seen.add(identity)
+            new_tasks.append(task)
+            results.append((line, TASK_ADDED, f"✅ Đã thêm deadline: {task.order_id} - Deadline: {task.deadline}"
+                                              f"{deadline_notice(task, self.offsets_for(user_id)[0])}"))
+        
+        if new_tasks:
+            self.append_tasks(user_id, new_tasks)
+        return results, new_tasks
+    
     def find_task_by_order_id(self, order_id, user_id=None):
         """Find task by order_id"""
         if user_id is None:
             user_id = CHAT_ID
-            
-        if user_id not in self.user_tasks:
-            return None
-            
-        for task in self.user_tasks[user_id]:
-            if task['order_id'] == order_id:
-                return task
-        return None
+        self.ensure_user(user_id)
+        
+        tasks = self.order_index.get(user_id, {}).get(order_id)
+        return tasks[0] if tasks else None
     
     def is_exact_duplicate(self, new_task, user_id=None):
         """Check if task is exact duplicate of existing task"""
         if user_id is None:
             user_id = CHAT_ID
-            
-        if user_id not in self.user_tasks:
-            return False
-            
-        for existing_task in self.user_tasks[user_id]:
-            if (existing_task['link'] == new_task['link'] and
-                existing_task['order_id'] == new_task['order_id'] and
-                existing_task['input_date'] == new_task['input_date'] and
-                existing_task['deadline'] == new_task['deadline']):
-                return True
-        return False
+        self.ensure_user(user_id)
+        
+        return new_task.identity in self.identity_index.get(user_id, {})
     
     def add_tasks_from_text(self, text, user_id=None):
-        """Add tasks from multiline text"""
+        """Add tasks from multiline text, skipping order_ids already present"""
         if user_id is None:
             user_id = CHAT_ID
+        self.ensure_user(user_id)
             
         if user_id not in self.user_tasks:
             self.user_tasks[user_id] = []
-            
+        
+        new_tasks = []
+        new_order_ids = set()
         lines = text.strip().split('\n')
-        for line in lines:
-            task = self.parse_task_line(line)
-            if task:
-                deadline_dt = self.parse_deadline(task['deadline'])
-                if deadline_dt:
-                    task['deadline_dt'] = deadline_dt
-                    # Check for duplicates when loading from file
-                    existing_task = self.find_task_by_order_id(task['order_id'], user_id)
-                    if not existing_task:
-                        self.user_tasks[user_id].append(task)
-    
-    def check_reminders(self):
-        """Check for tasks that need reminder (30 minutes before deadline)"""
-        now = datetime.now()
-        reminders = []
-        tasks_to_remove = []
+        for task in task_parser.parse_many(lines, self.timezone_for(user_id)):
+            if task and task.deadline_ts is not None:
+                # Check for duplicates when loading from file
+                order_id = task.order_id
+                if order_id not in new_order_ids and not self.find_task_by_order_id(order_id, user_id):
+                    new_order_ids.add(order_id)
+                    new_tasks.append(task)
         
-        # Check each user's tasks
-        for user_id, tasks in self.user_tasks.items():
-            # Group tasks by order_id to avoid duplicate reminders
-            processed_order_ids = set()
-            
+        if new_tasks:
+            self.append_tasks(user_id, new_tasks)
+    
+    def index_task(self, user_id, task):
+        """Add task to the per-user order_id and exact-duplicate indexes"""
+        self.order_index.setdefault(user_id, {}).setdefault(task.order_id, []).append(task)
+        self.identity_index.setdefault(user_id, {})[task.identity] = task
+    
+    def unindex_task(self, user_id, task):
+        """Remove task from the per-user indexes"""
+        by_order = self.order_index[user_id]
+        tasks = by_order[task.order_id]
+        tasks.remove(task)
+        if not tasks:
+            del by_order[task.order_id]
+        identities = self.identity_index[user_id]
+        identity = task.identity
+        if identities.get(identity) is task:
+            del identities[identity]
+            # Older data may hold exact duplicates; keep the survivor indexed
+            for other in tasks:
+                if other.identity == identity:
+                    identities[identity] = other
+                    break
+    
+    def check_indexes(self):
+        """Return a list of inconsistencies between user_tasks and the indexes (empty if consistent)"""
+        problems = []
+        self.ensure_all_users()
+        for user_id in set(self.user_tasks) | set(self.order_index) | set(self.identity_index):
+            tasks = self.user_tasks.get(user_id, [])
+            expected_orders = {}
             for task in tasks:
-                order_id = task['order_id']
-                
-                # Skip if we already processed this order_id
-                if order_id in processed_order_ids:
-                    continue
-                
-                task_key = f"{task['order_id']}_{task['deadline']}"
-                
-                if task_key in self.reminded_tasks:
-                    processed_order_ids.add(order_id)
-                    continue
-                
-                deadline_dt = task['deadline_dt']
-                reminder_time = deadline_dt - timedelta(minutes=30)
-                
-                if abs((now - reminder_time).total_seconds()) < 60:
-                    # Add user_id to task for sending reminder
-                    task['user_id'] = user_id
-                    reminders.append(task)
-                    self.reminded_tasks.add(task_key)
-                    processed_order_ids.add(order_id)
-                    tasks_to_remove.append((user_id, task))
-        
-        # Remove tasks that were reminded
-        for user_id, task in tasks_to_remove:
-            self.user_tasks[user_id].remove(task)
-            print(f"🗑️ Đã xóa ticket {task['order_id']} của user {user_id} khỏi danh sách sau khi nhắc hẹn")
-        
-        if tasks_to_remove:
-            self.save_tasks()
+                expected_orders.setdefault(task.order_id, []).append(task)
+            by_order = self.order_index.get(user_id, {})
+            if by_order.keys() != expected_orders.keys():
+                problems.append(f"user {user_id}: order_id keys {sorted(by_order)} != {sorted(expected_orders)}")
+            if any(task_sort_key(a) > task_sort_key(b) for a, b in zip(tasks, tasks[1:])):
+                problems.append(f"user {user_id}: tasks are not sorted by deadline")
+            for order_id, expected in expected_orders.items():
+                indexed = by_order.get(order_id, [])
+                if sorted(map(id, indexed)) != sorted(map(id, expected)):
+                    problems.append(f"user {user_id}: order_id {order_id} indexes {len(indexed)} tasks, expected {len(expected)}")
+            task_ids = {id(task) for task in tasks}
+            identities = self.identity_index.get(user_id, {})
+            expected_identities = {task.identity for task in tasks}
+            if identities.keys() != expected_identities:
+                problems.append(f"user {user_id}: identity keys differ from tasks")
+            for identity, task in identities.items():
+                if task.identity != identity or id(task) not in task_ids:
+                    problems.append(f"user {user_id}: identity {identity} points to a missing task")
+        return problems
+    
+    def append_task(self, user_id, task):
+        """Add a parsed task to a user's list, persist it and schedule its reminder"""
+        self.append_tasks(user_id, [task])
+    
+    def append_tasks(self, user_id, tasks):
+        """Add parsed tasks to a user's list in one store commit and schedule them"""
+        self.ensure_user(user_id)
+        with STORE_WRITE_SECONDS.labels('add').time():
+            task_ids = self.store.add_many(user_id, tasks)
+        for task, task_id in zip(tasks, task_ids):
+            task.id = task_id
+            task.user_id = user_id
+            self.insert_sorted(user_id, task)
+            self.index_task(user_id, task)
+            self.schedule_task(user_id, task)
+    
+    def load_offsets(self):
+        self.reminder_offsets = {user_id: tuple(offsets) for user_id, offsets in self.store.load_offsets().items()}
+    
+    def offsets_for(self, user_id):
+        """User's reminder offsets in seconds before the deadline, largest first"""
+        return self.reminder_offsets.get(user_id, DEFAULT_REMINDER_OFFSETS)
+    
+    def set_offsets(self, user_id, offsets):
+        """Persist a user's offsets (None = default) and move their reminders to them"""
+        offsets = tuple(sorted(set(offsets), reverse=True)) if offsets else None
+        self.store.set_offsets(user_id, offsets)
+        if offsets:
+            self.reminder_offsets[user_id] = offsets
+        else:
+            self.reminder_offsets.pop(user_id, None)
+        self.ensure_user(user_id)
+        with self.user_lock(user_id):
+            tasks = list(self.user_tasks.get(user_id, []))
+        for task in tasks:
+            if self.scheduler.cancel(task.id) or self.overdue.cancel(task.id):
+                self.schedule_task(user_id, task)
+    
+    def index_reminded(self, keys):
+        """Fold fired reminder keys into fired_offsets and the expiry heap"""
+        expiry = []
+        for key in keys:
+            task_id, task_key, offset = parse_reminder_key(key)
+            if task_id is not None:
+                expiry.append((task_key, key))  # task_key is the deadline
+                fired, task_key = self.fired_offsets, task_id
+            else:
+                # Old keys only name the ticket and deadline, so they stand for every user holding it
+                expiry.append((legacy_key_deadline(task_key), key))
+                fired = self.legacy_fired
+            if offset < fired.get(task_key, REMINDER_MAX_OFFSET + 1):
+                fired[task_key] = offset
+        with self.reminded_expiry_lock:
+            self.reminded_expiry.extend(expiry)
+            heapq.heapify(self.reminded_expiry)
+    
+    def forget_reminded(self, now):
+        """Drop fired reminder keys whose deadline passed REMINDED_KEY_GRACE before now, return how many
+        
+        By then the task has left the lists (last reminder or overdue sweep),
+        so nothing reads its keys any more.
+        """
+        cutoff = now - REMINDED_KEY_GRACE
+        keys = []
+        with self.reminded_expiry_lock:
+            heap = self.reminded_expiry
+            while heap and heap[0][0] < cutoff:
+                keys.append(heapq.heappop(heap)[1])
+        keys = [key for key in set(keys) if key in self.reminded_tasks]
+        if not keys:
+            return 0
+        for key in keys:
+            self.reminded_tasks.discard(key)
+            task_id, task_key, _ = parse_reminder_key(key)
+            if task_id is not None:
+                self.fired_offsets.pop(task_id, None)
+            else:
+                self.legacy_fired.pop(task_key, None)
+        with STORE_WRITE_SECONDS.labels('forget').time():
+            self.store.forget_reminded(keys)
+        print(f"🧹 Forgot {len(keys)} reminder keys of past deadlines")
+        return len(keys)
+    
+    def next_reminder(self, task, now):
+        """Offset of the task's next reminder, or None if none is left
         
+        Offsets smaller than every one already fired are pending. Of the
+        pending ones already due, only the latest fires (a bot that was down
+        sends one late reminder, not a burst); otherwise the earliest is next.
+        """
+        if task.deadline_ts < now:
+            return None
+        fired = self.fired_offsets.get(task.id)
+        if fired is None:
+            fired = (self.legacy_fired.get(f"{task.order_id}_{task.deadline}", REMINDER_MAX_OFFSET + 1)
+                     if self.legacy_fired else REMINDER_MAX_OFFSET + 1)
+        offset = None
+        for candidate in self.offsets_for(task.user_id):
+            if candidate >= fired:
+                continue
+            if offset is not None and task.deadline_ts - candidate > now:
+                break
+            offset = candidate
+        return offset
+    
+    def schedule_task(self, user_id, task, now=None):
+        """Put the task's next reminder into the scheduler, one entry per task whatever
+        the number of offsets; without one left it goes to the overdue index"""
+        offset = self.next_reminder(task, self.clock.now() if now is None else now)
+        if offset is None:
+            self.overdue.schedule(task.id, task.deadline_ts, task)
+            return
+        self.scheduler.schedule(task.id, task.deadline_ts - offset, task)
+    
+    def expire_overdue(self, now=None):
+        """Archive every overdue task in one store transaction, return how many
+        
+        Only the overdue index is read, so the cost follows the number of
+        expired tasks rather than every stored one. Reminder keys of
+        deadlines long past are forgotten in the same sweep.
+        """
+        if now is None:
+            now = self.clock.now()
+        expired = []
+        for _, _, task in self.overdue.pop_due(now):
+            if task is None:
+                continue
+            with self.user_lock(task.user_id):
+                try:
+                    self.remove_sorted(task.user_id, task)
+                except ValueError:
+                    continue  # Deleted by its user after it was popped
+                self.unindex_task(task.user_id, task)
+            expired.append(task)
+        self.forget_reminded(now)
+        if not expired:
+            return 0
+        with STORE_WRITE_SECONDS.labels('expire').time():
+            self.store.expire_many([task.id for task in expired])
+        self.tasks_expired += len(expired)
+        print(f"⌛ Archived {len(expired)} overdue tasks")
+        return len(expired)
+    
+    def delete_task_at(self, user_id, index):
+        """Delete task by 0-based index, return (status, task or None, tasks left)
+        
+        status is DELETE_DONE, DELETE_NO_TASKS or DELETE_BAD_INDEX. The index
+        is checked under the user's lock, as the reminder loop and the
+        overdue sweep remove tasks from the same list.
+        """
+        self.ensure_user(user_id)
+        with self.user_lock(user_id):
+            tasks = self.user_tasks.get(user_id, [])
+            if not tasks:
+                return DELETE_NO_TASKS, None, 0
+            if not 0 <= index < len(tasks):
+                return DELETE_BAD_INDEX, None, len(tasks)
+            task = tasks.pop(index)
+            self.invalidate_pages(user_id, index)
+            self.unindex_task(user_id, task)
+            remaining = len(tasks)
+        self.scheduler.cancel(task.id) or self.overdue.cancel(task.id)
+        with STORE_WRITE_SECONDS.labels('delete').time():
+            self.store.delete(task.id)
+        return DELETE_DONE, task, remaining
+    
+    def delete_all_tasks(self, user_id):
+        """Delete all tasks of a user and return how many were removed"""
+        self.ensure_user(user_id)
+        with self.user_lock(user_id):
+            tasks = self.user_tasks.get(user_id, [])
+            for task in tasks:
+                self.scheduler.cancel(task.id) or self.overdue.cancel(task.id)
+            self.user_tasks[user_id] = []
+            self.list_pages.pop(user_id, None)
+            self.order_index.pop(user_id, None)
+            self.identity_index.pop(user_id, None)
+        with STORE_WRITE_SECONDS.labels('clear').time():
+            self.store.clear_user(user_id)
+        return len(tasks)
+    
+    def insert_sorted(self, user_id, task):
+        """Insert task at its deadline position in the user's list"""
+        tasks = self.user_tasks.setdefault(user_id, [])
+        position = bisect.bisect_right(tasks, task_sort_key(task), key=task_sort_key)
+        tasks.insert(position, task)
+        self.invalidate_pages(user_id, position)
+    
+    def remove_sorted(self, user_id, task):
+        """Remove task from the user's list, found by bisecting on its deadline"""
+        tasks = self.user_tasks[user_id]
+        position = bisect.bisect_left(tasks, task_sort_key(task), key=task_sort_key)
+        if position >= len(tasks) or tasks[position] is not task:
+            position = tasks.index(task)
+        del tasks[position]
+        self.invalidate_pages(user_id, position)
+    
+    def invalidate_pages(self, user_id, position):
+        """Drop cached /list pages from the one holding position onwards (entries after it renumber)
+
+        A page ending right at position goes too: an entry inserted there may fit on it.
+        """
+        pages = self.list_pages.get(user_id)
+        while pages and pages[-1][1] >= position:
+            pages.pop()
+    
+    def format_task_list(self, user_id, page=0):
+        """Render one /list page, return (text, page, page_count) with page clamped to range
+
+        Pages are laid out in order, each taking up to LIST_PAGE_SIZE entries
+        that fit in one message, and cached until a change reaches them.
+        """
+        message = LIST_HEADER
+        self.ensure_user(user_id)
+        
+        with self.user_lock(user_id):
+            tasks = self.user_tasks.get(user_id, [])
+            if not tasks:
+                return message + "Không có công việc nào.Nhưng hãy cười nhiều nhé người đẹp ❤️", 0, 0
+            pages = self.list_pages.setdefault(user_id, [])
+            budget = MAX_MESSAGE_LENGTH - len(message)
+            start = end = pages[-1][1] if pages else 0
+            body = ''
+            while end < len(tasks):
+                entry = list_entry(end + 1, tasks[end], budget)
+                if body and (end - start == LIST_PAGE_SIZE or len(body) + len(entry) > budget):
+                    pages.append((start, end, body))
+                    start, body = end, ''
+                body += entry
+                end += 1
+            if body:
+                pages.append((start, end, body))
+            page = min(max(page, 0), len(pages) - 1)
+            return message + pages[page][2], page, len(pages)
+    
+    def check_reminders(self, now=None):
+        """Pop tasks whose reminder time (an offset before their deadline) has come
+        
+        A task that still has offsets left is rescheduled for the next one;
+        after its last reminder it leaves the list. The reminders are queued
+        in the outbox before fired keys and finished tasks reach the store (one
+        transaction per tick), so a crash in between resends rather than loses
+        them. now is epoch seconds (default: self.clock), compared as ints
+        with the fire times.
+        """
+        if now is None:
+            now = self.clock.now()
+        reminders = []
+        fired = []  # (task, fire_at, key, previous offset) to put back if queueing fails
+        finished = []
+        
+        # Only entries that are due are touched; late ones still fire once
+        due = self.scheduler.pop_due(now)
+        if due and REMINDER_COALESCE_WINDOW > 0:
+            due += self.pull_ahead(due, now + REMINDER_COALESCE_WINDOW)
+        for _, fire_at, task in due:
+            if task is None:
+                continue  # Snapshot reminder whose task was deleted meanwhile
+            user_id = task.user_id
+            if task.deadline_ts < self.started_at or task.deadline_ts <= now:
+                # Deadline passed while the bot was down or before this tick came round:
+                # a reminder would arrive too late, the sweep archives the task instead
+                self.overdue.schedule(task.id, task.deadline_ts, task)
+                continue
+            # Pulled-ahead reminders fire as of their own time; a late tick still sends the last one
+            at = max(now, fire_at)
+            offset = self.next_reminder(task, at)
+            if offset is not None and task.deadline_ts - offset <= at:
+                key = reminder_key(task, offset)
+                reminders.append(task)
+                fired.append((task, fire_at, key, self.fired_offsets.get(task.id)))
+                self.reminded_tasks.add(key)
+                self.fired_offsets[task.id] = offset  # Offsets fire largest first
+                with self.reminded_expiry_lock:
+                    heapq.heappush(self.reminded_expiry, (task.deadline_ts, key))
+                offset = self.next_reminder(task, at)
+            if offset is not None:
+                self.scheduler.schedule(task.id, task.deadline_ts - offset, task)
+                continue
+            finished.append(task)
+        
+        if reminders:
+            try:
+                self.queue_reminders(reminders)
+            except Exception:
+                # Nothing was queued or stored: reschedule them so the next tick retries
+                for task, fire_at, key, previous in fired:
+                    self.reminded_tasks.discard(key)
+                    if previous is None:
+                        self.fired_offsets.pop(task.id, None)
+                    else:
+                        self.fired_offsets[task.id] = previous
+                    self.scheduler.schedule(task.id, fire_at, task)
+                raise
+        
+        # Remove tasks whose last reminder was queued
+        for task in finished:
+            with self.user_lock(task.user_id):
+                self.remove_sorted(task.user_id, task)
+                self.unindex_task(task.user_id, task)
+            print(f"🗑️ Đã xóa ticket {task.order_id} của user {task.user_id} khỏi danh sách sau khi nhắc hẹn")
+        
+        fired_keys = [key for _, _, key, _ in fired]
+        if fired_keys or finished:
+            with STORE_WRITE_SECONDS.labels('reminded').time():
+                self.store.mark_reminded_many([task.id for task in finished], fired_keys)
         return reminders
     
+    def pull_ahead(self, due, horizon):
+        """Take the pending reminders firing before horizon of every user in due,
+        so they share that user's reminder message instead of following it"""
+        extra = []
+        for user_id in {task.user_id for _, _, task in due if task is not None}:
+            largest = self.offsets_for(user_id)[0]
+            with self.user_lock(user_id):
+                # Sorted by deadline, so the reminders to pull are at the front
+                for task in self.user_tasks.get(user_id, []):
+                    if task.deadline_ts - largest > horizon:
+                        break
+                    fire_at = self.scheduler.fire_time(task.id)
+                    if fire_at is not None and fire_at <= horizon and self.scheduler.cancel(task.id):
+                        extra.append((task.id, fire_at, task))
+        return extra
+    
+    def seconds_until_next_reminder(self, now=None):
+        """Seconds until the earliest pending reminder, or None if nothing is scheduled"""
+        fire_at = self.scheduler.next_fire_at()
+        if fire_at is None:
+            return None
+        if now is None:
+            now = self.clock.now()
+        return max(0, fire_at - now)
+    
     async def send_reminder(self, task):
         """Send reminder message for a task"""
         if not self.bot:
             return
             
-        user_id = task.get('user_id', CHAT_ID)
-            
-        message = f"⏰ NHẮC NHỞ DEADLINE\n\n"
-        message += f"📋 Mã đơn: {task['order_id']}\n"
-        message += f"📅 Deadline: {task['deadline']}\n"
-        message += f"🔗 Link xử lý: {task['link']}\n\n"
-        message += f"⚠️ Còn 30 phút nữa đến deadline nhé người đẹp! Yêu mình nhiều ❤️"
+        user_id = task.user_id if task.user_id is not None else CHAT_ID
+        message = reminder_messages([task])[0]
         
         try:
             await self.bot.send_message(
                 chat_id=user_id,
                 text=message
             )
-            print(f"Sent reminder for order: {task['order_id']} to user {user_id}")
+            print(f"Sent reminder for order: {task.order_id} to user {user_id}")
         except Exception as e:
             print(f"Error sending reminder to user {user_id}: {e}")
     
@@ -352,74 +990,514 @@ class TaskReminder:
         if not self.bot:
             return False
             
-        message = "Chào người đẹp của anh , chúc người đẹp ngày mới nhiều năng lượng và vui vẻ , nhớ nhắn cho anh nhé. Yêu người đẹp nhiều  ❤️"
-        
         try:
             await self.bot.send_message(
                 chat_id=user_id,
-                text=message
+                text=MORNING_GREETING
             )
             print(f"Sent morning greeting to user {user_id}")
             return True
         except Exception as e:
             print(f"Error sending morning greeting to user {user_id}: {e}")
             return False
+    
+    async def broadcast_text(self, name, user_ids, text):
+        """Send text to many users through the broadcaster, return users reached"""
+        async def send(user_id):
+            await self.bot.send_message(chat_id=user_id, text=text)
+        return await self.broadcaster.run(name, user_ids, send)
+    
+    def load_timezones(self):
+        self.user_timezones = self.store.load_timezones()
+    
+    def timezone_for(self, user_id):
+        """ZoneInfo the user's deadlines and greeting time are written in"""
+        return task_parser.get_timezone(self.user_timezones.get(user_id))
+    
+    def set_timezone(self, user_id, name):
+        """Persist the user's IANA timezone (None = default), return how many tasks moved
+        
+        Their pending deadlines are read again in the new zone, since that
+        is where they were meant, and rescheduled; the greeting follows.
+        ValueError for an unknown name.
+        """
+        tz = task_parser.get_timezone(name)
+        name = None if tz.key == task_parser.DEFAULT_TIMEZONE else tz.key
+        self.ensure_user(user_id)
+        moved = []
+        with self.user_lock(user_id):
+            old_tz = self.timezone_for(user_id)
+            tasks = self.user_tasks.get(user_id, [])
+            changes = []
+            for task in tasks:
+                deadline_ts = task_parser.deadline_timestamp(task.deadline, tz, task.deadline_in(old_tz).year)
+                if deadline_ts is not None and deadline_ts != task.deadline_ts:
+                    changes.append((task, deadline_ts))
+            # The zone and the deadlines read in it are stored together, so load can trust deadline_ts
+            with STORE_WRITE_SECONDS.labels('timezone').time():
+                self.store.set_timezone(user_id, name, [(deadline_ts, task.id) for task, deadline_ts in changes])
+            if name:
+                self.user_timezones[user_id] = name
+            else:
+                self.user_timezones.pop(user_id, None)
+            for task, deadline_ts in changes:
+                pending = self.scheduler.cancel(task.id) or self.overdue.cancel(task.id)
+                task.deadline_ts = deadline_ts
+                moved.append((task, pending))
+            if moved:
+                tasks.sort(key=task_sort_key)
+                self.invalidate_pages(user_id, 0)
+        for task, pending in moved:
+            if pending:
+                self.schedule_task(user_id, task)
+        self.place_greeting(user_id, self.clock.now())
+        self.scheduler.wake()
+        return len(moved)
+    
+    def load_greetings(self):
+        """Greeting times chosen with /st and who was already greeted today"""
+        self.greeting_minutes = self.store.load_greeting_times()
+        now = self.clock.now()
+        self.place_greetings(now)
+        self.greeted_day = time.strftime('%Y-%m-%d', time.gmtime(now))
+        self.greeted = {user_id for user_id, day in self.store.load_greeted().items() if day == self.greeted_day}
+    
+    def greeting_slot(self, user_id, now):
+        """UTC minute of day the user's local greeting time falls on at now"""
+        offset = datetime.fromtimestamp(now, self.timezone_for(user_id)).utcoffset()
+        minute = self.greeting_minutes.get(user_id, DEFAULT_GREETING_MINUTE)
+        return (minute - int(offset.total_seconds()) // 60) % (24 * 60)
+    
+    def place_greetings(self, now):
+        """Bucket every user with their own greeting time or timezone; rerun daily for DST"""
+        slots = {user_id: self.greeting_slot(user_id, now) for user_id in {*self.greeting_minutes, *self.user_timezones}}
+        buckets = {}
+        for user_id, slot in slots.items():
+            buckets.setdefault(slot, set()).add(user_id)
+        self.default_greeting_slot = self.greeting_slot(None, now)
+        self.greeting_slots, self.greeting_buckets = slots, buckets
+        self.greeting_schedule = sorted({self.default_greeting_slot, *buckets})
+    
+    def place_greeting(self, user_id, now):
+        """Move one user to the bucket of their current greeting time and timezone
+        
+        Copy-on-write: /tz runs this in a worker thread while the loop may be reading the buckets.
+        """
+        slots = dict(self.greeting_slots)
+        buckets = dict(self.greeting_buckets)
+        old = slots.pop(user_id, None)
+        if old is not None:
+            buckets[old] = buckets[old] - {user_id}
+            if not buckets[old]:
+                del buckets[old]
+        if user_id in self.greeting_minutes or user_id in self.user_timezones:
+            slot = slots[user_id] = self.greeting_slot(user_id, now)
+            buckets[slot] = buckets.get(slot, set()) | {user_id}
+        self.greeting_slots, self.greeting_buckets = slots, buckets
+        self.greeting_schedule = sorted({self.default_greeting_slot, *buckets})
+    
+    def greeting_time(self, user_id):
+        """'HH:MM' the user is greeted at, in their timezone"""
+        return '%02d:%02d' % divmod(self.greeting_minutes.get(user_id, DEFAULT_GREETING_MINUTE), 60)
+    
+    def set_greeting_time(self, user_id, greeting_time):
+        """Persist the user's local 'HH:MM' greeting time and move them to that minute's bucket"""
+        hour, minute = map(int, greeting_time.split(':'))
+        minute += hour * 60
+        self.store.set_greeting_time(user_id, minute)
+        self.greeting_minutes[user_id] = minute
+        self.place_greeting(user_id, self.clock.now())
+        self.scheduler.wake()
+    
+    def users_to_greet(self, slot):
+        """Users greeted at this UTC minute of the day who were not greeted today yet"""
+        users = set(self.greeting_buckets.get(slot, ()))
+        if slot == self.default_greeting_slot:
+            # Once a day: everyone who kept the default time and timezone
+            users.update(user_id for user_id in self.all_users if user_id not in self.greeting_slots)
+        return users - self.greeted
+    
+    def check_greetings(self, now=None):
+        """Queue the greetings of every minute since the last check, return how many
+        
+        now is epoch seconds and minutes are counted in UTC, so users in
+        every timezone share one schedule. Only the buckets of the minutes
+        that passed are read. The set of users greeted today starts empty
+        again at UTC midnight, when the buckets are also redone for DST;
+        minutes of the previous day after the last check are greeted first.
+        """
+        if now is None:
+            now = self.clock.now()
+        midnight = now - now % 86400
+        minute = now % 86400 // 60
+        day = time.strftime('%Y-%m-%d', time.gmtime(now))
+        queued = 0
+        if self.last_greeting_minute is None:
+            first = minute  # Just started: greetings of earlier minutes are not made up
+        elif day != self.greeted_day:
+            if self.greeted_day == time.strftime('%Y-%m-%d', time.gmtime(midnight - 86400)):
+                # Still with yesterday's buckets and greeted set
+                queued += self.dispatch_greetings(self.last_greeting_minute + 1, 24 * 60 - 1, midnight - 86400)
+            first = 0
+        else:
+            first = self.last_greeting_minute + 1
+        if day != self.greeted_day:
+            self.greeted_day = day
+            self.greeted = set()
+            self.place_greetings(now)
+        self.last_greeting_minute = minute
+        return queued + self.dispatch_greetings(first, minute, midnight)
+    
+    def dispatch_greetings(self, first, last, midnight):
+        """Queue the greetings of UTC minutes first..last of the day starting at midnight, return how many"""
+        queued = 0
+        start = bisect.bisect_left(self.greeting_schedule, first)
+        end = bisect.bisect_right(self.greeting_schedule, last)
+        for slot in self.greeting_schedule[start:end]:
+            users = self.users_to_greet(slot)
+            if users:
+                self.queue_greetings(sorted(users), midnight + slot * 60)
+                queued += len(users)
+        return queued
+    
+    def queue_greetings(self, user_ids, due_at):
+        """Queue the greeting for these users and remember they were greeted today"""
+        # Once in the outbox it is retried until delivered, even across restarts
+        self.outbox.add_many([(user_id, MORNING_GREETING, due_at) for user_id in user_ids], 'greeting')
+        self.greeted.update(user_ids)
+        self.store.add_greeted(self.greeted_day, user_ids)
+        print(f"Queued morning greeting for {len(user_ids)} users")
 
-# Global reminder instance
-reminder = TaskReminder()
-
-def reminder_checker_thread():
-    """Background thread to check reminders and morning greetings"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    def queue_reminders(self, tasks):
+        """Put reminders in the outbox as one message per user (chunked at the length limit)"""
+        by_user = {}
+        for task in tasks:
+            by_user.setdefault(task.user_id if task.user_id is not None else CHAT_ID, []).append(task)
+        messages = {user_id: reminder_messages(sorted(user_tasks, key=task_sort_key))
+                    for user_id, user_tasks in by_user.items()}
+        message_count = sum(map(len, messages.values()))
+        self.reminders_sent += len(tasks)
+        self.reminder_messages_sent += message_count
+        if message_count < len(tasks):
+            print(f"Coalesced {len(tasks)} reminders into {message_count} messages, "
+                  f"{self.reminders_sent - self.reminder_messages_sent} API calls saved so far")
+        # Lag is measured from the reminder that triggered the message; the outbox keeps chunk order
+        due_at = {user_id: min(task.deadline_ts - self.fired_offsets.get(task.id, REMINDER_LEAD_SECONDS)
+                               for task in user_tasks)
+                  for user_id, user_tasks in by_user.items()}
+        self.outbox.add_many([(user_id, text, due_at[user_id]) for user_id, texts in messages.items() for text in texts],
+                             'reminder')
     
-    while True:
-        try:
-            now = datetime.now()
-            current_date = now.strftime('%Y-%m-%d')
-            current_time = now.strftime('%H:%M')
-            
-            # Check for task reminders
-            reminders = reminder.check_reminders()
-            
-            if reminders and reminder.bot:
-                for task in reminders:
-                    loop.run_until_complete(reminder.send_reminder(task))
-            
-            # Check for morning greeting at configured time
-            if current_time == reminder.morning_greeting_time:
-                # Send to all users in users.txt file
-                users_to_greet = reminder.all_users.copy()
+    async def send_reminders(self, tasks):
+        """Queue reminders and, unless the delivery loop is running, deliver them now"""
+        self.queue_reminders(tasks)
+        if self.bot and self.outbox_task is None:
+            await self.outbox.run(self.deliver_message, until_empty=True)
+    
+    async def deliver_message(self, chat_id, text):
+        """Outbox send; errors propagate so the outbox can retry"""
+        await self.bot.send_message(chat_id=chat_id, text=text)
+    
+    def seconds_until_next_greeting(self, now):
+        """Seconds from now (epoch seconds) until the next UTC minute that has someone to greet"""
+        i = bisect.bisect_right(self.greeting_schedule, now % 86400 // 60)
+        minute = self.greeting_schedule[i] if i < len(self.greeting_schedule) else self.greeting_schedule[0] + 24 * 60
+        return max(0, now - now % 86400 + minute * 60 - now)
+    
+    def spawn(self, coro):
+        """Run coro in the background without blocking the reminder loop"""
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+    
+    async def run_scheduler(self):
+        """Send reminders and morning greetings when they are due
+        
+        Sleeps are timed by the event loop's monotonic clock and fire times
+        are compared with self.clock, so a wall-clock step is noticed within
+        CLOCK_RESYNC_INTERVAL and can neither stall the loop nor repeat a tick.
+        """
+        while True:
+            try:
+                step = self.clock.resync()
+                if step:
+                    print(f"⚠️ System clock stepped {step:+.0f}s, scheduling from the corrected time")
+                now = self.clock.now()
                 
-                for user_id in users_to_greet:
-                    greeting_key = f"{current_date}_{user_id}"
-                    if greeting_key not in reminder.daily_greeting_sent:
-                        success = loop.run_until_complete(reminder.send_morning_greeting(user_id))
-                        if success:
-                            reminder.daily_greeting_sent.add(greeting_key)
-            
-            # Clear old greeting records (keep only last 7 days)
-            reminder.daily_greeting_sent = {
-                key for key in reminder.daily_greeting_sent 
-                if key.split('_')[0] >= (now - timedelta(days=7)).strftime('%Y-%m-%d')
-            }
-            
-            time.sleep(30)  # Check every 30 seconds
-        except Exception as e:
-            print(f"Error in reminder checker: {e}")
-            time.sleep(30)
+                # Queue task reminders that are due, then mark them reminded
+                self.check_reminders(now)
+                
+                # Greet the users whose chosen minute has come
+                self.check_greetings(now)
+                
+                # Sleep until the next reminder or greeting; adding/deleting tasks wakes us early
+                now = self.clock.now()
+                timeout = min(CLOCK_RESYNC_INTERVAL, self.seconds_until_next_greeting(now))
+                next_reminder = self.seconds_until_next_reminder(now)
+                if next_reminder is not None:
+                    timeout = min(timeout, next_reminder)
+                await self.scheduler.wait(timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in reminder scheduler: {e}")
+                await asyncio.sleep(30)
+    
+    async def sweep_overdue_periodically(self):
+        """Archive tasks whose deadline passed; runs in a worker thread like large pastes"""
+        while True:
+            try:
+                await asyncio.to_thread(self.expire_overdue)
+            except Exception as e:
+                print(f"Error archiving overdue tasks: {e}")
+            await asyncio.sleep(OVERDUE_SWEEP_INTERVAL)
+    
+    async def snapshot_periodically(self):
+        """Rewrite the task snapshot when tasks changed; runs in a worker thread like the overdue sweep"""
+        while True:
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+            if self.store.change_mark() != self.snapshot_mark:
+                await asyncio.to_thread(self.save_snapshot)
+    
+    async def flush_users_periodically(self):
+        """Persist newly seen users even when no further user arrives to trigger a flush"""
+        while True:
+            await asyncio.sleep(self.all_users.flush_interval)
+            if self.all_users.pending:
+                await asyncio.to_thread(self.all_users.flush)
+    
+    def task_counts(self):
+        """{user_id: task count}, without building snapshot users' tasks"""
+        counts = {user_id: len(tasks) for user_id, tasks in list(self.user_tasks.items()) if tasks}
+        for user_id in list(self.cold_users):
+            counts[user_id] = self.snapshot.users[user_id][1]
+        return counts
+    
+    def users_by_task_count(self):
+        """Cumulative {(le,): users} over TASKS_PER_USER_BUCKETS, like a histogram"""
+        counts = sorted(self.task_counts().values())
+        result = {(bound,): bisect.bisect_right(counts, bound) for bound in TASKS_PER_USER_BUCKETS}
+        result[('+Inf',)] = len(counts)
+        return result
+    
+    def register_metrics(self):
+        """Gauges computed from this reminder's state when scraped"""
+        registry = metrics.REGISTRY
+        registry.gauge('bot_tasks', 'Tasks stored', lambda: sum(self.task_counts().values()))
+        registry.gauge('bot_users_with_tasks_by_count', 'Users with at most le tasks (cumulative)',
+                       self.users_by_task_count, ['le'])
+        registry.gauge('bot_known_users', 'Users who ever talked to the bot', lambda: len(self.all_users))
+        registry.gauge('bot_scheduled_reminders', 'Reminders waiting to fire', lambda: len(self.scheduler))
+        registry.gauge('bot_overdue_tasks', 'Tasks past their reminder waiting for the sweep', lambda: len(self.overdue))
+        registry.gauge('bot_tasks_expired', 'Overdue tasks archived since start', lambda: self.tasks_expired)
+        registry.gauge('bot_outbox_queued', 'Messages waiting in the outbox', lambda: len(self.outbox))
+        registry.gauge('bot_clock_steps', 'Wall-clock steps the scheduler followed since start', lambda: self.clock.steps)
+        registry.gauge('bot_reminder_calls_saved', 'sendMessage calls saved by coalescing reminders',
+                       lambda: self.reminders_sent - self.reminder_messages_sent)
+        registry.gauge('bot_uptime_seconds', 'Seconds since start', lambda: round(time.time() - self.started_at))
+    
+    def format_stats(self):
+        """Text of the /stats summary"""
+        def ms(child, q):
+            value = child.quantile(q)
+            return '-' if value is None else f"{value * 1000:.0f}ms"
+        
+        counts = self.task_counts()
+        lines = [
+            "📊 Thống kê bot",
+            f"⏱ Uptime: {timedelta(seconds=round(time.time() - self.started_at))}",
+            f"👥 Người dùng: {len(self.all_users)}, có task: {len(counts)}",
+            f"📋 Tasks: {sum(counts.values())}, nhiều nhất {max(counts.values(), default=0)}/người",
+            f"⏰ Nhắc hẹn chờ: {len(self.scheduler)}, outbox chờ gửi: {len(self.outbox)}",
+            f"⌛ Quá hạn chờ xóa: {len(self.overdue)}, đã lưu trữ: {self.tasks_expired}",
+            f"🌅 Giờ chào riêng: {len(self.greeting_minutes)} người, {len(self.greeting_schedule)} mốc, "
+            f"hôm nay đã chào {len(self.greeted)}",
+            f"🌏 Múi giờ riêng: {len(self.user_timezones)} người, đồng hồ hệ thống nhảy {self.clock.steps} lần",
+            f"✉️ Tin nhắc gộp: tiết kiệm {self.reminders_sent - self.reminder_messages_sent} lần gọi API",
+            "",
+            "Xử lý lệnh (số lần, p50, p99):",
+        ]
+        for (name,), child in sorted(metrics.HANDLER_SECONDS.children.items()):
+            if child.count:
+                lines.append(f"  {name}: {child.count}, {ms(child, 0.5)}, {ms(child, 0.99)}")
+        for (kind,), child in sorted(metrics.SEND_LAG.children.items()):
+            lines.append(f"Độ trễ gửi {kind}: p50 {ms(child, 0.5)}, p99 {ms(child, 0.99)}")
+        send = metrics.SEND_SECONDS.children[()]
+        lines.append(f"Gửi tin: {send.count} lần, p50 {ms(send, 0.5)}, p99 {ms(send, 0.99)}")
+        errors = ', '.join(f"{error_type} {child.value}"
+                           for (error_type,), child in sorted(metrics.SEND_ERRORS.children.items()))
+        lines.append(f"Lỗi gửi: {errors or 'không có'}")
+        for (op,), child in sorted(STORE_WRITE_SECONDS.children.items()):
+            lines.append(f"Ghi store {op}: {child.count} lần, p99 {ms(child, 0.99)}")
+        return '\n'.join(lines)
+    
+    async def start(self):
+        """Start the reminder loop on the running event loop"""
+        if self.scheduler_task is None:
+            self.register_metrics()
+            if METRICS_PORT:
+                port = METRICS_PORT + 1 + self.shard[0] if self.shard else METRICS_PORT
+                self.metrics_task = asyncio.create_task(metrics.serve(METRICS_LISTEN, port))
+            self.scheduler_task = asyncio.create_task(self.run_scheduler())
+            self.user_flush_task = asyncio.create_task(self.flush_users_periodically())
+            self.overdue_sweep_task = asyncio.create_task(self.sweep_overdue_periodically())
+            if self.store.cache_file:
+                self.snapshot_task = asyncio.create_task(self.snapshot_periodically())
+            print(f"Loaded {self.outbox.load()} undelivered messages from outbox")
+            self.outbox_task = asyncio.create_task(self.outbox.run(self.deliver_message))
+            print("Reminder scheduler started")
+    
+    async def stop(self, timeout=10):
+        """Stop the reminder loop, let in-flight sends finish and close the store"""
+        for task in (self.scheduler_task, self.user_flush_task, self.overdue_sweep_task, self.snapshot_task,
+                     self.metrics_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.scheduler_task = self.user_flush_task = self.overdue_sweep_task = self.snapshot_task = None
+        self.metrics_task = None
+        if self.background_tasks:
+            await asyncio.wait(self.background_tasks, timeout=timeout)
+        if self.outbox_task is not None:
+            # Whatever is still queued is sent after the next start
+            self.outbox_task.cancel()
+            try:
+                await self.outbox_task
+            except asyncio.CancelledError:
+                pass
+            self.outbox_task = None
+        self.outbox.close()
+        self.all_users.flush()
+        self.store.close()
+        self.save_snapshot()
+        print("Reminder scheduler stopped")
+
+def task_sort_key(task):
+    """/list order: earliest deadline first, then insertion order"""
+    return task.deadline_ts, task.id
+
+def reminder_key(task, offset):
+    """Key of one fired reminder in reminded_tasks: task id, deadline and the offset in minutes
+
+    Two users holding the same ticket line are two tasks with their own
+    reminders, so the key names the task rather than the ticket.
+    """
+    return f"{task.id}:{task.deadline_ts}@{offset // 60}"
+
+def parse_reminder_key(key):
+    """(task_id, deadline_ts, offset) of a reminder key
+
+    Keys from older versions ('order_deadline@minutes', or without the
+    offset when every task had one reminder) come back as
+    (None, 'order_deadline', offset).
+    """
+    task_key, sep, minutes = key.partition('@')
+    offset = int(minutes) * 60 if sep else 0
+    task_id, colon, deadline_ts = task_key.partition(':')
+    if colon and task_id.isdigit() and deadline_ts.isdigit():
+        return int(task_id), int(deadline_ts), offset
+    return None, task_key, offset
+
+def legacy_key_deadline(task_key):
+    """Deadline (epoch seconds, 0 if unreadable) of an old 'order_deadline' key, read in the default timezone"""
+    deadline_ts = task_parser.deadline_timestamp(task_key.rpartition('_')[2], task_parser.get_timezone())
+    return deadline_ts if deadline_ts is not None else 0
+
+def deadline_warning(task, lead=REMINDER_LEAD_SECONDS, now=None):
+    """DEADLINE_OVERDUE, DEADLINE_IMMINENT when the first reminder (lead seconds ahead) is already due, or None"""
+    if now is None:
+        now = time.time()
+    if task.deadline_ts <= now:
+        return DEADLINE_OVERDUE
+    if task.deadline_ts - lead <= now:
+        return DEADLINE_IMMINENT
+    return None
+
+def deadline_notice(task, lead=REMINDER_LEAD_SECONDS, now=None):
+    """Warning appended to the add reply for an overdue or imminent task"""
+    if now is None:
+        now = time.time()
+    warning = deadline_warning(task, lead, now)
+    if warning == DEADLINE_OVERDUE:
+        return "\n⌛ Ticket này đã quá hạn, mình sẽ không nhắc và sẽ tự xóa khỏi danh sách."
+    if warning == DEADLINE_IMMINENT:
+        return f"\n⚠️ Chỉ còn {format_duration(task.deadline_ts - now)} nữa là đến deadline, mình nhắc ngay nhé!"
+    return ""
+
+def format_duration(seconds):
+    """'2 giờ', '1 giờ 30 phút', '5 phút' (rounded up to the minute)"""
+    minutes = max(1, -(-int(seconds) // 60))
+    hours, minutes = divmod(minutes, 60)
+    if hours and minutes:
+        return f"{hours} giờ {minutes} phút"
+    return f"{hours} giờ" if hours else f"{minutes} phút"
+
+def format_offsets(offsets):
+    return ", ".join(format_duration(offset) for offset in offsets)
+
+def reminder_messages(tasks, now=None):
+    """Reminder texts for one user's due tasks: the usual message for a single
+    task, otherwise one list split into messages of at most MAX_MESSAGE_LENGTH"""
+    if now is None:
+        now = time.time()
+    if len(tasks) == 1:
+        task = tasks[0]
+        return [
+            f"⏰ NHẮC NHỞ DEADLINE\n\n"
+            f"📋 Mã đơn: {task.order_id}\n"
+            f"📅 Deadline: {task.deadline}\n"
+            f"🔗 Link xử lý: {task.link}\n\n"
+            f"⚠️ Còn {format_duration(task.deadline_ts - now)} nữa đến deadline nhé người đẹp! Yêu mình nhiều ❤️"
+        ]
+    footer = "⚠️ Sắp đến deadline rồi nhé người đẹp! Yêu mình nhiều ❤️"
+    messages = []
+    text = f"⏰ NHẮC NHỞ DEADLINE ({len(tasks)} tickets)\n\n"
+    for i, task in enumerate(tasks, 1):
+        entry = (f"{i}. 📋 {task.order_id} - 📅 {task.deadline} (còn {format_duration(task.deadline_ts - now)})\n"
+                 f"   🔗 {task.link}\n\n")
+        if text and len(text) + len(entry) > MAX_MESSAGE_LENGTH:
+            messages.append(text)
+            text = ''
+        text += entry
+    if len(text) + len(footer) > MAX_MESSAGE_LENGTH:
+        messages.append(text)
+        text = ''
+    messages.append(text + footer)
+    # An entry longer than a whole message (huge link) is cut rather than rejected by Telegram
+    return [message[:MAX_MESSAGE_LENGTH] for message in messages]
+
+def list_entry(number, task, limit=MAX_MESSAGE_LENGTH):
+    """One /list entry; a link that would take it past limit is shortened with '…'"""
+    entry = f"{number}. {task.order_id} - {task.deadline}\n   🔗 {task.link}\n\n"
+    excess = len(entry) - limit
+    if excess > 0:
+        link = task.link[:max(len(task.link) - excess - 1, 0)] + '…'
+        entry = f"{number}. {task.order_id} - {task.deadline}\n   🔗 {link}\n\n"
+    return entry
+
+def list_keyboard(page, page_count):
+    """Prev / page x/y / next buttons, None for a single page"""
+    if page_count <= 1:
+        return None
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("◀️", callback_data=f"list:{page - 1}"))
+    buttons.append(InlineKeyboardButton(f"{page + 1}/{page_count}", callback_data=f"list:{page}"))
+    if page < page_count - 1:
+        buttons.append(InlineKeyboardButton("▶️", callback_data=f"list:{page + 1}"))
+    return InlineKeyboardMarkup([buttons])
+
+# Global reminder instance
+reminder = TaskReminder()
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /start command"""
     user = update.message.from_user
     if not user:
         return
-        
-    user_id = user.id
-    
-    # Add user to all_users set and save to file
-    reminder.all_users.add(user_id)
-    reminder.save_user(user_id)
     
     await update.message.reply_text(
         "❤️ Bot Nhắc Hẹn Công Việc ❤️\n\n"
@@ -429,9 +1507,11 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "/list - Xem danh sách công việc\n"
         "/del - Xóa task theo số thứ tự\n"
         "/st - Đặt giờ chào buổi sáng (ví dụ: /st 10h30)\n"
+        "/remind - Chọn thời điểm nhắc (ví dụ: /remind 2h 30m 5m)\n"
+        "/tz - Chọn múi giờ (ví dụ: /tz Asia/Tokyo)\n"
         "/morning - Gửi lời chào buổi sáng ngay lập tức\n"
         "/help - Trợ giúp\n\n"
-        "Bot sẽ tự động nhắc hẹn 30 phút trước deadline đó người đẹp ❤️!"
+        f"Bot sẽ tự động nhắc hẹn {format_offsets(reminder.offsets_for(user.id))} trước deadline đó người đẹp ❤️!"
     )
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -439,12 +1519,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     user = update.message.from_user
     if not user:
         return
-        
-    user_id = user.id
     
-    # Add user to all_users set and save to file
-    reminder.all_users.add(user_id)
-    reminder.save_user(user_id)
     await update.message.reply_text(
         "📖 Trợ giúp Bot Nhắc Hẹn\n\n"
         "🔹 Thêm công việc:\n"
@@ -457,31 +1532,37 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "🔹 Xem danh sách: /list\n"
         "🔹 Xóa task: /del 1 (xóa task số 1)\n"
         "🔹 Gửi lời chào: /morning (gửi ngay lập tức)\n"
-        "🔹 Nhắc hẹn: Tự động 30 phút trước deadline\n\n"
+        f"🔹 Nhắc hẹn: Tự động {format_offsets(reminder.offsets_for(user.id))} trước deadline\n"
+        f"🔹 Đổi giờ nhắc: /remind 2h 30m 5m (tối đa {REMINDER_MAX_OFFSETS} mốc), /remind reset về mặc định\n"
+        f"🔹 Múi giờ của deadline: /tz Asia/Tokyo, /tz reset về {task_parser.DEFAULT_TIMEZONE}\n\n"
         "⚠️ Lưu ý: Dùng | , ; hoặc space để phân cách các cột"
     )
 
 async def list_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /list command"""
     user_id = update.message.from_user.id
-    # Add user to all_users
-    reminder.all_users.add(user_id)
-    message = "❤️ Danh sách công việc của người đẹp:\n\n"
-    
-    if user_id not in reminder.user_tasks or not reminder.user_tasks[user_id]:
-        message += "Không có công việc nào.Nhưng hãy cười nhiều nhé người đẹp ❤️"
-    else:
-        for i, task in enumerate(reminder.user_tasks[user_id], 1):
-            message += f"{i}. {task['order_id']} - {task['deadline']}\n"
-            message += f"   🔗 {task['link']}\n\n"
-    
-    await update.message.reply_text(message)
+    text, page, page_count = reminder.format_task_list(user_id)
+    await update.message.reply_text(text, reply_markup=list_keyboard(page, page_count))
+
+async def list_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /list page buttons - edit the list message in place"""
+    query = update.callback_query
+    await query.answer()
+    try:
+        requested = int(query.data.split(':', 1)[1])
+    except (IndexError, ValueError):
+        return
+    text, page, page_count = reminder.format_task_list(query.from_user.id, requested)
+    try:
+        await query.edit_message_text(text, reply_markup=list_keyboard(page, page_count))
+    except BadRequest as e:
+        # Pressing the current page button leaves the message unchanged
+        if "not modified" not in str(e).lower():
+            raise
 
 async def delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /del command - delete task by index"""
     user_id = update.message.from_user.id
-    # Add user to all_users
-    reminder.all_users.add(user_id)
     
     try:
         # Get argument from command (/del <index>|all)
@@ -493,16 +1574,11 @@ async def delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
         # Handle 'all' option
         if arg0 == 'all':
-            # Check if user has tasks
-            if user_id not in reminder.user_tasks or not reminder.user_tasks[user_id]:
+            # Delete all tasks for this user
+            total_tasks = reminder.delete_all_tasks(user_id)
+            if not total_tasks:
                 await update.message.reply_text("❌ Bạn không có công việc nào để xóa.")
                 return
-
-            total_tasks = len(reminder.user_tasks[user_id])
-            
-            # Delete all tasks for this user
-            reminder.user_tasks[user_id] = []
-            reminder.save_tasks()
             
             await update.message.reply_text(
                 f"✅ Đã xóa toàn bộ {total_tasks} tickets của bạn❤️."
@@ -512,30 +1588,20 @@ async def delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         # Otherwise, treat argument as index
         index = int(arg0)
         
-        # Check if user has tasks
-        if user_id not in reminder.user_tasks or not reminder.user_tasks[user_id]:
+        # Remove task; the index is checked against the list as it is when deleting
+        status, task_to_delete, remaining = reminder.delete_task_at(user_id, index - 1)
+        if status == DELETE_NO_TASKS:
             await update.message.reply_text("❌ Bạn không có công việc nào để xóa.")
             return
-        
-        # Check if index is valid
-        if index < 1 or index > len(reminder.user_tasks[user_id]):
-            await update.message.reply_text(f"❌ Index không hợp lệ. Có {len(reminder.user_tasks[user_id])} tasks (1-{len(reminder.user_tasks[user_id])})")
+        if status == DELETE_BAD_INDEX:
+            await update.message.reply_text(f"❌ Index không hợp lệ. Có {remaining} tasks (1-{remaining})")
             return
         
-        # Get task to delete
-        task_to_delete = reminder.user_tasks[user_id][index - 1]
-        order_id = task_to_delete['order_id']
-        deadline = task_to_delete['deadline']
-        
-        # Remove task
-        reminder.user_tasks[user_id].pop(index - 1)
-        reminder.save_tasks()
-        
         await update.message.reply_text(
             f"✅ Đã xóa ticket #{index}\n"
-            f"📋 Mã đơn: {order_id}\n"
-            f"📅 Deadline: {deadline}\n"
-            f"📊 Còn {len(reminder.user_tasks[user_id])} tickets trong danh sách."
+            f"📋 Mã đơn: {task_to_delete.order_id}\n"
+            f"📅 Deadline: {task_to_delete.deadline}\n"
+            f"📊 Còn {remaining} tickets trong danh sách."
         )
         
     except ValueError:
@@ -547,8 +1613,6 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     """Handle incoming messages"""
     message_text = update.message.text
     user_id = update.message.from_user.id
-    # Add user to all_users
-    reminder.all_users.add(user_id)
     
     # Debug: print actual message received
     print(f"Received message from user {user_id}: '{message_text}'")
@@ -557,28 +1621,13 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     # Check if message contains multiple lines
     if '\n' in message_text:
-        # Handle multiline input
-        lines = message_text.strip().split('\n')
-        added_count = 0
-        duplicate_count = 0
-        error_count = 0
-        
-        for line in lines:
-            if line.strip():  # Skip empty lines
-                success, response = reminder.add_task_from_message(line.strip(), user_id)
-                if success:
-                    added_count += 1
-                elif "REJECT" in response:
-                    duplicate_count += 1
-                else:
-                    error_count += 1
-        
-        response_msg = f"Kết quả:\n"
-        response_msg += f"✅ Thêm thành công: {added_count} tickets❤️\n"
-        if duplicate_count > 0:
-            response_msg += f"🔄 Trùng lặp: {duplicate_count} tickets❤️\n"
-        if error_count > 0:
-            response_msg += f"❌ Lỗi: {error_count} tickets"
+        # Handle multiline input as one batch
+        lines = [line.strip() for line in message_text.strip().split('\n') if line.strip()]
+        if len(lines) > BATCH_THREAD_LINES:
+            # Keep the event loop free for other users while a big paste is parsed and stored
+            response_msg = await asyncio.to_thread(reminder.add_pasted_tasks, lines, user_id)
+        else:
+            response_msg = reminder.add_pasted_tasks(lines, user_id)
         
         await update.message.reply_text(response_msg)
     else:
@@ -586,56 +1635,61 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         success, response = reminder.add_task_from_message(message_text, user_id)
         await update.message.reply_text(response)
 
+def parse_greeting_time(time_str):
+    """Parse 10h30 / 10h / 10:30 / 10 into 'HH:MM'; None if out of range, ValueError if unreadable"""
+    time_str = time_str.lower()
+    
+    # Parse time format (10h30, 10h, 10:30)
+    if 'h' in time_str:
+        # Format: 10h30 or 10h
+        if ':' in time_str:
+            # 10:30 format
+            hour_min = time_str.split(':')
+            hour = int(hour_min[0])
+            minute = int(hour_min[1])
+        else:
+            # 10h30 format
+            parts = time_str.split('h')
+            hour = int(parts[0])
+            minute = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+    else:
+        # Try parsing as HH:MM
+        if ':' in time_str:
+            hour_min = time_str.split(':')
+            hour = int(hour_min[0])
+            minute = int(hour_min[1])
+        else:
+            hour = int(time_str)
+            minute = 0
+    
+    # Validate time
+    if hour < 0 or hour > 23 or minute < 0 or minute > 59:
+        return None
+    
+    # Format time as HH:MM
+    return f"{hour:02d}:{minute:02d}"
+
 async def set_morning_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /st command - set morning greeting time"""
     user = update.message.from_user
     if not user:
         return
-        
-    user_id = user.id
-    
-    # Add user to all_users (local tracking)
-    reminder.all_users.add(user_id)
     
     try:
         # Get time from command
         if not context.args:
-            await update.message.reply_text("❌ Vui lòng nhập thời gian: /st 10h30")
+            await update.message.reply_text(
+                f"⏰ Giờ chào buổi sáng hiện tại: {reminder.greeting_time(user.id)}\n"
+                "Đổi bằng: /st 10h30"
+            )
             return
         
-        time_str = context.args[0].lower()
-        
-        # Parse time format (10h30, 10h, 10:30)
-        if 'h' in time_str:
-            # Format: 10h30 or 10h
-            if ':' in time_str:
-                # 10:30 format
-                hour_min = time_str.split(':')
-                hour = int(hour_min[0])
-                minute = int(hour_min[1])
-            else:
-                # 10h30 format
-                parts = time_str.split('h')
-                hour = int(parts[0])
-                minute = int(parts[1]) if len(parts) > 1 and parts[1] else 0
-        else:
-            # Try parsing as HH:MM
-            if ':' in time_str:
-                hour_min = time_str.split(':')
-                hour = int(hour_min[0])
-                minute = int(hour_min[1])
-            else:
-                hour = int(time_str)
-                minute = 0
-        
-        # Validate time
-        if hour < 0 or hour > 23 or minute < 0 or minute > 59:
+        new_time = parse_greeting_time(context.args[0])
+        if new_time is None:
             await update.message.reply_text("❌ Thời gian không hợp lệ. Vui lòng nhập 0-23h và 0-59 phút")
             return
         
-        # Format time as HH:MM
-        new_time = f"{hour:02d}:{minute:02d}"
-        reminder.morning_greeting_time = new_time
+        reminder.set_greeting_time(user.id, new_time)
         
         await update.message.reply_text(
             f"✅ Đã đặt thời gian chào buổi sáng: {new_time}"
@@ -647,11 +1701,81 @@ async def set_morning_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     except Exception as e:
         await update.message.reply_text(f"❌ Lỗi: {e}")
 
+def parse_offset(text):
+    """Parse 2h / 1h30 / 30m / 30p / 30 (minutes) into seconds; ValueError if unreadable"""
+    text = text.lower().rstrip(',')
+    if 'h' in text:
+        hours, _, minutes = text.partition('h')
+        minutes = minutes.rstrip('mp')
+        return int(hours) * 3600 + (int(minutes) * 60 if minutes else 0)
+    return int(text.rstrip('mp')) * 60
+
+async def remind_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /remind command - choose how long before each deadline reminders are sent"""
+    user = update.message.from_user
+    if not user:
+        return
+    
+    args = context.args or []
+    if not args:
+        await update.message.reply_text(
+            f"⏰ Bạn đang được nhắc trước deadline: {format_offsets(reminder.offsets_for(user.id))}\n"
+            "Đổi bằng: /remind 2h 30m 5m, hoặc /remind reset để về mặc định."
+        )
+        return
+    
+    if args[0].lower() == 'reset':
+        offsets = None
+    else:
+        try:
+            offsets = sorted({parse_offset(arg) for arg in args}, reverse=True)
+        except ValueError:
+            await update.message.reply_text("❌ Định dạng không hợp lệ. Ví dụ: /remind 2h 30m 5m")
+            return
+        if len(offsets) > REMINDER_MAX_OFFSETS or not all(60 <= offset <= REMINDER_MAX_OFFSET for offset in offsets):
+            await update.message.reply_text(
+                f"❌ Tối đa {REMINDER_MAX_OFFSETS} mốc, mỗi mốc từ 1 phút đến {format_duration(REMINDER_MAX_OFFSET)}."
+            )
+            return
+    
+    # Reschedules every task of the user; large lists run off the event loop
+    await asyncio.to_thread(reminder.set_offsets, user.id, offsets)
+    await update.message.reply_text(
+        f"✅ Mình sẽ nhắc trước deadline: {format_offsets(reminder.offsets_for(user.id))}"
+    )
+
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /tz command - choose the timezone deadlines and the greeting time are read in"""
+    user = update.message.from_user
+    if not user:
+        return
+    
+    args = context.args or []
+    if not args:
+        tz = reminder.timezone_for(user.id)
+        await update.message.reply_text(
+            f"🌏 Múi giờ của bạn: {tz.key} (bây giờ là {datetime.now(tz).strftime('%H:%M %d/%m/%Y')})\n"
+            f"Đổi bằng: /tz Asia/Tokyo, hoặc /tz reset để về {task_parser.DEFAULT_TIMEZONE}."
+        )
+        return
+    
+    name = None if args[0].lower() == 'reset' else args[0]
+    try:
+        # Re-reads and reschedules every deadline of the user; large lists run off the event loop
+        moved = await asyncio.to_thread(reminder.set_timezone, user.id, name)
+    except ValueError:
+        await update.message.reply_text("❌ Không có múi giờ này. Ví dụ: /tz Asia/Ho_Chi_Minh, /tz Europe/Berlin")
+        return
+    tz = reminder.timezone_for(user.id)
+    await update.message.reply_text(
+        f"✅ Đã đổi múi giờ: {tz.key} (bây giờ là {datetime.now(tz).strftime('%H:%M %d/%m/%Y')})\n"
+        f"📅 Deadline và giờ chào buổi sáng ({reminder.greeting_time(user.id)}) tính theo múi giờ này"
+        f"{f', đã cập nhật {moved} ticket' if moved else ''}."
+    )
+
 async def morning_greeting(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /morning command - send morning greeting immediately"""
     user_id = update.message.from_user.id
-    # Add user to all_users
-    reminder.all_users.add(user_id)
     
     # Send morning greeting immediately
     success = await reminder.send_morning_greeting(user_id)
@@ -661,40 +1785,204 @@ async def morning_greeting(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     else:
         await update.message.reply_text("❌ Không thể gửi lời chào, vui lòng thử lại sau.")
 
+def broadcast_name(text):
+    """Same text on the same day resumes an interrupted broadcast instead of resending"""
+    return f"admin_{datetime.now().strftime('%Y-%m-%d')}_{zlib.crc32(text.encode('utf-8')):08x}"
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /broadcast command - admin sends a message to every user"""
+    if update.message.from_user.id != CHAT_ID:
+        await update.message.reply_text("❌ Bạn không có quyền dùng lệnh này.")
+        return
+    
+    text = update.message.text.partition(' ')[2].strip()
+    if not text:
+        await update.message.reply_text("❌ Vui lòng nhập nội dung: /broadcast Xin chào")
+        return
+    
+    name = broadcast_name(text)
+    users = list(reminder.all_users)
+    await update.message.reply_text(f"📣 Đang gửi tới {len(users)} người dùng...")
+    
+    async def run_broadcast():
+        sent = await reminder.broadcast_text(name, users, text)
+        await update.message.reply_text(f"✅ Đã gửi: {len(sent)}/{len(users)} người dùng.")
+    
+    context.application.create_task(run_broadcast())
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /stats command - admin summary of the bot's metrics"""
+    if update.message.from_user.id != CHAT_ID:
+        await update.message.reply_text("❌ Bạn không có quyền dùng lệnh này.")
+        return
+    await update.message.reply_text(reminder.format_stats()[:MAX_MESSAGE_LENGTH])
+
+# /profile: at most one CPU profile at a time; tracemalloc stays on between mem calls
+PROFILE_MAX_SECONDS = 300
+profiling = False
+memory_tracker = MemoryTracker()
+
+async def send_report(message, summary, filename, report):
+    """Reply with the summary and the full report attached as a text file"""
+    await message.reply_text(summary[:MAX_MESSAGE_LENGTH])
+    await message.reply_document(io.BytesIO(report.encode('utf-8')), filename=filename)
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /profile command - admin profiles the running bot
+
+    /profile [seconds]   sample CPU stacks (default 10s)
+    /profile mem         tracemalloc baseline, then diffs against it
+    /profile mem stop    stop tracemalloc
+    """
+    global profiling
+    if update.message.from_user.id != CHAT_ID:
+        await update.message.reply_text("❌ Bạn không có quyền dùng lệnh này.")
+        return
+    
+    args = context.args or []
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if args and args[0] == 'mem':
+        if args[1:] == ['stop']:
+            memory_tracker.stop()
+            await update.message.reply_text("✅ Đã tắt theo dõi bộ nhớ.")
+        elif not memory_tracker.active:
+            await asyncio.to_thread(memory_tracker.start)
+            await update.message.reply_text(
+                "🧠 Đã bắt đầu theo dõi bộ nhớ. Gõ /profile mem lần nữa để xem thay đổi, /profile mem stop để tắt.")
+        else:
+            summary, report = await asyncio.to_thread(memory_tracker.diff)
+            await send_report(update.message, summary, f"memory-{stamp}.txt", report)
+        return
+    
+    try:
+        seconds = float(args[0]) if args else 10.0
+    except ValueError:
+        seconds = 0
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        await update.message.reply_text(f"❌ Cú pháp: /profile [giây, tối đa {PROFILE_MAX_SECONDS}] hoặc /profile mem")
+        return
+    if profiling:
+        await update.message.reply_text("⏳ Đang có một lần profile chạy, vui lòng đợi.")
+        return
+    
+    profiling = True
+    await update.message.reply_text(f"🔬 Đang profile CPU trong {seconds:g}s...")
+    
+    async def run_profile():
+        global profiling
+        try:
+            # The sampler runs in a worker thread so the loop keeps serving handlers and reminders
+            profiler = await asyncio.to_thread(SamplingProfiler().run, seconds)
+            await send_report(update.message, profiler.summary(), f"profile-{stamp}.folded", profiler.collapsed())
+        finally:
+            profiling = False
+    
+    context.application.create_task(run_profile())
+
+async def track_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs before every handler: remember anyone who interacts with the bot"""
+    user = update.effective_user
+    if user:
+        reminder.all_users.add(user.id)
+        # Handlers read user_tasks directly; build this user's tasks from the snapshot first
+        reminder.ensure_user(user.id)
+
 async def post_init(application: Application) -> None:
     """Initialize after bot starts"""
     # Set bot instance for reminder
     reminder.set_bot(application.bot)
     
-    # Start reminder checker thread
-    reminder_thread = threading.Thread(target=reminder_checker_thread, daemon=True)
-    reminder_thread.start()
-    print("Reminder checker thread started")
+    # Reminder loop shares the Application's event loop and HTTP connection pool
+    await reminder.start()
+
+async def post_shutdown(application: Application) -> None:
+    """Clean up when the bot stops"""
+    await reminder.stop()
+
+def application_builder():
+    """Application builder pointed at the configured Bot API"""
+    builder = Application.builder().token(TOKEN)
+    if API_BASE_URL:
+        builder = builder.base_url(API_BASE_URL)
+        print(f"Using Bot API at {API_BASE_URL}")
+    return builder
+
+def add_handlers(application):
+    """Register the bot's command and message handlers"""
+    def measured(handler):
+        # Latency and errors per handler, under the handler function's name
+        return metrics.timed(handler.__name__)(handler)
+    
+    application.add_handler(TypeHandler(Update, track_user), group=-1)
+    application.add_handler(CommandHandler("start", measured(start)))
+    application.add_handler(CommandHandler("help", measured(help_command)))
+    application.add_handler(CommandHandler("list", measured(list_tasks)))
+    application.add_handler(CallbackQueryHandler(measured(list_page), pattern=r"^list:"))
+    application.add_handler(CommandHandler("del", measured(delete_task)))
+    application.add_handler(CommandHandler("st", measured(set_morning_time)))
+    application.add_handler(CommandHandler("remind", measured(remind_command)))
+    application.add_handler(CommandHandler("tz", measured(timezone_command)))
+    application.add_handler(CommandHandler("morning", measured(morning_greeting)))
+    application.add_handler(CommandHandler("broadcast", measured(broadcast_command)))
+    application.add_handler(CommandHandler("stats", measured(stats_command)))
+    application.add_handler(CommandHandler("profile", measured(profile_command)))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, measured(handle_message)))
+
+def run_application(application):
+    """Receive updates by polling or webhook until stopped"""
+    # Run the bot. Pending updates are kept in both modes, so switching
+    # BOT_MODE and restarting loses nothing: run_webhook registers the
+    # webhook and Telegram delivers the backlog there; run_polling deletes
+    # the webhook first and fetches the backlog with getUpdates.
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise SystemExit("BOT_MODE=webhook requires WEBHOOK_URL")
+        print(f"Webhook mode: listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}, "
+              f"max_connections={WEBHOOK_MAX_CONNECTIONS}")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET or secrets.token_urlsafe(32),
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=False,
+        )
+    else:
+        print("Polling mode")
+        application.run_polling(drop_pending_updates=False)
 
 def main():
     """Start the bot"""
+    if BOT_SHARDS > 1:
+        # Front process: route updates to worker processes by user_id
+        import sharding
+        sharding.run_front(BOT_SHARDS)
+        return
+    
+    # Fold shards back into a single store if sharding was switched off
+    import sharding
+    sharding.reshard(1)
+    
     # Load existing tasks and users
     reminder.load_tasks()
     reminder.load_users()
     
     # Create application
-    application = Application.builder().token(TOKEN).post_init(post_init).build()
-    
-    # Add handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("list", list_tasks))
-    application.add_handler(CommandHandler("del", delete_task))
-    application.add_handler(CommandHandler("st", set_morning_time))
-    application.add_handler(CommandHandler("morning", morning_greeting))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    application = (
+        application_builder()
+        .concurrent_updates(PerUserUpdateProcessor(UPDATE_CONCURRENCY))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+    add_handlers(application)
     
     print("Bot started successfully!")
-    print("Commands: /start, /help, /list, /del, /st, /morning")
-    print("Reminder checker running in background thread...")
+    print("Commands: /start, /help, /list, /del, /st, /remind, /tz, /morning, /broadcast, /stats, /profile")
+    print("Reminder scheduler runs on the bot's event loop")
     
-    # Run the bot
-    application.run_polling()
+    run_application(application)
 
 if __name__ == "__main__":
     main()